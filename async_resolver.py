@@ -0,0 +1,190 @@
+"""Shortcode resolution over one shared browser driven by async Playwright.
+
+resolve_shortcode() and get_shortcode() keep the contract of their
+fetch_shortcode counterparts for synchronous callers. Behind them, one
+event loop on one thread drives a single Chromium. Each resolution gets its
+own browser context (separate cookies, storage and cache) and page, and
+RESOLVER_MAX_PAGES caps how many are open at once. Most of a resolution is
+spent waiting for Flash's redirect, so many pages share one browser process
+instead of each job launching its own.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from datetime import datetime
+from time import monotonic
+import config
+from deadline import DeadlineExceeded, job_deadline
+from fetch_shortcode import (
+    BROWSER_ARGS, FAILURE_FALLBACK, FAILURE_PARSE, FAILURE_TIMEOUT, extract_page_id, get_random_user_agent
+)
+from metrics import STAGE_SECONDS
+
+class AsyncResolver:
+    def __init__(self, max_pages=None):
+        self.max_pages = max_pages or config.RESOLVER_MAX_PAGES
+        self.loop = None
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.playwright = None
+        self.browser = None
+        self.browser_lock = None
+        self.page_slots = None
+        self.open_pages = 0
+        self.launches = 0
+
+    def start(self):
+        with self.start_lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            print(f"Async resolver started ({self.max_pages} pages max)")
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.browser_lock = asyncio.Lock()
+        self.page_slots = asyncio.Semaphore(self.max_pages)
+        self.loop.run_forever()
+
+    def stop(self):
+        with self.start_lock:
+            if not self.thread or not self.thread.is_alive():
+                return
+            future = asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+            try:
+                future.result(timeout=30)
+            except Exception as e:
+                print(f"❌ Failed to close the shared browser: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    async def _shutdown(self):
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+
+    async def _get_browser(self, deadline):
+        """The shared browser, (re)launched if it is not running"""
+        async with self.browser_lock:
+            if self.browser is not None and self.browser.is_connected():
+                return self.browser
+            if self.playwright is None:
+                # Imported here so API-only processes never load Playwright
+                from playwright.async_api import async_playwright
+                self.playwright = await async_playwright().start()
+            print("🚀 Launching shared browser...")
+            browser_start = datetime.now()
+            self.browser = await self.playwright.chromium.launch(
+                headless=True,
+                timeout=deadline.timeout_ms(config.BROWSER_LAUNCH_TIMEOUT_SECONDS, "browser_launch"),
+                args=BROWSER_ARGS
+            )
+            self.launches += 1
+            browser_duration = (datetime.now() - browser_start).total_seconds()
+            STAGE_SECONDS.observe(browser_duration, stage="browser_launch")
+            print(f"🚀 Browser launched in {browser_duration:.2f} seconds")
+            return self.browser
+
+    async def _resolve(self, url, deadline):
+        try:
+            await asyncio.wait_for(self.page_slots.acquire(), deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("page_slot")
+        self.open_pages += 1
+        try:
+            browser = await self._get_browser(deadline)
+            context = await browser.new_context(
+                user_agent=get_random_user_agent(),
+                viewport={'width': 1920, 'height': 1080}
+            )
+            try:
+                return await self._wait_for_product_url(context, url, deadline)
+            finally:
+                await context.close()
+        finally:
+            self.open_pages -= 1
+            self.page_slots.release()
+
+    async def _wait_for_product_url(self, context, url, deadline):
+        """Async twin of fetch_shortcode._wait_for_product_url"""
+        page = await context.new_page()
+        target_url = f"{config.FLASH_BASE_URL}/{url}"
+        print(f"🌐 Navigating to: {target_url}")
+        navigation_start = datetime.now()
+        await page.goto(target_url, timeout=deadline.timeout_ms(config.NAVIGATION_TIMEOUT_SECONDS, "navigation"))
+        STAGE_SECONDS.observe((datetime.now() - navigation_start).total_seconds(), stage="navigation")
+
+        redirect_start = datetime.now()
+        redirect_attempts = 0
+        redirect_deadline = deadline.child(config.REDIRECT_WAIT_SECONDS, reserve=config.DETAILS_TIMEOUT_SECONDS)
+        while not redirect_deadline.expired():
+            current_url = page.url
+            if "fallback" in current_url:
+                print(f"❌ No 'details' found in product_url: {current_url}")
+                STAGE_SECONDS.observe((datetime.now() - redirect_start).total_seconds(), stage="redirect_wait")
+                return None, FAILURE_FALLBACK
+            if "product-details" in current_url:
+                redirect_duration = (datetime.now() - redirect_start).total_seconds()
+                STAGE_SECONDS.observe(redirect_duration, stage="redirect_wait")
+                print(f"✅ Found product-details URL in {redirect_duration:.2f} seconds: {current_url}")
+                return current_url, None
+            # Yields to the other pages' polls while this one waits
+            await page.wait_for_timeout(min(500, redirect_deadline.remaining() * 1000))
+            redirect_attempts += 1
+
+        deadline.check("redirect_wait")
+        print(f"⏰ Timeout reached after {redirect_attempts} attempts, current URL: {page.url}")
+        STAGE_SECONDS.observe((datetime.now() - redirect_start).total_seconds(), stage="redirect_wait")
+        return None, FAILURE_TIMEOUT
+
+    def resolve(self, url, deadline=None):
+        """Block the calling thread until the event loop has resolved url; same return value as resolve_shortcode"""
+        deadline = deadline or job_deadline()
+        self.start()
+        print(f"🌐 get_shortcode called with URL: {url}")
+        start = monotonic()
+        future = asyncio.run_coroutine_threadsafe(self._resolve(url, deadline), self.loop)
+        try:
+            # Every await inside is bounded by the deadline; the margin only covers closing the context
+            product_url, failure_class = future.result(timeout=deadline.remaining() + 5)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise DeadlineExceeded("redirect_wait")
+        if failure_class:
+            return None, failure_class
+        pageId = extract_page_id(product_url)
+        print(f"✅ get_shortcode completed in {monotonic() - start:.2f} seconds, returning: {pageId}")
+        return pageId, (None if pageId else FAILURE_PARSE)
+
+    def snapshot(self):
+        return {
+            "mode": "async",
+            "running": bool(self.thread and self.thread.is_alive()),
+            "browser_connected": bool(self.browser is not None and self.browser.is_connected()),
+            "open_pages": self.open_pages,
+            "max_pages": self.max_pages,
+            "browser_launches": self.launches,
+        }
+
+resolver = AsyncResolver()
+
+def resolve_shortcode(url, deadline=None):
+    """Resolve a product URL on the shared browser; returns (pageId, failure_class) like fetch_shortcode.resolve_shortcode"""
+    return resolver.resolve(url, deadline)
+
+def get_shortcode(url):
+    """Resolve a product URL to its Flash pageId, or None if it could not be resolved"""
+    pageId, _ = resolve_shortcode(url)
+    return pageId
+
+if __name__ == "__main__":
+    url = input("Enter the URL: ")
+    try:
+        print(get_shortcode(url))
+    finally:
+        resolver.stop()
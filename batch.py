@@ -0,0 +1,358 @@
+"""Scrape a list of product URLs through the job queue and stream the results as NDJSON.
+
+    python batch.py urls.txt -o results.ndjson
+    python batch.py catalog.csv -o results.ndjson --concurrency 4
+    cat urls.jsonl | python batch.py - --format jsonl > results.ndjson
+
+Input is one URL per line, JSONL with a "url" field (or a bare JSON string),
+or CSV with a url column. Jobs run in this process on the same queue,
+upstream limits, memory governor and deadlines as the server, a window
+of them at a time. Each finished URL is written to the output and to a
+checkpoint file (OUTPUT.checkpoint by default, INPUT.checkpoint when writing
+to stdout), and a rerun with the same checkpoint skips what already
+finished. URLs in the negative cache are written as failed without running.
+Completion webhooks are off unless --webhook is given.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import redirect_stdout
+
+URL_FIELDS = ("url", "product_url", "productUrl")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Resumable batch scrape of product URLs to NDJSON")
+    parser.add_argument("input", nargs="?", default="-", help="URL file, or - for stdin (default)")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file, or - for stdout (default)")
+    parser.add_argument("--format", choices=["auto", "lines", "jsonl", "csv"], default="auto")
+    parser.add_argument("--checkpoint", help="Finished-URL log used to resume (default: OUTPUT.checkpoint, or INPUT.checkpoint for stdout)")
+    parser.add_argument("--retry-failed", action="store_true", help="Run URLs the checkpoint records as failed again")
+    parser.add_argument("--concurrency", type=int, help="Jobs running at once (default: MAX_CONCURRENT_JOBS)")
+    parser.add_argument("--cooldown", type=float, help="Seconds between job starts (default: JOB_COOLDOWN_SECONDS)")
+    parser.add_argument("--webhook", action="store_true", help="Send the completion webhook for each product")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs on stderr")
+    return parser.parse_args(argv)
+
+def _url_from_record(record):
+    if isinstance(record, str):
+        return record.strip() or None
+    if isinstance(record, dict):
+        for field in URL_FIELDS:
+            if isinstance(record.get(field), str) and record[field].strip():
+                return record[field].strip()
+    return None
+
+def detect_format(path, first_line):
+    extension = os.path.splitext(path)[1].lower() if path != "-" else ""
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    stripped = first_line.strip()
+    if stripped.startswith(("{", '"')):
+        return "jsonl"
+    if "," in stripped and any(field in next(csv.reader([stripped])) for field in URL_FIELDS):
+        return "csv"
+    return "lines"
+
+def read_inputs(path, input_format="auto"):
+    """[(url, record)] in input order; record is the parsed row for JSONL/CSV input, else None"""
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        text = stream.read()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    if input_format == "auto":
+        first_line = next((line for line in text.splitlines() if line.strip()), "")
+        input_format = detect_format(path, first_line)
+
+    items, invalid = [], 0
+    if input_format == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        if not any(field in (reader.fieldnames or []) for field in URL_FIELDS):
+            raise ValueError(f"CSV input needs one of these columns: {', '.join(URL_FIELDS)}")
+        rows = list(reader)
+    elif input_format == "jsonl":
+        rows = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                invalid += 1
+    else:
+        rows = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+
+    for row in rows:
+        url = _url_from_record(row)
+        if url is None:
+            invalid += 1
+            continue
+        items.append((url, row if isinstance(row, dict) else None))
+    return items, invalid
+
+def load_checkpoint(path, retry_failed=False):
+    """URLs a previous run finished; failed ones are left out with retry_failed"""
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by the interruption this run is resuming from
+                continue
+            if retry_failed and entry.get("status") != "completed":
+                done.discard(entry.get("url"))
+            else:
+                done.add(entry.get("url"))
+    return done
+
+class BatchRun:
+    """Feeds URLs into the job queue a window at a time and writes each result as its job finishes"""
+    def __init__(self, main, items, out, checkpoint, window, progress=sys.stderr):
+        self.main = main
+        self.pending = list(reversed(items))
+        self.out = out
+        self.checkpoint = checkpoint
+        self.window = window
+        self.progress = progress
+        self.total = len(items)
+        self.in_flight = {}
+        self.completed = 0
+        self.failed = 0
+        self.started_at = None
+        self.last_progress = 0.0
+
+    def _enqueue(self, db, url, record):
+        main = self.main
+        job_id = str(uuid.uuid4())
+        db.add(main.Job(
+            job_id=job_id,
+            product_url=url,
+            canonical_key=main.canonical_key(url),
+            status=main.JobStatus.PENDING.value
+        ))
+        db.commit()
+        if not main.job_queue_manager.add_job_simple(job_id, url)["success"]:
+            db.query(main.Job).filter(main.Job.job_id == job_id).delete()
+            db.commit()
+            return False
+        self.in_flight[job_id] = (url, record, time.monotonic())
+        return True
+
+    def _cached_failure(self, db, url, record):
+        """Write a URL the negative cache knows to be unresolvable as failed, as /api answers it with 422"""
+        entry = self.main.lookup_failure(db, url)
+        if entry is None:
+            return False
+        body, _ = self.main.failure_response(entry)
+        self._write({
+            "url": url,
+            "status": self.main.JobStatus.FAILED.value,
+            "job_id": None,
+            "page_id": None,
+            "seconds": 0.0,
+            "input": record,
+            "result": None,
+            "error": f"{body['error']} (cached {body['failure_class']} failure, retry after {body['retry_after']})",
+        })
+        self.failed += 1
+        return True
+
+    def _fill(self, db):
+        while self.pending and len(self.in_flight) < self.window:
+            url, record = self.pending[-1]
+            if not self._cached_failure(db, url, record) and not self._enqueue(db, url, record):
+                return
+            self.pending.pop()
+
+    def _collect(self, db):
+        main = self.main
+        finished_statuses = [main.JobStatus.COMPLETED.value, main.JobStatus.FAILED.value, main.JobStatus.CANCELLED.value]
+        db.expire_all()
+        finished = db.query(main.Job).filter(
+            main.Job.job_id.in_(list(self.in_flight)),
+            main.Job.status.in_(finished_statuses)
+        ).all()
+        for job in finished:
+            url, record, enqueued_at = self.in_flight.pop(job.job_id)
+            ok = job.status == main.JobStatus.COMPLETED.value
+            self._write({
+                "url": url,
+                "status": job.status,
+                "job_id": job.job_id,
+                "page_id": job.page_id,
+                "seconds": round(time.monotonic() - enqueued_at, 2),
+                "input": record,
+                "result": self._result(db, job) if ok else None,
+                "error": None if ok else job.error,
+            })
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def _result(self, db, job):
+        # Stored results are usually JSON text; embed them as objects rather than strings
+        result = self.main.job_result(db, job)
+        payload = self.main.catalog.load_payload(result)
+        return payload if payload is not None else result
+
+    def _write(self, entry):
+        self.out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.out.flush()
+        if self.checkpoint:
+            # Only after the result itself is written, so a resumed run never loses a URL
+            self.checkpoint.write(json.dumps({"url": entry["url"], "status": entry["status"]}) + "\n")
+            self.checkpoint.flush()
+            os.fsync(self.checkpoint.fileno())
+
+    def jobs_per_minute(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.completed / elapsed * 60 if elapsed > 0 else 0.0
+
+    def _show_progress(self, final=False):
+        now = time.monotonic()
+        interactive = self.progress.isatty()
+        if not final and now - self.last_progress < (1 if interactive else 10):
+            return
+        self.last_progress = now
+        done = self.completed + self.failed
+        rate = (done / (now - self.started_at)) if now > self.started_at else 0.0
+        eta = f"{(self.total - done) / rate / 60:.0f}m" if rate > 0 and done < self.total else "-"
+        line = (
+            f"[{done}/{self.total}] ✅ {self.completed} ❌ {self.failed} "
+            f"⏳ {len(self.in_flight)} in flight | {self.jobs_per_minute():.1f} jobs/min | ETA {eta}"
+        )
+        if interactive:
+            self.progress.write(f"\r\033[K{line}" + ("\n" if final else ""))
+        else:
+            self.progress.write(line + "\n")
+        self.progress.flush()
+
+    def run(self):
+        main = self.main
+        self.started_at = time.monotonic()
+        db = main.SessionLocal()
+        try:
+            while self.pending or self.in_flight:
+                self._fill(db)
+                time.sleep(0.5)
+                self._collect(db)
+                self._show_progress()
+            self._show_progress(final=True)
+        finally:
+            db.close()
+
+    def abandon(self):
+        """Cancel whatever is still queued or running, so its jobs do not look pending to the server"""
+        main = self.main
+        if not self.in_flight:
+            return
+        for job_id in self.in_flight:
+            main.job_queue_manager.cancel_job(job_id)
+        db = main.SessionLocal()
+        try:
+            db.query(main.Job).filter(
+                main.Job.job_id.in_(list(self.in_flight)),
+                main.Job.status.in_([main.JobStatus.PENDING.value, main.JobStatus.QUEUED.value, main.JobStatus.PROCESSING.value])
+            ).update({
+                main.Job.status: main.JobStatus.CANCELLED.value,
+                main.Job.error: "Batch run interrupted",
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+def default_checkpoint(input_path, output_path):
+    """OUTPUT.checkpoint, or INPUT.checkpoint when results go to stdout; None when both are streams"""
+    if output_path != "-":
+        return f"{output_path}.checkpoint"
+    if input_path != "-":
+        return f"{input_path}.checkpoint"
+    return None
+
+def run(args):
+    # The queue, upstream controllers and memory governor size themselves from config on import
+    if args.concurrency:
+        os.environ["MAX_CONCURRENT_JOBS"] = str(args.concurrency)
+    if args.cooldown is not None:
+        os.environ["JOB_COOLDOWN_SECONDS"] = str(args.cooldown)
+    if not args.webhook:
+        os.environ["WEBHOOK_URL"] = ""
+
+    items, invalid = read_inputs(args.input, args.format)
+    checkpoint_path = args.checkpoint or default_checkpoint(args.input, args.output)
+    if checkpoint_path is None:
+        print("⚠️ Reading stdin and writing stdout without --checkpoint: this run cannot be resumed", file=sys.stderr)
+    done = load_checkpoint(checkpoint_path, args.retry_failed)
+    seen, todo, duplicates = set(done), [], 0
+    for url, record in items:
+        if url in seen:
+            duplicates += url not in done
+            continue
+        seen.add(url)
+        todo.append((url, record))
+    skipped = sum(1 for url, _ in items if url in done)
+    print(f"📋 {len(items)} URLs read: {len(todo)} to run, {skipped} already in the checkpoint, "
+          f"{duplicates} duplicates, {invalid} invalid", file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+    # Pipeline logs would interleave with NDJSON on stdout and with the progress line
+    logs = sys.stderr if args.verbose else open(os.devnull, "w")
+    try:
+        with redirect_stdout(logs):
+            import main
+            from model import init_db
+            init_db()
+            window = max(1, min(main.config.MAX_QUEUE_SIZE, 2 * main.job_queue_manager.max_concurrent_jobs))
+            batch = BatchRun(main, todo, out, checkpoint, window)
+            main.memory_governor.start()
+            main.job_queue_manager.start()
+            try:
+                batch.run()
+            except KeyboardInterrupt:
+                batch.abandon()
+                print(f"\n⏹️ Interrupted; {len(batch.pending) + len(batch.in_flight)} URLs left for the next run", file=sys.stderr)
+                raise
+            finally:
+                main.job_queue_manager.stop()
+                main.memory_governor.stop()
+                if main.shortcode_resolver:
+                    main.shortcode_resolver.stop()
+        job_total = main.STAGE_SECONDS
+        p50, p95 = job_total.quantile(0.5, stage="job_total"), job_total.quantile(0.95, stage="job_total")
+        elapsed = time.monotonic() - batch.started_at
+        print(
+            f"✅ {batch.completed} completed, ❌ {batch.failed} failed in {elapsed:.1f}s: "
+            f"{batch.jobs_per_minute():.1f} jobs/min"
+            + (f", job p50 {p50:.1f}s, p95 {p95:.1f}s" if p50 is not None else ""),
+            file=sys.stderr
+        )
+        return 0 if batch.failed == 0 else 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if checkpoint:
+            checkpoint.close()
+        if logs is not sys.stderr:
+            logs.close()
+
+if __name__ == "__main__":
+    try:
+        sys.exit(run(parse_args()))
+    except KeyboardInterrupt:
+        sys.exit(130)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,171 @@
+"""Synthetic Flash product-details pages used by the offline benchmarks.
+
+The committed pages are generated, not captured from Flash, so benchmark
+numbers measured on them are not numbers for real pages. Pages live in
+benchmarks/pages/ as raw HTML. ``__PAGE_ID__`` in a page is
+replaced with the requested pageId when the fake upstream serves it.
+
+    python benchmarks/corpus.py generate          # (re)build the synthetic pages
+    python benchmarks/corpus.py capture <pageId>  # record a live page from webapp.flash.co
+"""
+import json
+import os
+import sys
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+PAGE_ID_PLACEHOLDER = "__PAGE_ID__"
+
+STORES = [
+    ("Amazon", "AMAZON"), ("Flipkart", "FLIPKART"), ("Croma", "CROMA"),
+    ("Reliance Digital", "RELIANCE_DIGITAL"), ("Vijay Sales", "VIJAY_SALES"), ("Tata Cliq", "TATA_CLIQ"),
+]
+
+def list_pages():
+    """Return (name, html) for every page in the corpus, sorted by name"""
+    pages = []
+    for name in sorted(os.listdir(PAGES_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+                pages.append((name[:-len(".html")], f.read()))
+    return pages
+
+def sample_product(name, base_price, store_count=4, spec_count=24, review_count=6):
+    """A product payload shaped like the widgets response.html reads"""
+    stores = []
+    for index, (store_name, marketplace) in enumerate(STORES[:store_count]):
+        price = base_price + index * 350
+        stores.append({
+            "name": store_name,
+            "marketplace": marketplace,
+            "totalPrice": f"₹{price:,}",
+            "basePrice": f"₹{price + 1200:,}",
+            "availability": "IN_STOCK" if index != store_count - 1 else "OUT_OF_STOCK",
+            "directLink": f"https://example.com/{marketplace.lower()}/{PAGE_ID_PLACEHOLDER}",
+            "detailsAndOffers": [{"text": "Free delivery"}, {"text": f"₹{500 + index * 100} off with HDFC cards"}],
+        })
+    return {
+        "productId": PAGE_ID_PLACEHOLDER,
+        "widgets": [
+            {
+                "type": "IMAGE_CAROUSEL",
+                "images": [f"https://images.example.com/{PAGE_ID_PLACEHOLDER}/{i}.jpg" for i in range(8)],
+            },
+            {
+                "type": "PRODUCT_HEADER",
+                "name": name,
+                "brand": name.split()[0],
+                "price": stores[0]["totalPrice"],
+                "rating": 4.3,
+                "stores": stores,
+            },
+            {
+                "type": "PRODUCT_DETAILS",
+                "sections": [
+                    {
+                        "type": "AI_SUMMARY",
+                        "summary": f"The {name} balances performance and battery life for its price.",
+                        "keyStrengths": ["Bright display", "Long battery life", "Fast charging"],
+                        "keyLimitations": ["No charger in the box", "Average low-light camera"],
+                    },
+                    {
+                        "type": "SPECIFICATIONS",
+                        "details": [{"label": f"Spec {i}", "value": f"Value {i} for {name}"} for i in range(spec_count)],
+                    },
+                    {
+                        "type": "REVIEWS",
+                        "reviewsCount": 1250,
+                        "rating": 4.3,
+                        "detailedReviews": [
+                            {"title": f"Review {i}", "starRating": 5 - i % 3, "content": "Solid phone, great value. Camera is good in daylight."}
+                            for i in range(review_count)
+                        ],
+                    },
+                    {
+                        "type": "PICKED_REASONS",
+                        "scoreData": {
+                            "score": 8.4,
+                            "scoreBreakdown": [{"label": label, "value": 70 + i * 5} for i, label in enumerate(["Display", "Battery", "Camera", "Performance"])],
+                        },
+                    },
+                ],
+            },
+        ],
+    }
+
+def escape_flight_payload(text):
+    """Escape text the way Next.js embeds it inside self.__next_f.push string literals"""
+    return json.dumps(text, ensure_ascii=False)[1:-1]
+
+def build_page(payload_text, chunk_id=5, filler_chunks=3):
+    """Wrap a flight payload in a minimal product-details HTML document"""
+    scripts = [f'<script>self.__next_f.push([1,"{i}:I[{i * 101},[],\\"\\"]\\n"])</script>' for i in range(1, filler_chunks + 1)]
+    scripts.append(f'<script>self.__next_f.push([1,"{chunk_id}:{escape_flight_payload(payload_text)}"])</script>')
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Flash</title></head><body>"
+        "<div id=\"__next\"></div>"
+        + "".join(scripts)
+        + "</body></html>"
+    )
+
+def flight_payload(product):
+    return '["$","$L6",null,' + json.dumps(product, ensure_ascii=False, separators=(",", ":")) + "]\n"
+
+def synthetic_pages():
+    """Pages covering the shapes the parser handles on the happy path"""
+    phone = sample_product("Samsung Galaxy M35 5G", 16999)
+    laptop = sample_product("Lenovo IdeaPad Slim 3", 45990, store_count=6, spec_count=60, review_count=12)
+    earbuds = sample_product("boAt Airdopes 141", 1099, store_count=2, spec_count=8, review_count=3)
+    initial = {"initialData": {"widgets": phone["widgets"], "productId": PAGE_ID_PLACEHOLDER}}
+    return {
+        "chunk5_phone": build_page(flight_payload(phone)),
+        "chunk5_laptop_large": build_page(flight_payload(laptop)),
+        "chunk7_earbuds": build_page(flight_payload(earbuds), chunk_id=7),
+        "chunk5_initial_data": build_page('["$","$L6",null,' + json.dumps(initial, ensure_ascii=False) + "]\n"),
+    }
+
+def odd_shape_pages():
+    """Pages that exercise the parser's fallback branches"""
+    phone = sample_product("Redmi Note 13 Pro", 23999)
+    text = json.dumps(phone, ensure_ascii=False, separators=(",", ":"))
+    trailing_commas = text.replace("}]", "},]").replace('"rating":4.3}', '"rating":4.3,}')
+    invalid_escapes = text.replace("Solid phone", "Solid\\phone")
+    unquoted_keys = text.replace('"type":', "type:").replace('"label":', "label:")
+    truncated = text[: len(text) // 2] + '"}'
+    generic = sample_product("OnePlus Nord CE4", 24999, store_count=3)
+    return {
+        "chunk12_generic": build_page(flight_payload(generic), chunk_id=12, filler_chunks=0),
+        "odd_trailing_commas": build_page('["$","$L6",null,' + trailing_commas + "]\n"),
+        "odd_invalid_escapes": build_page('["$","$L6",null,' + invalid_escapes + "]\n"),
+        "odd_unquoted_keys_json5": build_page('["$","$L6",null,' + unquoted_keys + "]\n"),
+        "odd_truncated_partial": build_page('["$","$L6",null,' + truncated + "]\n"),
+        "odd_widgets_only": build_page('["$","$L6",null,' + json.dumps({"widgets": phone["widgets"]}, ensure_ascii=False) + "]\n"),
+        "odd_no_json": build_page('["$","$L6",null,{"children":"loading"}]\n'),
+        "odd_no_script": "<!DOCTYPE html><html><body><h1>Something went wrong</h1></body></html>",
+    }
+
+def write_pages(pages):
+    os.makedirs(PAGES_DIR, exist_ok=True)
+    for name, html in pages.items():
+        with open(os.path.join(PAGES_DIR, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"Wrote {name}.html ({len(html)} bytes)")
+
+def capture(page_id):
+    """Record a live page; the pageId is swapped for the placeholder so it can be replayed for any id"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import requests
+    import config
+    response = requests.get(f"{config.FLASH_WEBAPP_BASE_URL}/product-details", params={"pageId": page_id}, timeout=60)
+    response.raise_for_status()
+    write_pages({f"captured_{page_id}": response.text.replace(page_id, PAGE_ID_PLACEHOLDER)})
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "generate":
+        write_pages(synthetic_pages())
+        write_pages(odd_shape_pages())
+    elif len(sys.argv) >= 3 and sys.argv[1] == "capture":
+        for page_id in sys.argv[2:]:
+            capture(page_id)
+    else:
+        print(__doc__)
+        sys.exit(1)
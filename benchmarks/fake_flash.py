@@ -0,0 +1,173 @@
+"""Local stand-in for flash.co, apiv3.flash.tech and webapp.flash.co.
+
+Serves the three upstream calls the pipeline makes, plus the webhook:
+
+    GET  /<product url>                     302 to /product-details?pageId=<id> after --redirect-delay
+                                            (URLs containing "fallback" go to /fallback instead)
+    GET  /agents/product-detail-steps       readiness progress following --ramp
+    GET  /product-details?pageId=<id>       a synthetic page from benchmarks/pages/
+    POST /webhook                           200
+
+Point the scraper at it with
+    FLASH_BASE_URL=http://127.0.0.1:8765 FLASH_API_BASE_URL=http://127.0.0.1:8765 \\
+    FLASH_WEBAPP_BASE_URL=http://127.0.0.1:8765 WEBHOOK_URL=http://127.0.0.1:8765/webhook
+
+Ramp curves (progress percentage over time since the first poll for a pageId):
+    instant         100 immediately
+    linear:<s>      0 -> 100 over s seconds
+    step:<s>        1 until s seconds, then 100
+    sigmoid:<s>     slow start and finish, 50% at s/2
+    missing         "No product detail steps found" message
+"""
+import argparse
+import hashlib
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import corpus
+
+def parse_ramp(spec):
+    """Turn a ramp spec into a function of elapsed seconds returning a percentage"""
+    name, _, arg = spec.partition(":")
+    seconds = float(arg) if arg else 5.0
+    if name == "instant":
+        return lambda elapsed: 100
+    if name == "linear":
+        return lambda elapsed: min(100, 1 + int(99 * elapsed / seconds))
+    if name == "step":
+        return lambda elapsed: 100 if elapsed >= seconds else 1
+    if name == "sigmoid":
+        return lambda elapsed: max(1, min(100, int(100 / (1 + math.exp(-10 * (elapsed / seconds - 0.5))))))
+    if name == "missing":
+        return None
+    raise ValueError(f"Unknown ramp curve: {spec}")
+
+def page_id_for(path):
+    return hashlib.sha1(path.encode("utf-8")).hexdigest()[:8]
+
+class FakeFlash:
+    def __init__(self, ramp="linear:5", redirect_delay=0.5, detail_latency=0.05, readiness_latency=0.02, error_rate=0.0):
+        self.ramp_spec = ramp
+        self.ramp = parse_ramp(ramp)
+        self.redirect_delay = redirect_delay
+        self.detail_latency = detail_latency
+        self.readiness_latency = readiness_latency
+        self.error_rate = error_rate
+        # odd_* pages exist to exercise parser fallbacks, not to load-test the pipeline
+        self.pages = [page for page in corpus.list_pages() if not page[0].startswith("odd_")]
+        self.first_poll = {}
+        self.lock = threading.Lock()
+        self.request_counts = {}
+        self.server = None
+
+    def reset(self):
+        """Forget readiness progress so a new run ramps from zero again"""
+        with self.lock:
+            self.first_poll.clear()
+            self.request_counts.clear()
+
+    def page_for(self, page_id):
+        name, html = self.pages[int(page_id, 16) % len(self.pages)]
+        return html.replace(corpus.PAGE_ID_PLACEHOLDER, page_id)
+
+    def progress(self, page_id):
+        with self.lock:
+            started = self.first_poll.setdefault(page_id, time.monotonic())
+        return self.ramp(time.monotonic() - started)
+
+    def should_fail(self, key):
+        if not self.error_rate:
+            return False
+        digest = int(hashlib.sha1(f"{key}{time.monotonic_ns()}".encode()).hexdigest()[:8], 16)
+        return digest / 0xFFFFFFFF < self.error_rate
+
+    def count(self, route):
+        with self.lock:
+            self.request_counts[route] = self.request_counts.get(route, 0) + 1
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                fake.count("webhook")
+                self._send(200, b'{"ok":true}', "application/json")
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                if parts.path == "/agents/product-detail-steps":
+                    fake.count("readiness")
+                    time.sleep(fake.readiness_latency)
+                    page_id = query.get("product_detail_hash", [""])[0]
+                    if fake.should_fail(page_id):
+                        return self._send(503, b'{"error":"unavailable"}', "application/json")
+                    if fake.ramp is None:
+                        body = {"message": "No product detail steps found"}
+                    else:
+                        body = {"message": None, "data": {"progressBar": {"progressPercentage": {"value": fake.progress(page_id)}}}}
+                    return self._send(200, json.dumps(body).encode(), "application/json")
+                if parts.path == "/product-details":
+                    page_id = query.get("pageId", [""])[0]
+                    fake.count("details")
+                    time.sleep(fake.detail_latency)
+                    if fake.should_fail(page_id):
+                        return self._send(503, b"unavailable")
+                    return self._send(200, fake.page_for(page_id).encode("utf-8"))
+                if parts.path == "/fallback":
+                    return self._send(200, b"<html><body>fallback</body></html>")
+                fake.count("redirect")
+                time.sleep(fake.redirect_delay)
+                target = "/fallback" if "fallback" in self.path else f"/product-details?pageId={page_id_for(self.path)}"
+                return self._send(302, b"", headers={"Location": target})
+
+        return Handler
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serve on a background thread and return the base URL"""
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self.server.server_address[1]}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Flash upstream for offline benchmarking")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ramp", default="linear:5")
+    parser.add_argument("--redirect-delay", type=float, default=0.5)
+    parser.add_argument("--detail-latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeFlash(args.ramp, args.redirect_delay, args.detail_latency, error_rate=args.error_rate)
+    base_url = fake.start(port=args.port)
+    print(f"Fake Flash serving {len(fake.pages)} synthetic pages on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
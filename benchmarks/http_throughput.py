@@ -0,0 +1,213 @@
+"""Request-throughput comparison between the dev server and the production entry point.
+
+Seeds a database with one completed job and one fresh product, starts each
+server in turn against it and hammers two read paths with --clients threads:
+
+    /status/<job_id>    completed job lookup
+    /api?url=<url>      fresh-product cache hit served from the stored snapshot
+
+Each path is hit by three kinds of client:
+
+    plain       no Accept-Encoding, no validators (full JSON every time)
+    gzip        Accept-Encoding: gzip, br
+    revalidate  If-None-Match with the ETag from a previous response (expects 304)
+
+    python benchmarks/http_throughput.py --requests 2000 --clients 16
+    python benchmarks/http_throughput.py --servers waitress --threads 4,8,16
+
+Servers:
+    dev        python main.py with FLASK_DEBUG=1 (reloader + debugger, the old default)
+    werkzeug   python main.py with FLASK_DEBUG=0 (threaded Werkzeug)
+    waitress   python serve.py
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+PRODUCT_URL = "https://www.amazon.in/dp/B0THRUPUT1"
+JOB_ID = "00000000-0000-0000-0000-00000000beef"
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def seed_database(database_url):
+    """Create the schema and insert the rows both endpoints read"""
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, REPO_DIR)
+    import pytz
+    import corpus
+    from model import init_db, SessionLocal, Product, Job
+    from result_store import store_result
+    from canonical_url import canonical_key
+
+    init_db()
+    db = SessionLocal()
+    try:
+        now = datetime.now(pytz.timezone('Asia/Kolkata'))
+        digest = store_result(db, corpus.sample_product("Throughput Phone", 19999))
+        db.add(Product(productUrl=PRODUCT_URL, shortCode="0badc0de", timestamp=now, result_hash=digest))
+        db.add(Job(
+            job_id=JOB_ID, product_url=PRODUCT_URL, canonical_key=canonical_key(PRODUCT_URL),
+            status="completed", result_hash=digest, page_id="0badc0de",
+            created_at=now, completed_at=now,
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+def start_server(kind, port, env):
+    env = dict(env, PORT=str(port), HOST="127.0.0.1")
+    if kind == "waitress":
+        command = [sys.executable, os.path.join(REPO_DIR, "serve.py")]
+    else:
+        env["FLASK_DEBUG"] = "1" if kind == "dev" else "0"
+        command = [sys.executable, os.path.join(REPO_DIR, "main.py")]
+    # New session so the reloader's child process is stopped with the parent
+    return subprocess.Popen(command, env=env, cwd=env["BENCH_TMP"], start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+def wait_until_up(base_url, timeout=30):
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base_url}/queue/status", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not come up")
+
+def client_headers(kind, url, params):
+    import requests
+    if kind == "gzip":
+        return {"Accept-Encoding": "gzip, br"}
+    if kind == "revalidate":
+        etag = requests.get(url, params=params, timeout=30).headers["ETag"]
+        return {"Accept-Encoding": "gzip, br", "If-None-Match": etag}
+    return {"Accept-Encoding": "identity"}
+
+def hammer(url, total, clients, params=None, headers=None):
+    """Fire `total` GETs from `clients` threads; return (requests/s, p50, p95, bytes/response, errors)"""
+    import requests
+    latencies = []
+    wire_bytes = [0]
+    errors = [0]
+    lock = threading.Lock()
+    per_client = max(1, total // clients)
+
+    def client():
+        session = requests.Session()
+        local = []
+        failed = 0
+        received = 0
+        for _ in range(per_client):
+            start = time.perf_counter()
+            try:
+                response = session.get(url, params=params, headers=headers, timeout=30)
+                if response.status_code not in (200, 304):
+                    failed += 1
+                received += int(response.headers.get("Content-Length", len(response.content)))
+            except requests.RequestException:
+                failed += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            wire_bytes[0] += received
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        statistics.median(latencies),
+        latencies[int(len(latencies) * 0.95) - 1],
+        wire_bytes[0] / len(latencies),
+        errors[0],
+    )
+
+def run(args):
+    sys.path.insert(0, BENCH_DIR)
+    from fake_flash import FakeFlash
+
+    fake = FakeFlash("instant", 0, args.detail_latency)
+    upstream = fake.start()
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = f"sqlite:///{os.path.join(tmp, 'throughput.db')}"
+            seed_database(database_url)
+            env = dict(
+                os.environ,
+                BENCH_TMP=tmp,
+                DATABASE_URL=database_url,
+                FLASH_BASE_URL=upstream,
+                FLASH_API_BASE_URL=upstream,
+                FLASH_WEBAPP_BASE_URL=upstream,
+                WEBHOOK_URL=f"{upstream}/webhook",
+            )
+            for kind in args.servers.split(","):
+                thread_counts = args.threads.split(",") if kind == "waitress" else ["-"]
+                for threads in thread_counts:
+                    port = free_port()
+                    server_env = dict(env, SERVER_THREADS=threads) if threads != "-" else env
+                    process = start_server(kind, port, server_env)
+                    base_url = f"http://127.0.0.1:{port}"
+                    try:
+                        wait_until_up(base_url)
+                        for endpoint, url, params in (
+                            ("/status", f"{base_url}/status/{JOB_ID}", None),
+                            ("/api cached", f"{base_url}/api", {"url": PRODUCT_URL}),
+                        ):
+                            for client in args.client_kinds.split(","):
+                                headers = client_headers(client, url, params)
+                                hammer(url, min(50, args.requests), args.clients, params, headers)
+                                rps, p50, p95, size, errors = hammer(url, args.requests, args.clients, params, headers)
+                                rows.append((kind, threads, endpoint, client, rps, p50, p95, size, errors))
+                                print(f"{kind:<9} threads={threads:<3} {endpoint:<12} {client:<11} {rps:8.1f} req/s  "
+                                      f"p50 {p50 * 1000:6.1f} ms  p95 {p95 * 1000:6.1f} ms  {size:8.0f} B  errors {errors}")
+                    finally:
+                        stop_server(process)
+    finally:
+        fake.stop()
+    print_summary(rows)
+
+def print_summary(rows):
+    print(f"\n{'server':<10}{'threads':>8}  {'endpoint':<12}{'client':<11}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'bytes':>9}{'errors':>8}")
+    for kind, threads, endpoint, client, rps, p50, p95, size, errors in rows:
+        print(f"{kind:<10}{threads:>8}  {endpoint:<12}{client:<11}{rps:>9.1f}{p50 * 1000:>9.1f}{p95 * 1000:>9.1f}{size:>9.0f}{errors:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare request throughput of the dev server and serve.py")
+    parser.add_argument("--servers", default="dev,werkzeug,waitress")
+    parser.add_argument("--threads", default="8", help="comma-separated SERVER_THREADS values for waitress")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--client-kinds", default="plain,gzip,revalidate")
+    parser.add_argument("--detail-latency", type=float, default=0.02)
+    run(parser.parse_args())
@@ -0,0 +1,223 @@
+"""Offline end-to-end load benchmark for JobQueueManager.
+
+Starts the fake Flash upstream, then for each concurrency setting runs a fresh
+process with its own database that enqueues --jobs URLs through /api and waits
+for the queue to drain. Reports jobs/minute, per-stage latency percentiles and
+peak RSS (the Python process, and the whole process tree including Chromium).
+
+    python benchmarks/load_benchmark.py --jobs 20 --concurrency 1,2,4
+    python benchmarks/load_benchmark.py --resolver http --ramp step:3
+    python benchmarks/load_benchmark.py --resolver async --concurrency 4,8
+
+--resolver browser launches a browser per job (RESOLVER=sync), --resolver async
+shares one browser across pages (RESOLVER=async). --resolver http follows the
+fake redirect with requests instead of Playwright, which measures everything
+except the browser stages on hosts without Chromium.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+STAGES = ["memory_admission", "browser_launch", "navigation", "redirect_wait", "readiness_poll", "detail_fetch", "parse", "db_write", "webhook", "job_total"]
+
+def process_tree_rss_bytes(root_pid):
+    """Sum RSS over a process and all of its descendants using /proc"""
+    children = {}
+    rss = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{entry}/statm") as f:
+                rss[int(entry)] = int(f.read().split()[1]) * page_size
+        except (OSError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+def http_resolve_shortcode(url, deadline=None):
+    """Resolve through the fake upstream's 302 without a browser"""
+    import requests
+    import config
+    from deadline import stage_timeout
+    from fetch_shortcode import FAILURE_FALLBACK, FAILURE_PARSE
+    from metrics import timed
+    timeout = stage_timeout(deadline, config.REDIRECT_WAIT_SECONDS, "redirect_wait")
+    with timed("redirect_wait"):
+        response = requests.get(f"{config.FLASH_BASE_URL}/{url}", allow_redirects=False, timeout=timeout)
+    location = response.headers.get("Location", "")
+    if "fallback" in location:
+        return None, FAILURE_FALLBACK
+    if "pageId=" not in location:
+        return None, FAILURE_PARSE
+    return location.split("pageId=")[-1], None
+
+def run_one(args):
+    """Child process: run the queue against the fake upstream and write a JSON report"""
+    sys.path.insert(0, REPO_DIR)
+    import main
+    import metrics
+    from model import init_db, SessionLocal, Job
+
+    if args.resolver == "http":
+        main.resolve_shortcode = http_resolve_shortcode
+    init_db()
+
+    peak_tree = [0]
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.is_set():
+            peak_tree[0] = max(peak_tree[0], process_tree_rss_bytes(os.getpid()))
+            stop.wait(0.2)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+
+    client = main.app.test_client()
+    for i in range(args.jobs):
+        url = f"https://www.amazon.in/dp/B0BENCH{i:03d}"
+        response = client.get("/api", query_string={"url": url})
+        if response.status_code != 202:
+            raise RuntimeError(f"Enqueue failed for {url}: {response.status_code} {response.get_data(as_text=True)}")
+
+    start = time.perf_counter()
+    main.job_queue_manager.start()
+    db = SessionLocal()
+    try:
+        while True:
+            finished = db.query(Job).filter(Job.status.in_(["completed", "failed"])).count()
+            if finished >= args.jobs or time.perf_counter() - start > args.timeout:
+                break
+            db.expire_all()
+            time.sleep(0.2)
+        completed = db.query(Job).filter(Job.status == "completed").count()
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+
+    stages = {}
+    for stage in STAGES:
+        count = metrics.STAGE_SECONDS.count(stage=stage)
+        if count:
+            stages[stage] = {
+                "count": count,
+                "p50": metrics.STAGE_SECONDS.quantile(0.5, stage=stage),
+                "p95": metrics.STAGE_SECONDS.quantile(0.95, stage=stage),
+                "p99": metrics.STAGE_SECONDS.quantile(0.99, stage=stage),
+            }
+    report = {
+        "concurrency": args.concurrency,
+        "jobs": args.jobs,
+        "completed": completed,
+        "elapsed_seconds": elapsed,
+        "jobs_per_minute": completed / elapsed * 60 if elapsed else 0.0,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_tree_rss_mb": peak_tree[0] / (1024 * 1024),
+        "memory": main.memory_governor.snapshot(),
+        "stages": stages,
+    }
+    with open(args.result_file, "w") as f:
+        json.dump(report, f)
+
+def run_all(args):
+    sys.path.insert(0, BENCH_DIR)
+    from fake_flash import FakeFlash
+
+    fake = FakeFlash(args.ramp, args.redirect_delay, args.detail_latency)
+    base_url = fake.start()
+    print(f"Fake Flash on {base_url} (ramp={args.ramp}, redirect_delay={args.redirect_delay}s, resolver={args.resolver})")
+    reports = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            fake.reset()
+            with tempfile.TemporaryDirectory() as tmp:
+                result_file = os.path.join(tmp, "result.json")
+                env = dict(
+                    os.environ,
+                    FLASH_BASE_URL=base_url,
+                    FLASH_API_BASE_URL=base_url,
+                    FLASH_WEBAPP_BASE_URL=base_url,
+                    WEBHOOK_URL=f"{base_url}/webhook",
+                    DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                    MAX_CONCURRENT_JOBS=str(concurrency),
+                    MAX_QUEUE_SIZE=str(max(100, args.jobs)),
+                    JOB_COOLDOWN_SECONDS="0",
+                    RESOLVER="async" if args.resolver == "async" else "sync",
+                    RESOLVER_MAX_PAGES=str(concurrency),
+                )
+                command = [
+                    sys.executable, os.path.abspath(__file__), "--run-one",
+                    "--jobs", str(args.jobs), "--concurrency", str(concurrency),
+                    "--resolver", args.resolver, "--timeout", str(args.timeout),
+                    "--result-file", result_file,
+                ]
+                output = None if args.verbose else subprocess.DEVNULL
+                subprocess.run(command, env=env, cwd=tmp, check=True, stdout=output)
+                with open(result_file) as f:
+                    reports.append(json.load(f))
+                print_report(reports[-1])
+    finally:
+        fake.stop()
+    print_summary(reports)
+
+def _ms(value):
+    return f"{value * 1000:8.0f}" if value is not None else "       -"
+
+def print_report(report):
+    print(f"\nconcurrency={report['concurrency']}: {report['completed']}/{report['jobs']} jobs in {report['elapsed_seconds']:.1f}s")
+    print(f"{'stage':<16}{'count':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for stage, values in report["stages"].items():
+        print(f"{stage:<16}{values['count']:>6}{_ms(values['p50'])} {_ms(values['p95'])} {_ms(values['p99'])}")
+
+def print_summary(reports):
+    print(f"\n{'concurrency':>11}{'jobs/min':>10}{'job p50 s':>11}{'job p95 s':>11}{'peak RSS MB':>13}{'tree RSS MB':>13}{'mem waits':>11}{'jobs/min/GB':>13}")
+    for report in reports:
+        job_total = report["stages"].get("job_total", {})
+        p50 = job_total.get("p50")
+        p95 = job_total.get("p95")
+        print(
+            f"{report['concurrency']:>11}{report['jobs_per_minute']:>10.1f}"
+            f"{(p50 if p50 is not None else float('nan')):>11.2f}{(p95 if p95 is not None else float('nan')):>11.2f}"
+            f"{report['peak_rss_mb']:>13.1f}{report['peak_tree_rss_mb']:>13.1f}"
+            f"{report['memory']['admission_waits']:>11}"
+            f"{report['jobs_per_minute'] / (report['peak_tree_rss_mb'] / 1024):>13.1f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load benchmark against a fake Flash upstream")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", default="1,2,4")
+    parser.add_argument("--resolver", choices=["browser", "async", "http"], default="browser")
+    parser.add_argument("--ramp", default="linear:5")
+    parser.add_argument("--redirect-delay", type=float, default=0.5)
+    parser.add_argument("--detail-latency", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_one:
+        run_one(args)
+    else:
+        run_all(args)
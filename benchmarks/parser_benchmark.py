@@ -0,0 +1,132 @@
+"""Micro-benchmark and regression gate for the product-details parser.
+
+For every page in benchmarks/pages/ reports the median parse time, the bytes
+and blocks allocated (tracemalloc) and which fallback branch the parser took.
+
+    python benchmarks/parser_benchmark.py                    # report
+    python benchmarks/parser_benchmark.py --check            # exit 1 on regression
+    python benchmarks/parser_benchmark.py --update-baseline  # accept current numbers
+
+Timings are normalized by a fixed json.loads calibration workload so the
+committed baseline carries across machines. --check fails when the median
+page gets slower than the baseline by more than --tolerance, or when any page
+takes a different branch than in the baseline.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import corpus
+from details_product import parse_product_page_with_branch
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "parser_baseline.json")
+
+def _median_seconds(function, repeat, number):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+def calibrate(repeat):
+    """Time a fixed json.loads workload to normalize results across machines"""
+    payload = json.dumps(corpus.sample_product("Calibration Phone", 9999, spec_count=40))
+    return _median_seconds(lambda: json.loads(payload), repeat, 50)
+
+def measure_page(html, repeat, number):
+    result, branch = parse_product_page_with_branch(html)
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    parse_product_page_with_branch(html)
+    snapshot_after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diff = snapshot_after.compare_to(snapshot_before, "filename")
+    return {
+        "branch": branch,
+        "bytes": len(html.encode("utf-8")),
+        "median_seconds": _median_seconds(lambda: parse_product_page_with_branch(html), repeat, number),
+        "alloc_peak_bytes": peak,
+        "alloc_blocks": sum(max(stat.count_diff, 0) for stat in diff),
+    }
+
+def run(repeat, number):
+    calibration = calibrate(repeat)
+    pages = {name: measure_page(html, repeat, number) for name, html in corpus.list_pages()}
+    median_page = statistics.median(page["median_seconds"] for page in pages.values())
+    return {
+        "calibration_seconds": calibration,
+        "median_page_seconds": median_page,
+        "median_page_normalized": median_page / calibration,
+        "pages": pages,
+    }
+
+def print_report(report):
+    print(f"{'page':<26}{'size KB':>8}{'median µs':>11}{'peak KB':>9}{'blocks':>8}  branch")
+    for name, page in report["pages"].items():
+        print(
+            f"{name:<26}{page['bytes'] / 1024:>8.1f}{page['median_seconds'] * 1e6:>11.1f}"
+            f"{page['alloc_peak_bytes'] / 1024:>9.1f}{page['alloc_blocks']:>8}  {page['branch']}"
+        )
+    print(f"\nMedian page: {report['median_page_seconds'] * 1e6:.1f} µs "
+          f"({report['median_page_normalized']:.2f}x calibration of {report['calibration_seconds'] * 1e6:.1f} µs)")
+
+def check(report, tolerance):
+    if not os.path.exists(BASELINE_PATH):
+        print(f"No baseline at {BASELINE_PATH}; run with --update-baseline first")
+        return False
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    ok = True
+    limit = baseline["median_page_normalized"] * (1 + tolerance)
+    if report["median_page_normalized"] > limit:
+        print(f"❌ Median page regressed: {report['median_page_normalized']:.2f}x calibration > limit {limit:.2f}x "
+              f"(baseline {baseline['median_page_normalized']:.2f}x, tolerance {tolerance:.0%})")
+        ok = False
+    for name, branch in baseline["branches"].items():
+        current = report["pages"].get(name, {}).get("branch")
+        if current != branch:
+            print(f"❌ {name}: branch changed from {branch} to {current}")
+            ok = False
+    if ok:
+        print(f"✅ Parser within {tolerance:.0%} of baseline ({report['median_page_normalized']:.2f}x vs {baseline['median_page_normalized']:.2f}x)")
+    return ok
+
+def update_baseline(report):
+    baseline = {
+        "median_page_normalized": round(report["median_page_normalized"], 3),
+        "branches": {name: page["branch"] for name, page in report["pages"].items()},
+    }
+    with open(BASELINE_PATH, "w") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+    print(f"Baseline written to {BASELINE_PATH}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parser micro-benchmark over the synthetic page corpus")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.repeat, args.number)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if args.update_baseline:
+        update_baseline(report)
+    if args.check and not check(report, args.tolerance):
+        sys.exit(1)
@@ -0,0 +1,98 @@
+"""Cold-start benchmark: import time and RSS of an API-only process.
+
+Runs a fresh interpreter per sample with ``-X importtime`` and compares
+importing ``main`` on its own (what an API-only process pays) with importing it
+plus the scraper dependencies that are now loaded lazily (what startup cost
+before they were deferred, and what the first scrape still pays).
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 10 --top 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRAPER_MODULES = ["requests", "json5", "playwright.sync_api"]
+
+SCENARIOS = {
+    "api_only": "import main",
+    "eager_scraper": "import main; " + "; ".join(f"import {module}" for module in SCRAPER_MODULES),
+}
+
+# Printed by the child after importing; ru_maxrss is in KiB on Linux
+REPORT_SNIPPET = (
+    "; import resource, sys; "
+    "print('RSS_KB', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss); "
+    "print('SCRAPER_LOADED', [m for m in {modules!r} if m in sys.modules])"
+)
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+def sample(code, cwd):
+    """Run one cold interpreter; return (total import µs, RSS KiB, per-module cumulative µs, loaded scraper modules)"""
+    command = [sys.executable, "-X", "importtime", "-c", code + REPORT_SNIPPET.format(modules=SCRAPER_MODULES)]
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, DATABASE_URL=f"sqlite:///{os.path.join(cwd, 'startup.db')}")
+    result = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    cumulative = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        module_us, indent = int(match.group(2)), len(match.group(3))
+        cumulative[match.group(4)] = module_us
+        # Top-level imports have a single space of indentation
+        if indent == 1:
+            total += module_us
+    rss_kb, loaded = 0, "[]"
+    for line in result.stdout.splitlines():
+        if line.startswith("RSS_KB"):
+            rss_kb = int(line.split()[1])
+        elif line.startswith("SCRAPER_LOADED"):
+            loaded = line.split(" ", 1)[1]
+    return total, rss_kb, cumulative, loaded
+
+def run(runs, top):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, code in SCENARIOS.items():
+            # First run warms the filesystem and bytecode caches
+            sample(code, tmp)
+            totals, rss, last = [], [], None
+            for _ in range(runs):
+                total, rss_kb, cumulative, loaded = sample(code, tmp)
+                totals.append(total)
+                rss.append(rss_kb)
+                last = (cumulative, loaded)
+            results[name] = {
+                "import_ms": statistics.median(totals) / 1000,
+                "rss_mb": statistics.median(rss) / 1024,
+                "cumulative": last[0],
+                "scraper_loaded": last[1],
+            }
+
+    print(f"{'scenario':<16}{'import ms':>11}{'RSS MB':>9}  scraper modules loaded")
+    for name, result in results.items():
+        print(f"{name:<16}{result['import_ms']:>11.1f}{result['rss_mb']:>9.1f}  {result['scraper_loaded']}")
+
+    api, eager = results["api_only"], results["eager_scraper"]
+    print(f"\nAPI-only start saves {eager['import_ms'] - api['import_ms']:.1f} ms "
+          f"({1 - api['import_ms'] / eager['import_ms']:.0%}) and {eager['rss_mb'] - api['rss_mb']:.1f} MB RSS")
+
+    print("\nSlowest imports in api_only (cumulative):")
+    slowest = sorted(api["cumulative"].items(), key=lambda item: item[1], reverse=True)[:top]
+    for module, us in slowest:
+        print(f"  {us / 1000:8.1f} ms  {module}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and RSS")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    run(args.runs, args.top)
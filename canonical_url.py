@@ -0,0 +1,155 @@
+import re
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import pytz
+from sqlalchemy.dialects.sqlite import insert
+from model import UrlAlias
+
+# Query parameters that only carry attribution and never change the product
+TRACKING_PARAMS = {
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_", "tag", "ascsubtag", "linkcode", "linkid", "camp", "creative", "creativeasin",
+    "psc", "th", "smid", "sr", "qid", "keywords", "crid", "sprefix", "content-id", "pd_rd_r",
+    "pd_rd_w", "pd_rd_wg", "pf_rd_p", "pf_rd_r", "pf_rd_s", "pf_rd_t", "pf_rd_i", "pf_rd_m",
+    "affid", "affextparam1", "affextparam2", "lid", "marketplace", "store", "srno", "otracker",
+    "otracker1", "fm", "iid", "ppt", "ppn", "ssid", "cmpid", "_refid", "_appid", "source",
+    "src", "si", "spm", "share", "shared", "utm", "trk", "trackingid",
+}
+TRACKING_PREFIXES = ("utm_", "pf_rd_", "pd_rd_", "_branch", "affext", "hmac")
+
+# Mobile, regional and share-link hosts that serve the same catalog
+HOST_ALIASES = {
+    "amzn.in": "amazon.in",
+    "amzn.to": "amazon.in",
+    "amzn.eu": "amazon.in",
+    "amazon.com.in": "amazon.in",
+    "dl.flipkart.com": "flipkart.com",
+    "fkrt.it": "flipkart.com",
+    "fkrt.cc": "flipkart.com",
+    "fktr.in": "flipkart.com",
+    "myntr.it": "myntra.com",
+}
+HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+
+# Retailer product identifiers; a match replaces the whole URL as the key
+RETAILER_ID_PATTERNS = [
+    ("amazon", re.compile(r"amazon\.", re.I), re.compile(r"/(?:dp|gp/product|gp/aw/d|o/asin|exec/obidos/asin)/([A-Z0-9]{10})(?:[/?]|$)", re.I)),
+    ("flipkart", re.compile(r"flipkart\.com$", re.I), re.compile(r"/p/(itm[0-9a-z]+)", re.I)),
+    ("myntra", re.compile(r"myntra\.com$", re.I), re.compile(r"/(\d{5,})(?:/buy)?/?$")),
+    ("croma", re.compile(r"croma\.com$", re.I), re.compile(r"/p/(\d+)/?$")),
+    ("reliancedigital", re.compile(r"reliancedigital\.in$", re.I), re.compile(r"/p/(\d+)/?$")),
+    ("ajio", re.compile(r"ajio\.com$", re.I), re.compile(r"/p/([0-9a-z_]+)/?$", re.I)),
+    ("nykaa", re.compile(r"nykaa\.com$", re.I), re.compile(r"/p/(\d+)/?$")),
+    ("tatacliq", re.compile(r"tatacliq\.com$", re.I), re.compile(r"/p-(mp\d+)/?$", re.I)),
+]
+# Retailers whose product ID lives in the query string
+RETAILER_ID_PARAMS = {
+    "flipkart": "pid",
+}
+
+def normalize_host(host):
+    host = host.lower().rstrip(".")
+    if ":" in host:
+        host = host.split(":", 1)[0]
+    if host in HOST_ALIASES:
+        return HOST_ALIASES[host]
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    return HOST_ALIASES.get(host, host)
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def canonical_key(url):
+    """Reduce a product URL to a key shared by all of its variants.
+
+    Retailer product IDs win when we can extract them (``amazon:B0CHX1W1XY``);
+    otherwise the key is the normalized host and path plus any query
+    parameters that are not tracking noise.
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    host = normalize_host(parts.netloc)
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=False)]
+
+    for retailer, host_pattern, id_pattern in RETAILER_ID_PATTERNS:
+        if not host_pattern.search(host):
+            continue
+        param = RETAILER_ID_PARAMS.get(retailer)
+        if param:
+            for name, value in query:
+                if name.lower() == param and value:
+                    return f"{retailer}:{value.upper()}"
+        match = id_pattern.search(path)
+        if match:
+            return f"{retailer}:{match.group(1).upper()}"
+
+    kept = sorted((k, v) for k, v in query if not _is_tracking_param(k))
+    key = f"{host}{path}"
+    if kept:
+        key += "?" + urlencode(kept)
+    return key
+
+def learn_alias(db, product_url, short_code):
+    """Remember that this URL's canonical key resolved to short_code.
+
+    Runs inside the caller's transaction. Every URL that resolves teaches the
+    index one more variant, so later share links and tracking-tagged copies of
+    the same product hit the cache instead of launching a browser.
+    """
+    key = canonical_key(product_url)
+    now = datetime.now(pytz.timezone('Asia/Kolkata'))
+    statement = insert(UrlAlias).values(canonical_key=key, short_code=short_code, updated_at=now)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[UrlAlias.canonical_key],
+        set_={"short_code": short_code, "updated_at": now}
+    ))
+    return key
+
+def lookup_short_code(db, product_url):
+    """Return the shortCode a variant of this URL has resolved to before, if any"""
+    alias = db.get(UrlAlias, canonical_key(product_url))
+    return alias.short_code if alias else None
+
+def replay_hit_rate(urls):
+    """Compare exact-URL and canonical-key cache hit rates over a URL log.
+
+    Each URL is treated as cached once any earlier line matched it, which is
+    how the product cache behaves for a log that fits in the freshness window.
+    """
+    seen_urls, seen_keys = set(), set()
+    exact_hits = canonical_hits = total = 0
+    for url in urls:
+        url = url.strip()
+        if not url:
+            continue
+        total += 1
+        key = canonical_key(url)
+        exact_hits += url in seen_urls
+        canonical_hits += key in seen_keys
+        seen_urls.add(url)
+        seen_keys.add(key)
+    return {
+        "urls": total,
+        "unique_urls": len(seen_urls),
+        "unique_keys": len(seen_keys),
+        "exact_hit_rate": exact_hits / total if total else 0.0,
+        "canonical_hit_rate": canonical_hits / total if total else 0.0,
+    }
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python canonical_url.py <url-log-file>")
+        sys.exit(1)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        report = replay_hit_rate(f)
+    print(f"URLs: {report['urls']} ({report['unique_urls']} unique, {report['unique_keys']} unique canonical keys)")
+    print(f"Exact-match hit rate:   {report['exact_hit_rate'] * 100:.1f}%")
+    print(f"Canonical-key hit rate: {report['canonical_hit_rate'] * 100:.1f}%")
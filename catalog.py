@@ -0,0 +1,76 @@
+import json
+import sys
+from datetime import datetime
+import pytz
+import offers
+import price_history
+import search_index
+import watches
+from model import SessionLocal, Product
+from result_store import load_result
+
+def load_payload(result):
+    """Parsed product payload from a stored result (JSON text or already decoded), or None"""
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except json.JSONDecodeError:
+            return None
+    return result if isinstance(result, dict) else None
+
+def product_widgets(payload):
+    """Widgets list wherever this payload shape keeps it"""
+    for container in (payload.get("initialData"), payload.get("productData"), payload):
+        if isinstance(container, dict) and isinstance(container.get("widgets"), list):
+            return container["widgets"]
+    return []
+
+def find_widget(widgets, widget_type):
+    for widget in widgets:
+        if isinstance(widget, dict) and widget.get("type") == widget_type:
+            return widget
+    return None
+
+def record_snapshot(db, page_id, result, fetched_at=None):
+    """Update every index derived from a product snapshot; runs in the caller's transaction.
+
+    Returns a summary of what changed so callers can react without re-reading
+    the indexes.
+    """
+    payload = load_payload(result)
+    if payload is None:
+        return {"indexed": False, "changed_offers": []}
+    fetched_at = fetched_at or datetime.now(pytz.timezone('Asia/Kolkata'))
+    widgets = product_widgets(payload)
+    header = find_widget(widgets, "PRODUCT_HEADER") or {}
+    current_offers = offers.extract_offers(header)
+    changed = offers.update_offers(db, page_id, current_offers, fetched_at)
+    stats = offers.refresh_stats(db, page_id, header, fetched_at)
+    price_history.record_points(db, page_id, [(offer["store"], offer["price_paise"]) for offer in current_offers], fetched_at)
+    search_index.index_product(db, page_id, header, widgets)
+    alerts = watches.evaluate_changes(db, page_id, changed, stats.min_price_paise)
+    return {"indexed": True, "changed_offers": changed, "alerts_queued": alerts}
+
+def rebuild(batch_size=500):
+    """Re-derive the indexes for every product from its stored snapshot"""
+    db = SessionLocal()
+    try:
+        indexed = 0
+        for product in db.query(Product).filter(Product.result_hash.isnot(None)).yield_per(batch_size):
+            summary = record_snapshot(db, product.shortCode, load_result(db, product.result_hash), product.timestamp)
+            indexed += summary["indexed"]
+            if indexed and indexed % batch_size == 0:
+                db.commit()
+        db.commit()
+        return indexed
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        from model import init_db
+        init_db()
+        print(f"✅ Indexed {rebuild()} products")
+    else:
+        print("Usage: python catalog.py rebuild")
+        sys.exit(1)
@@ -1,7 +1,17 @@
-import requests
 import json
+from metrics import timed
+import config
+from deadline import raise_if_cut_short, stage_timeout
+from upstream import FLASH_API
+
+def ready_check(pageId, deadline=None):
+    """Readiness percentage for a pageId, Flash's message if it sent one, or None when it could not be read.
+
+    Raises UpstreamUnavailable while the flash_api circuit is open and
+    DeadlineExceeded once the job's budget is spent.
+    """
+    import requests
 
-def ready_check(pageId):
     headers = {
         'accept': 'application/json',
         'accept-language': 'en-US,en;q=0.9',
@@ -27,22 +37,32 @@ def ready_check(pageId):
         'product_detail_hash': pageId,
     }
 
+    timeout = stage_timeout(deadline, config.READINESS_POLL_TIMEOUT_SECONDS, "readiness_poll")
     try:
-        response = requests.get('https://apiv3.flash.tech/agents/product-detail-steps', params=params, headers=headers, timeout=180)
-        response.raise_for_status()
-        
-        response_data = response.json()
-        try:
-            if response_data['message']:
-                return response_data['message']
-        except:
-            pass
-        if response_data['data']['progressBar']['progressPercentage']['value']:
-            percentage = response_data['data']['progressBar']['progressPercentage']['value']
-            return percentage
-    except requests.RequestException as e:
+        with FLASH_API.call():
+            with timed("readiness_poll"):
+                try:
+                    response = requests.get(f'{config.FLASH_API_BASE_URL}/agents/product-detail-steps', params=params, headers=headers, timeout=timeout)
+                except requests.Timeout:
+                    # A poll the deadline cut short is not flash_api's fault
+                    raise_if_cut_short(timeout, config.READINESS_POLL_TIMEOUT_SECONDS, "readiness_poll")
+                    raise
+            response.raise_for_status()
+            response_data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        # Counted against the upstream by FLASH_API; the caller polls again
         print(f"Request error for pageId {pageId}: {e}")
-        return 0
+        return None
+
+    try:
+        if response_data['message']:
+            return response_data['message']
+    except:
+        pass
+    try:
+        return response_data['data']['progressBar']['progressPercentage']['value']
+    except (KeyError, TypeError):
+        return None
     
 if __name__ == "__main__":
     print(ready_check("jacuCWPJ"))
\ No newline at end of file
@@ -0,0 +1,123 @@
+import os
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+def _env_url(name, default):
+    return os.environ.get(name, default).rstrip("/")
+
+# Upstream hosts; point these at benchmarks/fake_flash.py to run offline
+FLASH_BASE_URL = _env_url("FLASH_BASE_URL", "https://flash.co")
+FLASH_API_BASE_URL = _env_url("FLASH_API_BASE_URL", "https://apiv3.flash.tech")
+FLASH_WEBAPP_BASE_URL = _env_url("FLASH_WEBAPP_BASE_URL", "https://webapp.flash.co")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "https://appdeals.in/webhook/flash-data")
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///products.db")
+
+# HTTP server; serve.py uses SERVER_THREADS request threads, FLASK_DEBUG only affects `python main.py`
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = _env_int("PORT", 9999)
+SERVER_THREADS = _env_int("SERVER_THREADS", 8)
+FLASK_DEBUG = _env_bool("FLASK_DEBUG", False)
+
+# Encoded snapshot responses: compress bodies above the threshold, keep up to the max bytes in memory
+HTTP_COMPRESS_MIN_BYTES = _env_int("HTTP_COMPRESS_MIN_BYTES", 1024)
+HTTP_CACHE_MAX_BYTES = _env_int("HTTP_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+
+# Job queue
+MAX_CONCURRENT_JOBS = _env_int("MAX_CONCURRENT_JOBS", 1)
+MAX_QUEUE_SIZE = _env_int("MAX_QUEUE_SIZE", 100)
+JOB_COOLDOWN_SECONDS = _env_float("JOB_COOLDOWN_SECONDS", 30)
+
+# Job history retention
+JOB_RETENTION_DAYS = _env_int("JOB_RETENTION_DAYS", 30)
+RETENTION_INTERVAL_SECONDS = _env_int("RETENTION_INTERVAL_SECONDS", 3600)
+VACUUM_PAGES_PER_RUN = _env_int("VACUUM_PAGES_PER_RUN", 2000)
+
+# Negative cache TTLs per failure class, doubled on each repeat failure up to the max
+NEGATIVE_TTL_FALLBACK_SECONDS = _env_int("NEGATIVE_TTL_FALLBACK_SECONDS", 6 * 3600)
+NEGATIVE_TTL_TIMEOUT_SECONDS = _env_int("NEGATIVE_TTL_TIMEOUT_SECONDS", 10 * 60)
+NEGATIVE_TTL_PARSE_SECONDS = _env_int("NEGATIVE_TTL_PARSE_SECONDS", 3600)
+NEGATIVE_TTL_MAX_SECONDS = _env_int("NEGATIVE_TTL_MAX_SECONDS", 24 * 3600)
+
+# Admin endpoints (/admin/*); when no token is set they only answer localhost
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# Price history: raw points and hourly rollups are downsampled away after these ages, daily rollups are kept
+PRICE_HISTORY_RAW_DAYS = _env_int("PRICE_HISTORY_RAW_DAYS", 90)
+PRICE_HISTORY_HOURLY_DAYS = _env_int("PRICE_HISTORY_HOURLY_DAYS", 400)
+
+# Price-drop alerts, delivered in batches per webhook URL; empty means only watches
+# with their own webhook_url alert
+ALERT_WEBHOOK_URL = os.environ.get("ALERT_WEBHOOK_URL", "")
+ALERT_BATCH_SIZE = _env_int("ALERT_BATCH_SIZE", 100)
+ALERT_INTERVAL_SECONDS = _env_float("ALERT_INTERVAL_SECONDS", 5)
+ALERT_MAX_ATTEMPTS = _env_int("ALERT_MAX_ATTEMPTS", 5)
+
+# Upstream circuit breakers: open after UPSTREAM_FAILURE_RATE failures over the last
+# UPSTREAM_WINDOW calls (at least UPSTREAM_MIN_CALLS), doubling the open time up to the max
+UPSTREAM_WINDOW = _env_int("UPSTREAM_WINDOW", 20)
+UPSTREAM_MIN_CALLS = _env_int("UPSTREAM_MIN_CALLS", 5)
+UPSTREAM_FAILURE_RATE = _env_float("UPSTREAM_FAILURE_RATE", 0.5)
+UPSTREAM_OPEN_SECONDS = _env_float("UPSTREAM_OPEN_SECONDS", 30)
+UPSTREAM_MAX_OPEN_SECONDS = _env_float("UPSTREAM_MAX_OPEN_SECONDS", 600)
+# AIMD concurrency per API upstream; calls slower than the threshold count as congestion
+UPSTREAM_MAX_CONCURRENCY = _env_int("UPSTREAM_MAX_CONCURRENCY", 8)
+UPSTREAM_ACQUIRE_TIMEOUT_SECONDS = _env_float("UPSTREAM_ACQUIRE_TIMEOUT_SECONDS", 30)
+FLASH_SLOW_SECONDS = _env_float("FLASH_SLOW_SECONDS", 60)
+FLASH_API_SLOW_SECONDS = _env_float("FLASH_API_SLOW_SECONDS", 10)
+FLASH_WEBAPP_SLOW_SECONDS = _env_float("FLASH_WEBAPP_SLOW_SECONDS", 10)
+
+# Job deadline: every stage takes its timeout from what is left of the budget, capped per stage
+JOB_DEADLINE_SECONDS = _env_float("JOB_DEADLINE_SECONDS", 300)
+BROWSER_LAUNCH_TIMEOUT_SECONDS = _env_float("BROWSER_LAUNCH_TIMEOUT_SECONDS", 60)
+NAVIGATION_TIMEOUT_SECONDS = _env_float("NAVIGATION_TIMEOUT_SECONDS", 60)
+REDIRECT_WAIT_SECONDS = _env_float("REDIRECT_WAIT_SECONDS", 250)
+READINESS_MAX_SECONDS = _env_float("READINESS_MAX_SECONDS", 120)
+READINESS_POLL_TIMEOUT_SECONDS = _env_float("READINESS_POLL_TIMEOUT_SECONDS", 30)
+DETAILS_TIMEOUT_SECONDS = _env_float("DETAILS_TIMEOUT_SECONDS", 30)
+WEBHOOK_TIMEOUT_SECONDS = _env_float("WEBHOOK_TIMEOUT_SECONDS", 10)
+
+# Shortcode resolver: "sync" launches a browser per job, "async" shares one browser
+# across up to RESOLVER_MAX_PAGES concurrent pages
+RESOLVER = os.environ.get("RESOLVER", "sync").lower()
+RESOLVER_MAX_PAGES = _env_int("RESOLVER_MAX_PAGES", 4)
+
+# Memory governor: browsers start only while MemAvailable stays above the minimum
+# after allowing MEMORY_BROWSER_ESTIMATE_MB per resolution (a browser, or a page of
+# the shared browser); larger renderers are killed
+MEMORY_SAMPLE_SECONDS = _env_float("MEMORY_SAMPLE_SECONDS", 1)
+MEMORY_MIN_AVAILABLE_MB = _env_int("MEMORY_MIN_AVAILABLE_MB", 512)
+MEMORY_BROWSER_ESTIMATE_MB = _env_int("MEMORY_BROWSER_ESTIMATE_MB", 120 if RESOLVER == "async" else 350)
+MEMORY_RENDERER_MAX_MB = _env_int("MEMORY_RENDERER_MAX_MB", 1024)
+
+# Stale-while-revalidate: products younger than the soft TTL are fresh; up to the hard
+# TTL the stored result is served marked stale while a low-priority refresh runs
+PRODUCT_SOFT_TTL_SECONDS = _env_int("PRODUCT_SOFT_TTL_SECONDS", 24 * 3600)
+PRODUCT_HARD_TTL_SECONDS = _env_int("PRODUCT_HARD_TTL_SECONDS", 7 * 24 * 3600)
+
+# Partial results: while readiness climbs past the minimum, re-fetch the details page at
+# most once per interval and publish each usable snapshot on /status
+PARTIAL_RESULTS = _env_bool("PARTIAL_RESULTS", True)
+PARTIAL_MIN_PERCENT = _env_int("PARTIAL_MIN_PERCENT", 30)
+PARTIAL_INTERVAL_SECONDS = _env_float("PARTIAL_INTERVAL_SECONDS", 5)
+# A partial fetch is skipped when less than this much readiness budget is left
+PARTIAL_MIN_BUDGET_SECONDS = _env_float("PARTIAL_MIN_BUDGET_SECONDS", 3)
+
+# Image proxy: gallery images are fetched once into IMAGE_CACHE_DIR and served from /img,
+# with resized JPEG/WebP variants at the thumbnail and main widths (needs Pillow)
+IMAGE_PROXY = _env_bool("IMAGE_PROXY", True)
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "image_cache")
+IMAGE_THUMB_WIDTH = _env_int("IMAGE_THUMB_WIDTH", 160)
+IMAGE_MAIN_WIDTH = _env_int("IMAGE_MAIN_WIDTH", 640)
+IMAGE_WORKERS = _env_int("IMAGE_WORKERS", 2)
+IMAGE_FETCH_TIMEOUT_SECONDS = _env_float("IMAGE_FETCH_TIMEOUT_SECONDS", 10)
+IMAGE_MAX_BYTES = _env_int("IMAGE_MAX_BYTES", 10 * 1024 * 1024)
+IMAGE_RETRY_SECONDS = _env_int("IMAGE_RETRY_SECONDS", 600)
+IMAGE_MAX_AGE_SECONDS = _env_int("IMAGE_MAX_AGE_SECONDS", 30 * 24 * 3600)
@@ -0,0 +1,62 @@
+import threading
+from time import monotonic
+import config
+
+class DeadlineExceeded(Exception):
+    """A job ran out of its time budget, or was cancelled, before or during a stage"""
+    def __init__(self, stage, cancelled=False):
+        self.stage = stage
+        self.cancelled = cancelled
+        reason = "cancelled" if cancelled else "deadline exceeded"
+        super().__init__(f"Job {reason} during {stage}")
+
+class Deadline:
+    """Time budget for one job, shared by every stage it runs.
+
+    Stages ask for timeout(cap) rather than using fixed timeouts, so no single
+    call can outlive the job, and child() carves out a sub-budget that leaves
+    time for the stages after it. cancel() makes the next check() raise.
+    """
+    def __init__(self, seconds, expires_at=None, cancel_event=None):
+        self.expires_at = expires_at if expires_at is not None else monotonic() + seconds
+        self.cancel_event = cancel_event or threading.Event()
+
+    def remaining(self):
+        return max(0.0, self.expires_at - monotonic())
+
+    def expired(self):
+        return self.cancel_event.is_set() or monotonic() >= self.expires_at
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check(self, stage):
+        if self.cancel_event.is_set():
+            raise DeadlineExceeded(stage, cancelled=True)
+        if monotonic() >= self.expires_at:
+            raise DeadlineExceeded(stage)
+
+    def timeout(self, cap, stage):
+        """Seconds a call in this stage may take: the stage's cap or whatever budget is left"""
+        self.check(stage)
+        return min(cap, self.remaining())
+
+    def timeout_ms(self, cap, stage):
+        return int(self.timeout(cap, stage) * 1000)
+
+    def child(self, cap, reserve=0.0):
+        """Sub-budget of at most cap seconds that ends reserve seconds before this one; cancelled with it"""
+        expires_at = min(monotonic() + cap, self.expires_at - reserve)
+        return Deadline(None, expires_at=expires_at, cancel_event=self.cancel_event)
+
+def job_deadline():
+    return Deadline(config.JOB_DEADLINE_SECONDS)
+
+def raise_if_cut_short(timeout, cap, stage):
+    """After a timeout: the job's budget, not the upstream, is to blame when it shortened the call below its cap"""
+    if timeout < cap:
+        raise DeadlineExceeded(stage)
+
+def stage_timeout(deadline, cap, stage):
+    """timeout() for callers that may run outside a job, where only the stage cap applies"""
+    return cap if deadline is None else deadline.timeout(cap, stage)
@@ -1,9 +1,13 @@
-import requests
 import re
 import json
-import json5
+from metrics import timed
+import config
+from deadline import raise_if_cut_short, stage_timeout
+from upstream import FLASH_WEBAPP
+
+def get_details_product(pageId, deadline=None):
+    import requests
 
-def get_details_product(pageId):
     cookies = {
         'flash_guest_device': 'a39e130a-2cd2-44a1-ae3e-82f676741700',
         'flash_guest_session_id': 'd13b7f89-a1d3-45f5-b430-f7b1c9da1dcc',
@@ -40,23 +44,54 @@ def get_details_product(pageId):
         'pageId': pageId,
     }
 
-    response = requests.get('https://webapp.flash.co/product-details', params=params, cookies=cookies, headers=headers)
-    data = response.text
-    
-    patterns_to_try = [
-        r'self\.__next_f\.push\(\[1,"5:(.*?)"\]\)',
-        r'self\.__next_f\.push\(\[1,"7:(.*?)"\]\)',
-        r'self\.__next_f\.push\(\[1,"[0-9]+:(.*?)"\]\)',
-    ]
-    
+    timeout = stage_timeout(deadline, config.DETAILS_TIMEOUT_SECONDS, "detail_fetch")
+    with FLASH_WEBAPP.call() as call, timed("detail_fetch"):
+        try:
+            response = requests.get(f'{config.FLASH_WEBAPP_BASE_URL}/product-details', params=params, cookies=cookies, headers=headers, timeout=timeout)
+        except requests.Timeout:
+            # Raised as DeadlineExceeded, a call the deadline cut short frees its slot without counting against flash_webapp
+            raise_if_cut_short(timeout, config.DETAILS_TIMEOUT_SECONDS, "detail_fetch")
+            raise
+        if response.status_code >= 500:
+            call.fail()
+        data = response.text
+    with timed("parse"):
+        return parse_product_page(data)
+
+PAGE_PATTERNS = [
+    ("chunk5", re.compile(r'self\.__next_f\.push\(\[1,"5:(.*?)"\]\)', re.DOTALL)),
+    ("chunk7", re.compile(r'self\.__next_f\.push\(\[1,"7:(.*?)"\]\)', re.DOTALL)),
+    ("chunk_any", re.compile(r'self\.__next_f\.push\(\[1,"[0-9]+:(.*?)"\]\)', re.DOTALL)),
+]
+
+JSON_STARTS = [
+    '{"productId":',
+    '{"initialData":',
+    '{"widgets":',
+    '{"stores":',
+    '{"metadata":'
+]
+
+PARSE_METHODS = ["json", "regex_fix", "json5"]
+
+def parse_product_page(data):
+    """Extract the product JSON embedded in a Flash product-details page"""
+    return parse_product_page_with_branch(data)[0]
+
+def parse_product_page_with_branch(data):
+    """Like parse_product_page, but also report which fallback branch produced the result.
+
+    The branch is "<pattern>/<json start>/<method>", e.g. "chunk5/productId/json"
+    or "chunk7/productId/json5", or an error such as "no_script".
+    """
     script_matches = []
     used_pattern = None
     
-    for pattern in patterns_to_try:
-        matches = re.findall(pattern, data, re.DOTALL)
+    for pattern_name, pattern in PAGE_PATTERNS:
+        matches = pattern.findall(data)
         if matches:
             script_matches = matches
-            used_pattern = pattern
+            used_pattern = pattern_name
             break
     if script_matches:
         script_content = script_matches[0]
@@ -66,19 +101,13 @@ def get_details_product(pageId):
         cleaned = cleaned.replace('\\t', '\t')
         cleaned = cleaned.replace('\\r', '\r')
         cleaned = cleaned.replace('\\\\', '\\')
-    
-        json_starts = [
-            '{"productId":',
-            '{"initialData":',
-            '{"widgets":',
-            '{"stores":',
-            '{"metadata":'
-        ]
         
         json_start = -1
-        for start_pattern in json_starts:
+        used_start = None
+        for start_pattern in JSON_STARTS:
             json_start = cleaned.find(start_pattern)
             if json_start != -1:
+                used_start = start_pattern[2:-2]
                 break
         
         if json_start != -1:
@@ -95,6 +124,7 @@ def get_details_product(pageId):
                         break
             
             json_str = cleaned[json_start:json_end]
+            branch = f"{used_pattern}/{used_start}"
             
             for attempt in range(3):
                 try:
@@ -105,9 +135,11 @@ def get_details_product(pageId):
                         fixed_json = re.sub(r'\\([^"\\/bfnrt])', r'\1', fixed_json)
                         parsed_json = json.loads(fixed_json)
                     else:
+                        # json5 is slow to import and only needed for malformed payloads
+                        import json5
                         parsed_json = json5.loads(json_str)
                     
-                    return json.dumps(parsed_json, indent=2, ensure_ascii=False)
+                    return json.dumps(parsed_json, indent=2, ensure_ascii=False), f"{branch}/{PARSE_METHODS[attempt]}"
                 except Exception as e:
                     if attempt == 2:
                         try:
@@ -119,17 +151,27 @@ def get_details_product(pageId):
                                 "status": "partial_parse",
                                 "message": "Full JSON parsing failed, but basic info extracted",
                                 "raw_length": len(json_str)
-                            }, indent=2)
+                            }, indent=2), f"{branch}/partial_parse"
                         except:
                             return json.dumps({
                                 "error": "Failed to parse JSON",
                                 "raw_length": len(json_str)
-                            }, indent=2)
+                            }, indent=2), f"{branch}/parse_error"
         else:
-            return json.dumps({"error": "No JSON object found in response"}, indent=2)
+            return json.dumps({"error": "No JSON object found in response"}, indent=2), f"{used_pattern}/no_json"
     else:
-        return json.dumps({"error": "No script content found in response"}, indent=2)
+        return json.dumps({"error": "No script content found in response"}, indent=2), "no_script"
+
 
+def is_parse_failure(product_details):
+    """True when get_details_product could not extract the full product JSON"""
+    try:
+        parsed = json.loads(product_details) if isinstance(product_details, str) else product_details
+    except ValueError:
+        return True
+    if not isinstance(parsed, dict):
+        return True
+    return "error" in parsed or parsed.get("status") == "partial_parse"
 
 def clean_unicode_text(text: str) -> str:
     if not text or text == 'N/A':
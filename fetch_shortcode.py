@@ -1,7 +1,26 @@
-from playwright.sync_api import sync_playwright
 import random
 from datetime import datetime
 from time import sleep
+from metrics import STAGE_SECONDS
+import config
+from deadline import job_deadline
+
+FAILURE_FALLBACK = "fallback"
+FAILURE_TIMEOUT = "timeout"
+FAILURE_PARSE = "parse"
+
+BROWSER_ARGS = [
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-gpu',
+    '--disable-software-rasterizer',
+    '--disable-extensions',
+    '--disable-plugins',
+    '--disable-images',
+    '--memory-pressure-off',
+    '--max_old_space_size=128'
+]
 
 def get_random_user_agent():
     """Returns a random realistic user agent string"""
@@ -23,9 +42,25 @@ def get_random_user_agent():
     return random.choice(user_agents)
 
 def get_shortcode(url):
+    """Resolve a product URL to its Flash pageId, or None if it could not be resolved"""
+    pageId, _ = resolve_shortcode(url)
+    return pageId
+
+def resolve_shortcode(url, deadline=None):
+    """Resolve a product URL and report why it failed.
+
+    Returns (pageId, None) on success and (None, failure_class) otherwise, where
+    failure_class is one of FAILURE_FALLBACK, FAILURE_TIMEOUT or FAILURE_PARSE.
+    Every browser step is bounded by the job's deadline; the browser context
+    and browser are always closed, including when a stage raises.
+    """
     print(f"🌐 get_shortcode called with URL: {url}")
     start_time = datetime.now()
+    deadline = deadline or job_deadline()
     
+    # Imported here so API-only processes never load Playwright
+    from playwright.sync_api import sync_playwright
+
     with sync_playwright() as p:
         user_agent = get_random_user_agent()
         print(f"🌐 Using User Agent: {user_agent}")
@@ -34,93 +69,92 @@ def get_shortcode(url):
         browser_start = datetime.now()
         browser = p.chromium.launch(
             headless=True,
-            args=[
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-gpu',
-                '--disable-software-rasterizer',
-                '--disable-extensions',
-                '--disable-plugins',
-                '--disable-images',
-                '--memory-pressure-off',
-                '--max_old_space_size=128' 
-            ]
+            timeout=deadline.timeout_ms(config.BROWSER_LAUNCH_TIMEOUT_SECONDS, "browser_launch"),
+            args=BROWSER_ARGS
             )
-        browser_duration = (datetime.now() - browser_start).total_seconds()
-        print(f"🚀 Browser launched in {browser_duration:.2f} seconds")
-        
-        print(f"📄 Creating browser context...")
-        context = browser.new_context(
-            user_agent=user_agent,
-            viewport={'width': 1920, 'height': 1080}
-        )
-        
-        print(f"📄 Creating new page...")
-        page = context.new_page()
-        
-        target_url = f"https://flash.co/{url}"
-        print(f"🌐 Navigating to: {target_url}")
-        navigation_start = datetime.now()
-        page.goto(target_url)
-        navigation_duration = (datetime.now() - navigation_start).total_seconds()
-        print(f"🌐 Navigation completed in {navigation_duration:.2f} seconds")
-        
-        print(f"🔄 Waiting for redirect to product-details...")
-        redirect_start = datetime.now()
-        redirect_attempts = 0        
-        max_attempts = 500  # Limit to 500 attempts
-        
-        while redirect_attempts < max_attempts:
-            current_url = page.url
-            
-            # Only print every 5 attempts to reduce log spam, but always print on first few attempts
-            if redirect_attempts <= 5 or redirect_attempts % 10 == 0:
-                print(f"🔄 Attempt {redirect_attempts}: Current URL: {current_url}")
+        try:
+            browser_duration = (datetime.now() - browser_start).total_seconds()
+            STAGE_SECONDS.observe(browser_duration, stage="browser_launch")
+            print(f"🚀 Browser launched in {browser_duration:.2f} seconds")
             
-            if "fallback" in current_url:
-                print(f"❌ No 'details' found in product_url: {current_url}")
-                pageId = None
-                return(pageId)
-
-            # Check for different possible redirect patterns
-            if "product-details" in current_url:
-                product_url = current_url
-                redirect_duration = (datetime.now() - redirect_start).total_seconds()
-                print(f"✅ Found product-details URL in {redirect_duration:.2f} seconds: {product_url}")
-                break
-            page.wait_for_timeout(500)
-            redirect_attempts += 1
+            print(f"📄 Creating browser context...")
+            context = browser.new_context(
+                user_agent=user_agent,
+                viewport={'width': 1920, 'height': 1080}
+            )
+            try:
+                product_url, failure_class = _wait_for_product_url(context, url, deadline)
+            finally:
+                print(f"🧹 Closing browser context and browser...")
+                context.close()
+        finally:
+            browser.close()
+        if failure_class:
+            return None, failure_class
         
-        # If we exit the loop without finding product-details, handle timeout
-        if redirect_attempts >= max_attempts:
-            print(f"⏰ Timeout reached after {max_attempts} attempts, current URL: {page.url}")
-            pageId = None
-            return(pageId)
+        pageId = extract_page_id(product_url)
 
+        total_duration = (datetime.now() - start_time).total_seconds()
+        print(f"✅ get_shortcode completed in {total_duration:.2f} seconds, returning: {pageId}")
+        return pageId, (None if pageId else FAILURE_PARSE)
+
+def extract_page_id(product_url):
+    """pageId from a product-details URL, or None"""
+    if "details" not in product_url:
+        print(f"❌ No 'details' found in product_url: {product_url}")
+        return None
+    if 'pageId=' not in product_url:
+        print(f"❌ No pageId found in URL: {product_url}")
+        return None
+    pageId = product_url.split('pageId=')[-1]
+    print(f"📱 Extracted pageId: {pageId}")
+    return pageId
+
+def _wait_for_product_url(context, url, deadline):
+    """Navigate and poll until Flash redirects; returns (product_url, None) or (None, failure_class)"""
+    print(f"📄 Creating new page...")
+    page = context.new_page()
+    
+    target_url = f"{config.FLASH_BASE_URL}/{url}"
+    print(f"🌐 Navigating to: {target_url}")
+    navigation_start = datetime.now()
+    page.goto(target_url, timeout=deadline.timeout_ms(config.NAVIGATION_TIMEOUT_SECONDS, "navigation"))
+    navigation_duration = (datetime.now() - navigation_start).total_seconds()
+    STAGE_SECONDS.observe(navigation_duration, stage="navigation")
+    print(f"🌐 Navigation completed in {navigation_duration:.2f} seconds")
+    
+    print(f"🔄 Waiting for redirect to product-details...")
+    redirect_start = datetime.now()
+    redirect_attempts = 0
+    # Leave the rest of the job enough time to fetch the details page
+    redirect_deadline = deadline.child(config.REDIRECT_WAIT_SECONDS, reserve=config.DETAILS_TIMEOUT_SECONDS)
+    
+    while not redirect_deadline.expired():
+        current_url = page.url
         
-        print(f"🧹 Closing browser context and browser...")
-        context.close()
-        browser.close()
-        
-        # Initialize pageId to None
-        pageId = None
+        # Only print every 5 attempts to reduce log spam, but always print on first few attempts
+        if redirect_attempts <= 5 or redirect_attempts % 10 == 0:
+            print(f"🔄 Attempt {redirect_attempts}: Current URL: {current_url}")
         
-        if "details" in product_url:
-            final_url = product_url
-            if 'pageId=' in final_url:
-                pageId = final_url.split('pageId=')[-1]
-                print(f"📱 Extracted pageId: {pageId}")
-            else:
-                print(f"❌ No pageId found in URL: {final_url}")
-                pageId = None
-        else:
-            print(f"❌ No 'details' found in product_url: {product_url}")
-            pageId = None
+        if "fallback" in current_url:
+            print(f"❌ No 'details' found in product_url: {current_url}")
+            STAGE_SECONDS.observe((datetime.now() - redirect_start).total_seconds(), stage="redirect_wait")
+            return None, FAILURE_FALLBACK
 
-        total_duration = (datetime.now() - start_time).total_seconds()
-        print(f"✅ get_shortcode completed in {total_duration:.2f} seconds, returning: {pageId}")
-        return(pageId)
+        # Check for different possible redirect patterns
+        if "product-details" in current_url:
+            redirect_duration = (datetime.now() - redirect_start).total_seconds()
+            STAGE_SECONDS.observe(redirect_duration, stage="redirect_wait")
+            print(f"✅ Found product-details URL in {redirect_duration:.2f} seconds: {current_url}")
+            return current_url, None
+        page.wait_for_timeout(min(500, redirect_deadline.remaining() * 1000))
+        redirect_attempts += 1
+    
+    # A cancelled job stops here rather than being negative-cached as a timeout
+    deadline.check("redirect_wait")
+    print(f"⏰ Timeout reached after {redirect_attempts} attempts, current URL: {page.url}")
+    STAGE_SECONDS.observe((datetime.now() - redirect_start).total_seconds(), stage="redirect_wait")
+    return None, FAILURE_TIMEOUT
 
 if __name__ == "__main__":
     url = input("Enter the URL: ")
@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+import pytz
+from flask import Response, current_app, request
+import config
+from metrics import HTTP_RESPONSES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Encoded bodies keyed by (cache_key, encoding); snapshots are immutable so entries never go stale
+_body_cache = OrderedDict()
+_body_cache_bytes = 0
+_body_cache_lock = threading.Lock()
+
+def make_etag(*parts):
+    """Strong validator from the snapshot hash and whatever else shapes the body"""
+    return hashlib.sha256(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32]
+
+def _as_utc(moment):
+    # SQLite hands back naive Asia/Kolkata datetimes
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = pytz.timezone('Asia/Kolkata').localize(moment)
+    return moment.astimezone(pytz.utc).replace(microsecond=0)
+
+def is_not_modified(etag, last_modified):
+    """If-None-Match wins over If-Modified-Since, as in RFC 9110"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+def choose_encoding(size):
+    if size < config.HTTP_COMPRESS_MIN_BYTES:
+        return None
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+def encode(raw, encoding):
+    if encoding == "br":
+        return brotli.compress(raw, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+    return raw
+
+def _cache_get(key):
+    with _body_cache_lock:
+        body = _body_cache.get(key)
+        if body is not None:
+            _body_cache.move_to_end(key)
+        return body
+
+def _cache_put(key, body):
+    global _body_cache_bytes
+    if len(body) > config.HTTP_CACHE_MAX_BYTES:
+        return
+    with _body_cache_lock:
+        if key in _body_cache:
+            return
+        _body_cache[key] = body
+        _body_cache_bytes += len(body)
+        while _body_cache_bytes > config.HTTP_CACHE_MAX_BYTES:
+            _, evicted = _body_cache.popitem(last=False)
+            _body_cache_bytes -= len(evicted)
+
+def _finish(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients may keep the body but must revalidate before reusing it
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+def snapshot_response(endpoint, build_payload, etag, last_modified=None, cache_key=None):
+    """JSON response with ETag/Last-Modified, a 304 for matching validators and gzip/br encoding.
+
+    build_payload is only called when the body is actually needed. Pass a
+    cache_key (normally the snapshot hash plus anything else in the body) to
+    keep the encoded bytes in memory for the next hit.
+    """
+    build_raw = lambda: current_app.json.dumps(build_payload()).encode("utf-8") + b"\n"
+    return _encoded_response(endpoint, build_raw, "application/json", etag, last_modified, cache_key)
+
+def html_response(endpoint, render, etag, last_modified=None, cache_key=None):
+    """snapshot_response for a rendered page; render returns the HTML text"""
+    build_raw = lambda: render().encode("utf-8")
+    return _encoded_response(endpoint, build_raw, "text/html", etag, last_modified, cache_key)
+
+def _encoded_response(endpoint, build_raw, mimetype, etag, last_modified, cache_key):
+    last_modified = _as_utc(last_modified)
+    if is_not_modified(etag, last_modified):
+        HTTP_RESPONSES.inc(endpoint=endpoint, outcome="not_modified")
+        return _finish(Response(status=304), etag, last_modified)
+
+    raw = _cache_get((cache_key, None)) if cache_key else None
+    if raw is None:
+        raw = build_raw()
+        if cache_key:
+            _cache_put((cache_key, None), raw)
+    encoding = choose_encoding(len(raw))
+    body = raw
+    if encoding:
+        body = _cache_get((cache_key, encoding)) if cache_key else None
+        if body is None:
+            body = encode(raw, encoding)
+            if cache_key:
+                _cache_put((cache_key, encoding), body)
+            HTTP_RESPONSES.inc(endpoint=endpoint, outcome="encoded")
+        else:
+            HTTP_RESPONSES.inc(endpoint=endpoint, outcome="cached")
+
+    response = Response(body, mimetype=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return _finish(response, etag, last_modified)
+
+def cache_stats():
+    with _body_cache_lock:
+        return {"entries": len(_body_cache), "bytes": _body_cache_bytes}
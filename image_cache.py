@@ -0,0 +1,253 @@
+"""Local cache for product gallery images.
+
+Only URLs registered from a stored snapshot can be fetched, so /img is not
+an open proxy. Each original is downloaded once and written to disk under
+its sha256; a background pool then writes resized JPEG and WebP variants
+next to it. Originals and variants never change once written, so they are
+served with long cache lifetimes.
+"""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+import pytz
+import config
+from model import ProductImage, SessionLocal
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+class ImageUnavailable(Exception):
+    """The original could not be fetched; retry_in is how long until it is tried again"""
+    def __init__(self, reason, retry_in):
+        self.reason = reason
+        self.retry_in = max(1, int(retry_in))
+        super().__init__(f"Image unavailable: {reason}")
+
+def image_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+def register_images(db, urls):
+    """Allow these URLs through /img; returns {url: key} for the ones that can be proxied"""
+    keys = {url: image_key(url) for url in urls if urlsplit(url).scheme in ("http", "https")}
+    if not keys:
+        return keys
+    known = {key for (key,) in db.query(ProductImage.key).filter(ProductImage.key.in_(list(keys.values())))}
+    for url, key in keys.items():
+        if key not in known:
+            db.add(ProductImage(key=key, url=url))
+            known.add(key)
+    db.commit()
+    return keys
+
+# Only raster formats are stored: /img serves from our own origin, and an SVG can carry script
+RASTER_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif", "image/avif"}
+
+def check_raster(data, content_type):
+    """Content type to store the bytes under; raises ValueError unless they are a raster image.
+
+    With Pillow installed the bytes must decode, and the type comes from the
+    decoded format rather than the upstream header.
+    """
+    if content_type == "image/jpg":
+        content_type = "image/jpeg"
+    if content_type not in RASTER_TYPES:
+        raise ValueError(f"not a raster image ({content_type or 'no content type'})")
+    if Image is None:
+        return content_type
+    try:
+        with Image.open(io.BytesIO(data)) as picture:
+            picture.verify()
+            detected = Image.MIME.get(picture.format)
+    except Exception as e:
+        raise ValueError(f"image does not decode ({e})")
+    if detected not in RASTER_TYPES:
+        raise ValueError(f"not a raster image ({detected or picture.format})")
+    return detected
+
+def variant_widths():
+    return sorted({config.IMAGE_THUMB_WIDTH, config.IMAGE_MAIN_WIDTH})
+
+class ImageCache:
+    def __init__(self, directory=None, workers=None):
+        self.directory = os.path.abspath(directory or config.IMAGE_CACHE_DIR)
+        self.executor = ThreadPoolExecutor(max_workers=workers or config.IMAGE_WORKERS, thread_name_prefix="image")
+        self.lock = threading.Lock()
+        self.fetch_locks = {}
+        self.pending_variants = set()
+
+    def original_path(self, content_hash):
+        return os.path.join(self.directory, content_hash[:2], content_hash)
+
+    def variant_path(self, content_hash, width, fmt):
+        return os.path.join(self.directory, content_hash[:2], f"{content_hash}_{width}.{fmt}")
+
+    def _write(self, path, data):
+        # Readers only ever see complete files
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _download(self, url):
+        import requests
+
+        with requests.get(url, stream=True, timeout=config.IMAGE_FETCH_TIMEOUT_SECONDS,
+                          headers={"User-Agent": "Mozilla/5.0"}) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type != "image/jpg" and content_type not in RASTER_TYPES:
+                raise ValueError(f"not a raster image ({content_type or 'no content type'})")
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data.extend(chunk)
+                if len(data) > config.IMAGE_MAX_BYTES:
+                    raise ValueError(f"larger than {config.IMAGE_MAX_BYTES} bytes")
+            return bytes(data), check_raster(bytes(data), content_type)
+
+    @contextmanager
+    def _fetch_lock(self, key):
+        """Serialize fetches of one key; the entry is dropped once nobody holds or waits for it"""
+        with self.lock:
+            entry = self.fetch_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.fetch_locks[key]
+
+    def ensure_original(self, db, image):
+        """Download the original unless it is already on disk; raises ImageUnavailable"""
+        if image.content_hash and os.path.exists(self.original_path(image.content_hash)):
+            return image
+        with self._fetch_lock(image.key):
+            db.refresh(image)
+            if image.content_hash and os.path.exists(self.original_path(image.content_hash)):
+                return image
+            now = datetime.now(pytz.timezone('Asia/Kolkata')).replace(tzinfo=None)
+            if image.failed_at and now - image.failed_at < timedelta(seconds=config.IMAGE_RETRY_SECONDS):
+                retry_in = config.IMAGE_RETRY_SECONDS - (now - image.failed_at).total_seconds()
+                raise ImageUnavailable(image.error, retry_in)
+            import requests
+
+            try:
+                data, content_type = self._download(image.url)
+            except (requests.RequestException, ValueError) as e:
+                image.error = str(e)[:500]
+                image.failed_at = now
+                db.commit()
+                print(f"❌ Failed to fetch image {image.url}: {e}")
+                raise ImageUnavailable(image.error, config.IMAGE_RETRY_SECONDS)
+            content_hash = hashlib.sha256(data).hexdigest()
+            self._write(self.original_path(content_hash), data)
+            image.content_hash = content_hash
+            image.content_type = content_type
+            image.size = len(data)
+            image.width = self._width(data)
+            image.error = None
+            image.failed_at = None
+            db.commit()
+        self.schedule_variants(image.content_hash)
+        return image
+
+    def _width(self, data):
+        if Image is None:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as picture:
+                return picture.width
+        except Exception:
+            return None
+
+    def schedule_variants(self, content_hash):
+        if Image is None:
+            return
+        with self.lock:
+            if content_hash in self.pending_variants:
+                return
+            self.pending_variants.add(content_hash)
+        self.executor.submit(self._make_variants, content_hash)
+
+    def _make_variants(self, content_hash):
+        try:
+            with Image.open(self.original_path(content_hash)) as picture:
+                picture.load()
+                if picture.mode not in ("RGB", "RGBA"):
+                    picture = picture.convert("RGBA" if "transparency" in picture.info else "RGB")
+                for width in variant_widths():
+                    if width >= picture.width:
+                        continue
+                    height = max(1, round(picture.height * width / picture.width))
+                    resized = picture.resize((width, height), Image.LANCZOS)
+                    for fmt in ("webp", "jpg"):
+                        path = self.variant_path(content_hash, width, fmt)
+                        if os.path.exists(path):
+                            continue
+                        out = io.BytesIO()
+                        if fmt == "webp":
+                            resized.save(out, "WEBP", quality=80, method=4)
+                        else:
+                            resized.convert("RGB").save(out, "JPEG", quality=82, optimize=True, progressive=True)
+                        self._write(path, out.getvalue())
+        except Exception as e:
+            print(f"❌ Failed to generate variants for image {content_hash[:12]}: {e}")
+        finally:
+            with self.lock:
+                self.pending_variants.discard(content_hash)
+
+    def warm(self, keys):
+        """Fetch originals (and so their variants) in the background before the browser asks for them"""
+        for key in keys:
+            self.executor.submit(self._warm_one, key)
+
+    def _warm_one(self, key):
+        db = SessionLocal()
+        try:
+            image = db.get(ProductImage, key)
+            if image is not None:
+                self.ensure_original(db, image)
+        except ImageUnavailable:
+            pass
+        except Exception as e:
+            print(f"❌ Failed to warm image {key}: {e}")
+        finally:
+            db.close()
+
+    def resolve(self, db, key, width=None, webp=False):
+        """(path, mimetype, final) for the best stored file, or None for an unregistered key.
+
+        final is False when a smaller variant is wanted but not generated yet
+        and the original is served in its place.
+        """
+        image = db.get(ProductImage, key)
+        if image is None:
+            return None
+        image = self.ensure_original(db, image)
+        original = (self.original_path(image.content_hash), image.content_type, True)
+        target = next((w for w in variant_widths() if width and w >= width), None)
+        if target is None or (image.width is not None and target >= image.width):
+            return original
+        for fmt, mimetype in ((("webp", "image/webp"),) if webp else ()) + (("jpg", "image/jpeg"),):
+            path = self.variant_path(image.content_hash, target, fmt)
+            if os.path.exists(path):
+                return path, mimetype, True
+        if Image is None:
+            return original
+        self.schedule_variants(image.content_hash)
+        return original[0], original[1], False
+
+    def stop(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+image_cache = ImageCache()
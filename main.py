@@ -1,29 +1,69 @@
-import requests, json
-from details_product import get_details_product, clean_unicode_text
+import json
+from details_product import get_details_product, clean_unicode_text, is_parse_failure
 from checkforready import ready_check
-from time import sleep
-from flask import Flask, jsonify, render_template, request
-from model import SessionLocal, Product, Job
+from time import sleep, monotonic
+from flask import Flask, Response, jsonify, render_template, request, send_file, stream_with_context, url_for
+from model import SessionLocal, Product, Job, Offer, ProductPriceStats, Watch
+from sqlalchemy import or_
 from datetime import datetime, timedelta
 import pytz
-from fetch_shortcode import get_shortcode
+from fetch_shortcode import FAILURE_PARSE, FAILURE_TIMEOUT
+from result_store import job_result, load_result, retention_worker, store_result
+from http_cache import html_response, make_etag, snapshot_response
+import catalog
+import search_index
+import price_history
+import watches
+import upstream
+from upstream import UpstreamUnavailable
+from deadline import DeadlineExceeded, job_deadline
+from memory_governor import memory_governor
+from ranked_queue import RankedQueue
+from offers import price_to_paise, serialize_offer, serialize_stats
+from product_view import build_view
+from image_cache import RASTER_TYPES, ImageUnavailable, image_cache, register_images
+from canonical_url import canonical_key, learn_alias, lookup_short_code
+from negative_cache import clear_failure, failure_response, lookup_failure, record_failure
+import config
+import metrics
+if config.RESOLVER == "async":
+    from async_resolver import resolve_shortcode, resolver as shortcode_resolver
+else:
+    from fetch_shortcode import resolve_shortcode
+    shortcode_resolver = None
+import profiler
+from metrics import CACHE_HITS, DEDUPES, FAILURES, IMAGE_REQUESTS, JOBS, QUEUE_DEPTH, RUNNING_JOBS, STAGE_SECONDS, timed
+from pagination import CursorError, decode_cursor, keyset_page, parse_limit, stream_ndjson
+import os
 import threading
+import hmac
 import uuid
 import queue
+from collections import deque
 from enum import Enum
 
 app = Flask(__name__)
 
-def send_completion_webhook(page_id, product_url):
+def send_completion_webhook(page_id, product_url, deadline=None):
     """Send webhook notification when a job is completed"""
-    webhook_url = "https://appdeals.in/webhook/flash-data"
+    import requests
+
+    webhook_url = config.WEBHOOK_URL
+    # An empty WEBHOOK_URL turns notifications off (batch runs do this by default)
+    if not webhook_url:
+        return False
     payload = {
         "pageId": page_id,
         "productUrl": product_url
     }
     
+    # The result is already stored, so an almost spent deadline still gets a second to notify
+    timeout = config.WEBHOOK_TIMEOUT_SECONDS
+    if deadline is not None:
+        timeout = min(timeout, max(1.0, deadline.remaining()))
     try:
-        response = requests.post(webhook_url, json=payload, timeout=10)
+        with timed("webhook"):
+            response = requests.post(webhook_url, json=payload, timeout=timeout)
         response.raise_for_status()
         print(f"✅ Webhook sent successfully for pageId: {page_id}")
         return True
@@ -31,23 +71,66 @@ def send_completion_webhook(page_id, product_url):
         print(f"❌ Failed to send webhook for pageId {page_id}: {e}")
         return False
 
+def find_fresh_product(db, product_url, max_age=None):
+    """Find a product scraped within max_age (the soft TTL by default) for this URL or any known variant of it"""
+    max_age = max_age or timedelta(seconds=config.PRODUCT_SOFT_TTL_SECONDS)
+    cutoff = datetime.now(pytz.timezone('Asia/Kolkata')) - max_age
+    product = db.query(Product).filter(
+        Product.productUrl == product_url,
+        Product.timestamp >= cutoff
+    ).first()
+    if product:
+        return product
+    short_code = lookup_short_code(db, product_url)
+    if not short_code:
+        return None
+    return db.query(Product).filter(
+        Product.shortCode == short_code,
+        Product.timestamp >= cutoff
+    ).order_by(Product.timestamp.desc()).first()
+
+def find_stale_product(db, product_url):
+    """A product past the soft TTL that is still within the hard TTL and has a stored result"""
+    product = find_fresh_product(db, product_url, timedelta(seconds=config.PRODUCT_HARD_TTL_SECONDS))
+    if product is None or not product.result_hash:
+        return None
+    return product
+
+def product_age_seconds(product):
+    timestamp = product.timestamp
+    if timestamp.tzinfo is None:
+        timestamp = pytz.timezone('Asia/Kolkata').localize(timestamp)
+    return max(0, int((datetime.now(pytz.utc) - timestamp).total_seconds()))
+
+# Lower numbers are taken first; background refreshes wait behind user requests
+PRIORITY_INTERACTIVE = 0
+PRIORITY_REFRESH = 10
+
 class JobStatus(Enum):
     PENDING = "pending"
     QUEUED = "queued"
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class JobQueueManager:
-    def __init__(self, max_concurrent_jobs=1, max_queue_size=100):
+    def __init__(self, max_concurrent_jobs=1, max_queue_size=100, job_cooldown_seconds=30):
         self.max_concurrent_jobs = max_concurrent_jobs
         self.max_queue_size = max_queue_size
-        self.job_queue = queue.Queue(maxsize=max_queue_size)
+        self.job_cooldown_seconds = job_cooldown_seconds
+        self.next_start_at = 0.0
+        self.job_queue = RankedQueue(maxsize=max_queue_size)
         self.running_jobs = {}
-        self.job_lock = threading.Lock()
+        # Re-entrant: add_job holds it while calling add_job_simple
+        self.job_lock = threading.RLock()
+        # Finish times of recent jobs, for queue ETAs
+        self.completions = deque(maxlen=20)
         self.worker_thread = None
         self.is_running = False
+        self.parked_on = []
+        self.deadlines = {}
         
     def start(self):
         """Start the job queue worker thread"""
@@ -69,14 +152,14 @@ class JobQueueManager:
         db = SessionLocal()
         try:
             existing_job = db.query(Job).filter(
-                Job.product_url == product_url,
+                or_(Job.product_url == product_url, Job.canonical_key == canonical_key(product_url)),
                 Job.status.in_([JobStatus.PENDING.value, JobStatus.QUEUED.value, JobStatus.PROCESSING.value])
             ).first()
             return existing_job
         finally:
             db.close()
     
-    def add_job_simple(self, job_id, product_url):
+    def add_job_simple(self, job_id, product_url, priority=PRIORITY_INTERACTIVE):
         """Add a job to the queue without deduplication check (for internal use)"""
         with self.job_lock:
             # Check if queue is full
@@ -100,11 +183,11 @@ class JobQueueManager:
             
             # Add to queue
             try:
-                self.job_queue.put_nowait((job_id, product_url))
-                print(f"Job {job_id} added to queue. Queue size: {self.job_queue.qsize()}")
+                position = self.job_queue.put_nowait(job_id, product_url, priority)
+                print(f"Job {job_id} added to queue at position {position}. Queue size: {self.job_queue.qsize()}")
                 return {
                     "success": True,
-                    "queue_position": self.job_queue.qsize(),
+                    "queue_position": position,
                     "message": "Job added to queue successfully"
                 }
             except queue.Full:
@@ -122,6 +205,7 @@ class JobQueueManager:
             existing_job = self.check_duplicate_job(product_url)
             if existing_job:
                 print(f"🔄 Duplicate job detected for URL: {product_url}")
+                DEDUPES.inc(endpoint="queue")
                 print(f"   Existing job ID: {existing_job.job_id}, Status: {existing_job.status}")
                 return {
                     "success": False,
@@ -138,41 +222,57 @@ class JobQueueManager:
         """Main worker loop that processes jobs from the queue"""
         while self.is_running:
             try:
-                job_id, product_url = self.job_queue.get(timeout=1)
+                # Wait for a free slot and the post-job cooldown before taking
+                # the next job, so queue order is preserved. The flash upstream's
+                # AIMD limit and the memory governor can only lower the configured concurrency.
+                limit = min(self.max_concurrent_jobs, upstream.FLASH.current_limit(), memory_governor.browser_limit())
+                if len(self.running_jobs) >= limit or monotonic() < self.next_start_at:
+                    sleep(0.1)
+                    continue
                 
-                if len(self.running_jobs) >= self.max_concurrent_jobs:
-                    self.job_queue.put((job_id, product_url))
+                # Park queued jobs while an upstream circuit is open rather than
+                # launching a browser that is bound to fail
+                blocked = upstream.open_circuits()
+                if blocked != self.parked_on:
+                    if blocked:
+                        print(f"⏸️ Parking queued jobs, upstream circuit open: {', '.join(blocked)}")
+                    else:
+                        print("▶️ Upstream circuits closed, resuming queued jobs")
+                    self.parked_on = blocked
+                if blocked:
                     sleep(1)
                     continue
                 
-                self._process_job(job_id, product_url)
-                
-                # Wait for the job to complete before processing the next one
-                if job_id in self.running_jobs:
-                    self.running_jobs[job_id].join()
-                    print(f"⏳ Job {job_id} completed. Waiting 30 seconds before processing next job...")
-                    sleep(30)  # Wait 30 seconds after each job completes
+                # Taken under the lock so a cancel sees the job either queued or running
+                with self.job_lock:
+                    job_id, product_url, priority = self.job_queue.get_nowait()
+                    self._process_job(job_id, product_url, priority)
                 
             except queue.Empty:
+                sleep(0.1)
                 continue
             except Exception as e:
                 print(f"Error in worker loop: {e}")
                 sleep(1)
     
-    def _process_job(self, job_id, product_url):
+    def _process_job(self, job_id, product_url, priority=PRIORITY_INTERACTIVE):
         """Process a single job"""
         with self.job_lock:
+            # The budget starts when the job leaves the queue and covers every stage
+            deadline = job_deadline()
+            self.deadlines[job_id] = deadline
             self.running_jobs[job_id] = threading.Thread(
                 target=self._execute_job, 
-                args=(job_id, product_url),
+                args=(job_id, product_url, priority, deadline),
                 daemon=True
             )
             self.running_jobs[job_id].start()
     
-    def _execute_job(self, job_id, product_url):
+    def _execute_job(self, job_id, product_url, priority, deadline):
         """Execute the actual job processing"""
         print(f"🚀 Starting job execution for {job_id} with URL: {product_url}")
         start_time = datetime.now()
+        requeued = False
         
         db = SessionLocal()
         try:
@@ -181,30 +281,27 @@ class JobQueueManager:
                 print(f"❌ Job {job_id} not found in database")
                 return
             
-            indian_tz = pytz.timezone('Asia/Kolkata')
-            one_day_ago = datetime.now(indian_tz) - timedelta(days=1)
-            existing_product = db.query(Product).filter(
-                Product.productUrl == product_url, 
-                Product.timestamp >= one_day_ago
-            ).first()
+            existing_product = find_fresh_product(db, product_url)
             
             if existing_product:
                 print(f"📋 Product already exists in database (within 1 day) - Page ID: {existing_product.shortCode}")
-                result = get_details_product(existing_product.shortCode)
+                CACHE_HITS.inc(endpoint="worker")
+                result = get_details_product(existing_product.shortCode, deadline)
                 page_id = existing_product.shortCode
                 
                 job.status = JobStatus.COMPLETED.value
-                job.result = result
+                job.result_hash = store_result(db, result)
                 job.page_id = page_id
                 job.completed_at = datetime.now(pytz.timezone('Asia/Kolkata'))
                 db.commit()
                 
                 # Send webhook notification
-                send_completion_webhook(page_id, product_url)
+                send_completion_webhook(page_id, product_url, deadline)
                 
                 end_time = datetime.now()
                 duration = (end_time - start_time).total_seconds()
                 print(f"✅ Job {job_id} completed successfully using existing product in {duration:.2f} seconds")
+                JOBS.inc(status="completed")
                 print(f"📊 Result type: {type(result)}, Page ID: {page_id}")
                 return
             
@@ -213,22 +310,54 @@ class JobQueueManager:
             print(f"📝 Job {job_id} status updated to PROCESSING")
             
             print(f"🔄 Calling product_details_api for {product_url}")
-            result, page_id = product_details_api(product_url)
+            def on_partial(page_id, snapshot, percent):
+                self._store_partial(job_id, page_id, snapshot, percent, start_time)
+            
+            result, page_id = product_details_api(
+                product_url, deadline, on_partial=on_partial if config.PARTIAL_RESULTS else None
+            )
             
             job.status = JobStatus.COMPLETED.value
-            job.result = result
+            job.result_hash = store_result(db, result)
             job.page_id = page_id
+            job.partial_hash = None
+            job.progress = 100
             job.completed_at = datetime.now(pytz.timezone('Asia/Kolkata'))
             db.commit()
             
             # Send webhook notification
-            send_completion_webhook(page_id, product_url)
+            send_completion_webhook(page_id, product_url, deadline)
             
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
             print(f"✅ Job {job_id} completed successfully in {duration:.2f} seconds")
+            JOBS.inc(status="completed")
             print(f"📊 Result type: {type(result)}, Page ID: {page_id}")
             
+        except DeadlineExceeded as e:
+            print(f"⏰ Job {job_id} stopped after {(datetime.now() - start_time).total_seconds():.2f} seconds: {e}")
+            FAILURES.inc(stage=e.stage, failure_class="cancelled" if e.cancelled else "deadline")
+            JOBS.inc(status="failed")
+            db.rollback()
+            if job:
+                job.status = JobStatus.CANCELLED.value if e.cancelled else JobStatus.FAILED.value
+                job.error = str(e)
+                job.completed_at = datetime.now(pytz.timezone('Asia/Kolkata'))
+                db.commit()
+        except UpstreamUnavailable as e:
+            # The circuit opened while the job ran: park it at the back of the queue
+            print(f"⏸️ Job {job_id} interrupted: {e}")
+            FAILURES.inc(stage="job", failure_class="upstream_unavailable")
+            db.rollback()
+            if job and self._requeue(job_id, product_url, priority):
+                job.status = JobStatus.QUEUED.value
+                requeued = True
+            elif job:
+                job.status = JobStatus.FAILED.value
+                job.error = str(e)
+                job.completed_at = datetime.now(pytz.timezone('Asia/Kolkata'))
+                JOBS.inc(status="failed")
+            db.commit()
         except Exception as e:
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
@@ -238,14 +367,79 @@ class JobQueueManager:
                 job.completed_at = datetime.now(pytz.timezone('Asia/Kolkata'))
                 db.commit()
             print(f"❌ Job {job_id} failed after {duration:.2f} seconds: {e}")
+            JOBS.inc(status="failed")
+            FAILURES.inc(stage="job", failure_class=type(e).__name__)
             import traceback
             print(f"🔍 Full error traceback:\n{traceback.format_exc()}")
         finally:
             db.close()
+            STAGE_SECONDS.observe((datetime.now() - start_time).total_seconds(), stage="job_total")
             with self.job_lock:
+                self.deadlines.pop(job_id, None)
+                if not requeued:
+                    self.completions.append(monotonic())
                 if job_id in self.running_jobs:
                     del self.running_jobs[job_id]
                     print(f"🧹 Job {job_id} removed from running jobs")
+                if self.job_cooldown_seconds:
+                    print(f"⏳ Job {job_id} completed. Waiting {self.job_cooldown_seconds:g} seconds before processing next job...")
+                    self.next_start_at = monotonic() + self.job_cooldown_seconds
+    
+    def _store_partial(self, job_id, page_id, snapshot, percent, start_time):
+        """Publish a partial snapshot on the job; failures only cost the early preview"""
+        db = SessionLocal()
+        try:
+            job = db.query(Job).filter(Job.job_id == job_id).first()
+            if not job:
+                return
+            first = job.partial_hash is None
+            job.partial_hash = store_result(db, snapshot)
+            job.page_id = page_id
+            job.progress = percent
+            job.partial_at = datetime.now(pytz.timezone('Asia/Kolkata'))
+            db.commit()
+            if first:
+                STAGE_SECONDS.observe((datetime.now() - start_time).total_seconds(), stage="first_partial")
+            print(f"🧩 Job {job_id} published a partial result at {percent}%")
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Failed to store partial result for job {job_id}: {e}")
+        finally:
+            db.close()
+    
+    def _requeue(self, job_id, product_url, priority):
+        try:
+            self.job_queue.put_nowait(job_id, product_url, priority)
+            return True
+        except queue.Full:
+            return False
+    
+    def jobs_per_second(self):
+        """Recent throughput from the spacing of job completions, or None before there is any"""
+        with self.job_lock:
+            completions = list(self.completions)
+        if len(completions) < 2 or completions[-1] <= completions[0]:
+            return None
+        return (len(completions) - 1) / (completions[-1] - completions[0])
+    
+    def position_info(self, job_id):
+        """A queued job's place in line and the estimated seconds until it starts"""
+        position = self.job_queue.position(job_id)
+        if position is None:
+            return None, None
+        rate = self.jobs_per_second()
+        return position, (round(position / rate, 1) if rate else None)
+    
+    def cancel_job(self, job_id):
+        """Drop a queued job or ask a running one to stop; returns "dequeued", "cancelling" or None"""
+        with self.job_lock:
+            if self.job_queue.remove(job_id):
+                return "dequeued"
+            deadline = self.deadlines.get(job_id)
+            if deadline is not None:
+                deadline.cancel()
+                return "cancelling"
+        return None
     
     def get_queue_status(self):
         """Get current queue status"""
@@ -256,10 +450,22 @@ class JobQueueManager:
                 "running_jobs": len(self.running_jobs),
                 "max_concurrent": self.max_concurrent_jobs,
                 "running_job_ids": list(self.running_jobs.keys()),
-                "queue_utilization": f"{(self.job_queue.qsize() / self.max_queue_size) * 100:.1f}%"
+                "running_job_deadlines": {job_id: round(deadline.remaining(), 1) for job_id, deadline in self.deadlines.items()},
+                "queue_utilization": f"{(self.job_queue.qsize() / self.max_queue_size) * 100:.1f}%",
+                "parked_on": list(self.parked_on),
+                "jobs_per_minute": round(self.jobs_per_second() * 60, 2) if self.jobs_per_second() else None,
+                "upstreams": upstream.snapshot(),
+                "memory": memory_governor.snapshot(),
+                "resolver": shortcode_resolver.snapshot() if shortcode_resolver else {"mode": "sync"}
             }
 
-job_queue_manager = JobQueueManager(max_concurrent_jobs=1, max_queue_size=100)
+job_queue_manager = JobQueueManager(
+    max_concurrent_jobs=config.MAX_CONCURRENT_JOBS,
+    max_queue_size=config.MAX_QUEUE_SIZE,
+    job_cooldown_seconds=config.JOB_COOLDOWN_SECONDS
+)
+QUEUE_DEPTH.set_function(lambda: job_queue_manager.job_queue.qsize())
+RUNNING_JOBS.set_function(lambda: len(job_queue_manager.running_jobs))
 
 @app.after_request
 def add_cors_headers(response):
@@ -268,21 +474,71 @@ def add_cors_headers(response):
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
     return response
 
-def product_details_api(product_url):
+def fetch_partial(pageId, readiness, deadline):
+    """Details snapshot taken before the product is ready, or None while it has nothing usable yet.
+
+    The fetch runs on the readiness sub-budget; running that out only skips the
+    snapshot, since the final details fetch still has its own reserve.
+    """
+    if readiness.remaining() < config.PARTIAL_MIN_BUDGET_SECONDS:
+        return None
+    try:
+        snapshot = get_details_product(pageId, readiness)
+    except UpstreamUnavailable:
+        raise
+    except DeadlineExceeded as e:
+        if e.cancelled or deadline.expired():
+            raise
+        return None
+    except Exception as e:
+        print(f"⚠️ Partial fetch failed for pageId {pageId}: {e}")
+        return None
+    return None if is_parse_failure(snapshot) else snapshot
+
+def poll_readiness(pageId, readiness, deadline):
+    """ready_check on the readiness sub-budget, or None once that budget is spent.
+
+    Only a cancel or the job's own deadline fails the job; the details
+    fetch after polling still has its reserve.
+    """
+    if readiness.expired() and not deadline.expired():
+        return None
+    try:
+        return ready_check(pageId, readiness)
+    except DeadlineExceeded as e:
+        if e.cancelled or deadline.expired():
+            raise
+        return None
+
+def product_details_api(product_url, deadline=None, on_partial=None):
         print(f"🔗 Starting product_details_api for URL: {product_url}")
         start_time = datetime.now()
+        deadline = deadline or job_deadline()
         
         print(f"📱 Calling get_shortcode for: {product_url}")
         shortcode_start = datetime.now()
-        pageId = get_shortcode(product_url)
+        # The browser redirect is the expensive call, so it is what the flash circuit
+        # protects, and it only starts once the host has memory for another browser
+        with memory_governor.browser_slot(deadline), upstream.FLASH.call() as call:
+            pageId, failure_class = resolve_shortcode(product_url, deadline)
+            if failure_class == FAILURE_TIMEOUT:
+                call.fail()
         shortcode_duration = (datetime.now() - shortcode_start).total_seconds()
         print(f"📱 get_shortcode completed in {shortcode_duration:.2f} seconds")
         print(f"📱 Page ID: {pageId}")
         
+        if not pageId:
+            print(f"❌ No pageId extracted from URL: {product_url}")
+            error = 'Could not extract pageId from URL. The URL might not be a valid product URL or Flash.co could not process it.'
+            remember_failure(product_url, failure_class, error)
+            return {'error': error}, None
+        
         try:
             print(f"🔍 Checking readiness for product {pageId}")
+            # Polling stops early enough to leave the details fetch its full timeout
+            readiness = deadline.child(config.READINESS_MAX_SECONDS, reserve=config.DETAILS_TIMEOUT_SECONDS)
             readiness_start = datetime.now()
-            percentage = ready_check(pageId)
+            percentage = poll_readiness(pageId, readiness, deadline)
             readiness_duration = (datetime.now() - readiness_start).total_seconds()
             print(f"🔍 Initial readiness check completed in {readiness_duration:.2f} seconds: {percentage}%")
             
@@ -291,42 +547,66 @@ def product_details_api(product_url):
                 print(f"🔍 No product detail steps found, setting percentage to 100%")
             else:
                 wait_count = 0
-                while percentage < 90:
+                last_partial_percent = None
+                last_partial_at = 0.0
+                # None means the poll itself failed; keep polling until the circuit opens
+                while percentage is None or percentage < 90:
+                    sleep(min(1, readiness.remaining()))
+                    if readiness.expired():
+                        print(f"⏰ Readiness budget spent after {wait_count} attempts, proceeding with current percentage: {percentage}%")
+                        break
                     wait_count += 1
                     print(f"⏳ Waiting for product to load... {percentage}% (attempt {wait_count})")
                     readiness_start = datetime.now()
-                    percentage = ready_check(pageId)
+                    percentage = poll_readiness(pageId, readiness, deadline)
                     readiness_duration = (datetime.now() - readiness_start).total_seconds()
                     print(f"⏳ Readiness check {wait_count} completed in {readiness_duration:.2f} seconds: {percentage}%")
-                    sleep(1)
                     
-                    if wait_count > 60:
-                        print(f"⏰ Timeout reached after {wait_count} attempts, proceeding with current percentage: {percentage}%")
-                        break
+                    # Flash fills the page in as readiness climbs; publish what is there so far
+                    if (on_partial and isinstance(percentage, (int, float))
+                            and config.PARTIAL_MIN_PERCENT <= percentage < 90
+                            and (last_partial_percent is None or percentage > last_partial_percent)
+                            and monotonic() - last_partial_at >= config.PARTIAL_INTERVAL_SECONDS):
+                        last_partial_percent, last_partial_at = percentage, monotonic()
+                        snapshot = fetch_partial(pageId, readiness, deadline)
+                        if snapshot is not None:
+                            on_partial(pageId, snapshot, int(percentage))
+        except (UpstreamUnavailable, DeadlineExceeded):
+            raise
         except Exception as e:
                 print(f"❌ Error during readiness check: {e}")
-                return {'error': f'Failed to check readiness attempts: {str(e)}'}
-        if pageId:
-            print(f"📊 Processing product with pageId: {pageId}")
-            product_details = get_details_product(pageId)
+                return {'error': f'Failed to check readiness attempts: {str(e)}'}, pageId
+        print(f"📊 Processing product with pageId: {pageId}")
+        product_details = get_details_product(pageId, deadline)
+        if is_parse_failure(product_details):
+            print(f"❌ Could not parse product details for pageId: {pageId}")
+            remember_failure(product_url, FAILURE_PARSE, f'Could not parse product details for pageId {pageId}', short_code=pageId, stage="parse")
+            return product_details, pageId
+        with timed("db_write"):
             try:
                 short_code = pageId
                 db = SessionLocal()
                 try:
                     indian_tz = pytz.timezone('Asia/Kolkata')
                     timestamp = datetime.now(indian_tz)
-                    
+                
+                    snapshot_hash = store_result(db, product_details)
+                    catalog.record_snapshot(db, short_code, product_details, timestamp)
+                    learn_alias(db, product_url, short_code)
+                    clear_failure(db, product_url)
                     existing_product = db.query(Product).filter(Product.productUrl == product_url).first()
                     if existing_product:
                         existing_product.shortCode = short_code
                         existing_product.timestamp = timestamp
+                        existing_product.result_hash = snapshot_hash
                         db.commit()
                         print(f"Product updated: ID={existing_product.id}, Code={short_code}")
                     else:
                         product = Product(
                             productUrl=product_url,
                             shortCode=short_code,
-                            timestamp=timestamp
+                            timestamp=timestamp,
+                            result_hash=snapshot_hash
                         )
                         db.add(product)
                         db.commit()
@@ -339,17 +619,184 @@ def product_details_api(product_url):
                     db.close()       
             except Exception as e:
                     print(f"❌ Database operation failed: {e}")
-            return product_details, pageId
-        else:
-            print(f"❌ No pageId extracted from URL: {product_url}")
-            return {'error': f'Could not extract pageId from URL. The URL might not be a valid product URL or Flash.co could not process it.'}, None
+        return product_details, pageId
+
+def remember_failure(product_url, failure_class, error, short_code=None, stage="resolve"):
+    """Negative-cache a failed resolution so repeat requests fail fast"""
+    FAILURES.inc(stage=stage, failure_class=failure_class)
+    db = SessionLocal()
+    try:
+        record_failure(db, product_url, failure_class, error)
+        if short_code:
+            learn_alias(db, product_url, short_code)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Failed to record negative cache entry: {e}")
+    finally:
+        db.close()
+
+def cached_failure_response(db, product_url):
+    """Return a 422 response if this URL is negative-cached, else None"""
+    entry = lookup_failure(db, product_url)
+    if entry is None:
+        return None
+    body, retry_in = failure_response(entry)
+    response = jsonify(body)
+    response.status_code = 422
+    response.headers['Retry-After'] = str(retry_in)
+    return response
+
+def enqueue_job(db, product_url, priority=PRIORITY_INTERACTIVE):
+    """Queue a job unless one for the URL is already pending; returns its job id, or None if the queue is full"""
+    existing_job = job_queue_manager.check_duplicate_job(product_url)
+    if existing_job:
+        return existing_job.job_id
+    job_id = str(uuid.uuid4())
+    db.add(Job(
+        job_id=job_id,
+        product_url=product_url,
+        canonical_key=canonical_key(product_url),
+        status=JobStatus.PENDING.value
+    ))
+    db.commit()
+    if job_queue_manager.add_job_simple(job_id, product_url, priority=priority)["success"]:
+        return job_id
+    db.query(Job).filter(Job.job_id == job_id).delete()
+    db.commit()
+    return None
+
+def enqueue_refresh(db, product_url):
+    """Queue a low-priority refresh for a stale product; returns its job id or None"""
+    job_id = enqueue_job(db, product_url, priority=PRIORITY_REFRESH)
+    # A full queue only delays the refresh; the stale result is still served
+    if job_id:
+        print(f"🔄 Background refresh {job_id} for stale product: {product_url}")
+    return job_id
+
+def mark_stale(response, product, refresh_job_id):
+    response.headers['X-Cache-Status'] = 'stale'
+    response.headers['Age'] = str(product_age_seconds(product))
+    if refresh_job_id:
+        response.headers['X-Refresh-Job'] = refresh_job_id
+    return response
+
+def cached_product_response(db, product):
+    """Serve a fresh product's stored snapshot with validators instead of refetching it upstream"""
+    def build_payload():
+        result = load_result(db, product.result_hash)
+        if result is None:
+            result = get_details_product(product.shortCode)
+        return result
+    etag = make_etag("api", product.shortCode, product.result_hash)
+    return snapshot_response("api", build_payload, etag, product.timestamp, cache_key=etag)
+
+def gallery_images(db, images):
+    """Main and thumbnail sources for each gallery image, through /img when the proxy is on"""
+    if not config.IMAGE_PROXY:
+        return [{"src": url, "thumb": url} for url in images]
+    keys = register_images(db, images)
+    # Rendering happens once per snapshot, so this is when the originals are first fetched
+    image_cache.warm(dict.fromkeys(keys.values()))
+    return [
+        {
+            "src": url_for("image", key=keys[url], w=config.IMAGE_MAIN_WIDTH),
+            "thumb": url_for("image", key=keys[url], w=config.IMAGE_THUMB_WIDTH),
+        } if url in keys else {"src": url, "thumb": url}
+        for url in images
+    ]
+
+def rendered_product_response(db, product, product_url):
+    """The product page rendered from its stored snapshot; the HTML is cached per snapshot hash"""
+    def render():
+        result = load_result(db, product.result_hash) if product.result_hash else None
+        if result is None:
+            result = get_details_product(product.shortCode)
+        view_model = build_view(result)
+        if view_model is None:
+            return render_template("progress.html", url=product_url, job_id=None,
+                                   error="Stored details for this product could not be read")
+        view_model["gallery"] = gallery_images(db, view_model["images"])
+        return render_template("product.html", url=product_url, view=view_model)
+    # A refresh stores a new snapshot hash, which moves the page to a new cache entry
+    etag = make_etag("view", product.shortCode, product.result_hash, product_url, config.IMAGE_PROXY)
+    cache_key = etag if product.result_hash else None
+    return html_response("view", render, etag, product.timestamp, cache_key)
+
+@app.route("/img/<key>", methods=["GET"])
+def image(key):
+    """A registered gallery image from the local cache; ?w= picks the smallest stored width that covers it"""
+    width = request.args.get("w", type=int)
+    db = SessionLocal()
+    try:
+        found = image_cache.resolve(db, key, width, webp=request.accept_mimetypes["image/webp"] > 0)
+        if found is None:
+            IMAGE_REQUESTS.inc(outcome="failed")
+            return jsonify({"error": "Unknown image"}), 404
+        path, mimetype, final = found
+        IMAGE_REQUESTS.inc(outcome="fallback" if not final else "variant" if "_" in os.path.basename(path) else "original")
+        # Until the resized variant exists, the original is served briefly so the next load can pick it up
+        # Anything that is not a known raster type (an SVG stored before the check) is only offered as a download
+        attachment = mimetype not in RASTER_TYPES
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True,
+                             as_attachment=attachment, download_name=key if attachment else None,
+                             max_age=config.IMAGE_MAX_AGE_SECONDS if final else 60)
+        if final:
+            response.headers["Cache-Control"] += ", immutable"
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.vary.add("Accept")
+        return response
+    except ImageUnavailable as e:
+        IMAGE_REQUESTS.inc(outcome="failed")
+        response = jsonify({"error": str(e), "retry_after_seconds": e.retry_in})
+        response.status_code = 502
+        response.headers["Retry-After"] = str(e.retry_in)
+        return response
+    except Exception as e:
+        return jsonify({"error": f"Failed to serve image: {str(e)}"}), 500
+    finally:
+        db.close()
+
+def progress_page(product_url, job_id=None, error=None, status=202, retry_after=None):
+    headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+    return render_template("progress.html", url=product_url, job_id=job_id, error=error), status, headers
 
 @app.route("/view", methods=["GET"]) 
 def view():
     product_url = request.args.get("url")
     if not product_url:
         return jsonify({"error": "Missing required parameter 'url'"}), 400
-    return render_template("response.html", url=product_url)
+    # The original viewer that fetches /api and renders in the browser
+    if request.args.get("client", "false").lower() == "true":
+        return render_template("response.html", url=product_url)
+    
+    db = SessionLocal()
+    try:
+        existing_product = find_fresh_product(db, product_url)
+        if existing_product:
+            CACHE_HITS.inc(endpoint="view")
+            return rendered_product_response(db, existing_product, product_url)
+        
+        stale_product = find_stale_product(db, product_url)
+        if stale_product:
+            CACHE_HITS.inc(endpoint="view_stale")
+            refresh_job_id = enqueue_refresh(db, product_url)
+            return mark_stale(rendered_product_response(db, stale_product, product_url), stale_product, refresh_job_id)
+        
+        entry = lookup_failure(db, product_url)
+        if entry is not None:
+            body, retry_in = failure_response(entry)
+            return progress_page(product_url, error=body["error"], status=422, retry_after=retry_in)
+        
+        # Cold URL: a small page that follows the job and reloads into the rendered view
+        job_id = enqueue_job(db, product_url)
+        if job_id is None:
+            return progress_page(product_url, error="The queue is full, please try again shortly", status=503)
+        return progress_page(product_url, job_id)
+    except Exception as e:
+        return jsonify({"error": f"Failed to render product view: {str(e)}"}), 500
+    finally:
+        db.close()
 
 @app.route("/api", methods=["GET"]) 
 def api():
@@ -364,31 +811,44 @@ def api():
     try:      
         if use_job:
             # Check if product already exists within the last day
-            indian_tz = pytz.timezone('Asia/Kolkata')
-            one_day_ago = datetime.now(indian_tz) - timedelta(days=1)
-            existing_product = db.query(Product).filter(
-                Product.productUrl == productUrl, 
-                Product.timestamp >= one_day_ago
-            ).first()
+            existing_product = find_fresh_product(db, productUrl)
             
             if existing_product:
                 print(f"Product already exists in database (within 1 day) - Page ID: {existing_product.shortCode}")
-                result = get_details_product(existing_product.shortCode)
+                CACHE_HITS.inc(endpoint="api")
                 if updater == "true":
                     return jsonify({"pageid": existing_product.shortCode}), 200
                 if use_job == "true":
                     return jsonify({"pageid": existing_product.shortCode}), 200
+                if existing_product.result_hash:
+                    return cached_product_response(db, existing_product)
+                result = get_details_product(existing_product.shortCode)
                 return jsonify(result), 200
             
+            # Past the soft TTL: answer with the stored result straight away and refresh it in the background
+            stale_product = find_stale_product(db, productUrl)
+            if stale_product:
+                CACHE_HITS.inc(endpoint="api_stale")
+                refresh_job_id = enqueue_refresh(db, productUrl)
+                if updater == "true":
+                    return mark_stale(jsonify({"pageid": stale_product.shortCode}), stale_product, refresh_job_id), 200
+                return mark_stale(cached_product_response(db, stale_product), stale_product, refresh_job_id)
+            
+            # Fail fast on URLs that recently failed to resolve
+            failure = cached_failure_response(db, productUrl)
+            if failure is not None:
+                return failure
+            
             # Check for duplicate jobs before creating a new one
             existing_job = job_queue_manager.check_duplicate_job(productUrl)
             if existing_job:
+                DEDUPES.inc(endpoint="api")
                 return jsonify({
                     "job_id": existing_job.job_id,
                     "status": existing_job.status,
                     "message": "A job for this URL is already pending, queued, or processing",
                     "duplicate": True,
-                    "queue_position": job_queue_manager.get_queue_status()["queue_size"]
+                    "queue_position": job_queue_manager.job_queue.position(existing_job.job_id)
                 }), 409  # Conflict status code
             
             # Product doesn't exist, create a new job
@@ -396,6 +856,7 @@ def api():
             job = Job(
                 job_id=job_id,
                 product_url=productUrl,
+                canonical_key=canonical_key(productUrl),
                 status=JobStatus.PENDING.value
             )
             db.add(job)
@@ -418,6 +879,9 @@ def api():
                 }), 503  # Service unavailable
         else:
             # Synchronous processing (for backward compatibility)
+            failure = cached_failure_response(db, productUrl)
+            if failure is not None:
+                return failure
             result, pageId = product_details_api(productUrl)
             if isinstance(result, str):
                 try:
@@ -428,7 +892,13 @@ def api():
             if updater == "true":
                 return jsonify({"pageid": pageId}), 200
             return jsonify(result), 200
-        
+    except DeadlineExceeded as e:
+        return jsonify({"error": str(e), "stage": e.stage}), 504
+    except UpstreamUnavailable as e:
+        response = jsonify({"error": str(e), "upstream": e.upstream, "retry_after_seconds": e.retry_in})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_in)
+        return response
     finally:
         db.close()
 
@@ -452,17 +922,39 @@ def get_job_status(job_id):
             
             if job.status in [JobStatus.PENDING.value, JobStatus.QUEUED.value]:
                 queue_status = job_queue_manager.get_queue_status()
+                position, eta_seconds = job_queue_manager.position_info(job.job_id)
                 response_data["queue_info"] = {
-                    "queue_position": queue_status["queue_size"],
+                    "queue_position": position,
+                    "eta_seconds": eta_seconds,
+                    "queue_size": queue_status["queue_size"],
                     "running_jobs": queue_status["running_jobs"],
                     "max_concurrent": queue_status["max_concurrent"]
                 }
             
             if job.status == JobStatus.COMPLETED.value:
-                response_data["result"] = job.result
-                response_data["page_id"] = job.page_id
-            elif job.status == JobStatus.FAILED.value:
+                # Finished jobs never change, so repeat polls can revalidate instead of refetching
+                def build_completed():
+                    response_data["result"] = job_result(db, job)
+                    response_data["page_id"] = job.page_id
+                    response_data["completeness"] = "complete"
+                    return response_data
+                etag = make_etag("status", job.job_id, job.status, job.result_hash, job.completed_at)
+                cache_key = etag if job.result_hash else None
+                return snapshot_response("status", build_completed, etag, job.completed_at, cache_key)
+            elif job.status == JobStatus.PROCESSING.value and job.partial_hash:
+                # What Flash has prepared so far; replaced by the full result when the job completes
+                def build_partial():
+                    response_data["partial_result"] = load_result(db, job.partial_hash)
+                    response_data["page_id"] = job.page_id
+                    response_data["completeness"] = "partial"
+                    response_data["progress"] = job.progress
+                    return response_data
+                etag = make_etag("status", job.job_id, job.status, job.partial_hash, job.progress)
+                return snapshot_response("status", build_partial, etag, job.partial_at, cache_key=etag)
+            elif job.status in [JobStatus.FAILED.value, JobStatus.CANCELLED.value]:
                 response_data["error"] = job.error
+                etag = make_etag("status", job.job_id, job.status, job.error, job.completed_at)
+                return snapshot_response("status", lambda: response_data, etag, job.completed_at)
             
             return jsonify(response_data), 200
         finally:
@@ -470,59 +962,93 @@ def get_job_status(job_id):
     except Exception as e:
         return jsonify({"error": f"Failed to fetch job status: {str(e)}"}), 500
 
+def serialize_job(job):
+    job_data = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "product_url": job.product_url,
+        "created_at": job.created_at.isoformat(),
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None
+    }
+    if job.status == "completed":
+        job_data["page_id"] = job.page_id
+    elif job.status == "failed":
+        job_data["error"] = job.error
+    return job_data
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'productUrl': product.productUrl,
+        'shortCode': product.shortCode,
+        'timestamp': product.timestamp.isoformat()
+    }
+
+def wants_ndjson():
+    """Stream NDJSON when asked via ?format=ndjson or the Accept header"""
+    if request.args.get("format") == "ndjson":
+        return True
+    return request.accept_mimetypes.best == "application/x-ndjson"
+
 @app.route("/jobs", methods=["GET"])
 def get_jobs():
-    """Get all jobs with optional status filter"""
+    """Get jobs newest-first with optional status filter, paginated by cursor"""
+    status_filter = request.args.get("status")
+    cursor = request.args.get("cursor")
+
+    def build_query(db):
+        query = db.query(Job)
+        if status_filter:
+            query = query.filter(Job.status == status_filter)
+        return query
+
     try:
+        if wants_ndjson():
+            if cursor:
+                # Validate up front; errors inside the stream can't change the status code
+                decode_cursor(cursor)
+            lines = stream_ndjson(SessionLocal, build_query, Job.created_at, Job.id, serialize_job, cursor)
+            return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+        limit = parse_limit(request.args.get("limit", 50))
         db = SessionLocal()
         try:
-            status_filter = request.args.get("status")
-            query = db.query(Job)
-            
-            if status_filter:
-                query = query.filter(Job.status == status_filter)
-            
-            jobs = query.order_by(Job.created_at.desc()).limit(50).all()
-            
-            job_list = []
-            for job in jobs:
-                job_data = {
-                    "job_id": job.job_id,
-                    "status": job.status,
-                    "product_url": job.product_url,
-                    "created_at": job.created_at.isoformat(),
-                    "completed_at": job.completed_at.isoformat() if job.completed_at else None
-                }
-                if job.status == "completed":
-                    job_data["page_id"] = job.page_id
-                elif job.status == "failed":
-                    job_data["error"] = job.error
-                
-                job_list.append(job_data)
-            
-            return jsonify({"jobs": job_list}), 200
+            jobs, next_cursor = keyset_page(build_query(db), Job.created_at, Job.id, cursor, limit)
+            return jsonify({
+                "jobs": [serialize_job(job) for job in jobs],
+                "next_cursor": next_cursor
+            }), 200
         finally:
             db.close()
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Failed to fetch jobs: {str(e)}"}), 500
 
 @app.route("/products", methods=["GET"])
 def get_products():
+    """Get products newest-first, paginated by cursor or streamed as NDJSON"""
+    cursor = request.args.get("cursor")
     try:
+        if wants_ndjson():
+            if cursor:
+                # Validate up front; errors inside the stream can't change the status code
+                decode_cursor(cursor)
+            lines = stream_ndjson(SessionLocal, lambda db: db.query(Product), Product.timestamp, Product.id, serialize_product, cursor)
+            return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+        limit = parse_limit(request.args.get("limit"))
         db = SessionLocal()
         try:
-            products = db.query(Product).all()
-            product_list = []
-            for product in products:
-                product_list.append({
-                    'id': product.id,
-                    'productUrl': product.productUrl,
-                    'shortCode': product.shortCode,
-                    'timestamp': product.timestamp.isoformat()
-                })
-            return jsonify({'products': product_list}), 200
+            products, next_cursor = keyset_page(db.query(Product), Product.timestamp, Product.id, cursor, limit)
+            return jsonify({
+                'products': [serialize_product(product) for product in products],
+                'next_cursor': next_cursor
+            }), 200
         finally:
             db.close()
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch products: {str(e)}'}), 500
 
@@ -533,12 +1059,8 @@ def get_product_by_code(short_code):
         try:
             product = db.query(Product).filter(Product.shortCode == short_code).first()
             if product:
-                return jsonify({
-                    'id': product.id,
-                    'productUrl': product.productUrl,
-                    'shortCode': product.shortCode,
-                    'timestamp': product.timestamp.isoformat()
-                }), 200
+                etag = make_etag("product", product.id, product.result_hash, product.timestamp)
+                return snapshot_response("product", lambda: serialize_product(product), etag, product.timestamp)
             else:
                 return jsonify({'error': 'Product not found'}), 404
         finally:
@@ -546,6 +1068,218 @@ def get_product_by_code(short_code):
     except Exception as e:
         return jsonify({'error': f'Failed to fetch product: {str(e)}'}), 500
 
+@app.route("/products/<short_code>/offers", methods=["GET"])
+def get_product_offers(short_code):
+    """Current per-store offers and price summary for a product, cheapest first"""
+    try:
+        db = SessionLocal()
+        try:
+            stats = db.get(ProductPriceStats, short_code)
+            if stats is None:
+                return jsonify({'error': 'No offers indexed for this product'}), 404
+            product_offers = db.query(Offer).filter(Offer.page_id == short_code).order_by(
+                Offer.in_stock.desc(), Offer.price_paise.is_(None), Offer.price_paise
+            ).all()
+            return jsonify({
+                'stats': serialize_stats(stats),
+                'offers': [serialize_offer(offer) for offer in product_offers]
+            }), 200
+        finally:
+            db.close()
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch offers: {str(e)}'}), 500
+
+def parse_history_time(value, default):
+    """ISO date or datetime query parameter; naive values are India time"""
+    if not value:
+        return default
+    try:
+        return price_history.to_epoch(datetime.fromisoformat(value))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+
+@app.route("/products/<short_code>/history", methods=["GET"])
+def get_price_history(short_code):
+    """Price history per store between ?from= and ?to= at raw, hour or day resolution"""
+    try:
+        end = parse_history_time(request.args.get("to"), int(datetime.now(pytz.utc).timestamp()))
+        start = parse_history_time(request.args.get("from"), end - 30 * 86400)
+        if start > end:
+            return jsonify({'error': "'from' must not be after 'to'"}), 400
+        resolution = request.args.get("resolution") or price_history.choose_resolution(start, end)
+        if resolution not in ("raw", "hour", "day"):
+            return jsonify({'error': "resolution must be raw, hour or day"}), 400
+        store = request.args.get("store")
+        db = SessionLocal()
+        try:
+            series = price_history.query_history(db, short_code, start, end, resolution, store.upper() if store else None)
+        finally:
+            db.close()
+        if resolution == "raw":
+            columns = ["time", "price_paise"]
+        else:
+            columns = ["time", "min_paise", "max_paise", "last_paise"]
+        return jsonify({
+            'page_id': short_code,
+            'resolution': resolution,
+            'from': price_history.from_epoch(start).isoformat(),
+            'to': price_history.from_epoch(end).isoformat(),
+            'columns': columns,
+            'series': {
+                series_store: [[price_history.from_epoch(point[0]).isoformat(), *point[1:]] for point in points]
+                for series_store, points in series.items()
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch price history: {str(e)}'}), 500
+
+@app.route("/watches", methods=["POST"])
+def create_watch():
+    """Watch a product for a price at or below a threshold, at one store or any store"""
+    data = request.get_json(silent=True) or {}
+    try:
+        threshold = data.get("threshold_paise")
+        if threshold is None:
+            threshold = price_to_paise(data.get("threshold"))
+        if threshold is None or int(threshold) <= 0:
+            return jsonify({'error': "Missing or invalid 'threshold' (rupees) or 'threshold_paise'"}), 400
+        db = SessionLocal()
+        try:
+            page_id = data.get("page_id")
+            if not page_id and data.get("url"):
+                page_id = lookup_short_code(db, data["url"])
+                if not page_id:
+                    return jsonify({'error': 'Unknown product URL; fetch it through /api first'}), 404
+            if not page_id:
+                return jsonify({'error': "Missing required field 'page_id' or 'url'"}), 400
+            # A custom webhook target is an outbound request from this host, so only admins may set one
+            if data.get("webhook_url") and not admin_allowed():
+                return jsonify({'error': "Only admins may set 'webhook_url'"}), 403
+            watch = Watch(
+                page_id=page_id,
+                store=(data.get("store") or watches.ANY_STORE).upper(),
+                threshold_paise=int(threshold),
+                webhook_url=data.get("webhook_url"),
+                label=data.get("label")
+            )
+            db.add(watch)
+            db.flush()
+            watches.evaluate_watch(db, watch)
+            db.commit()
+            db.refresh(watch)
+            return jsonify(watches.serialize_watch(watch)), 201
+        finally:
+            db.close()
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid watch: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to create watch: {str(e)}'}), 500
+
+@app.route("/watches", methods=["GET"])
+def get_watches():
+    """Watches newest-first, optionally for one product, paginated by cursor"""
+    page_id = request.args.get("page_id")
+    try:
+        limit = parse_limit(request.args.get("limit", 50))
+        db = SessionLocal()
+        try:
+            query = db.query(Watch)
+            if page_id:
+                query = query.filter(Watch.page_id == page_id)
+            rows, next_cursor = keyset_page(query, Watch.created_at, Watch.id, request.args.get("cursor"), limit)
+            return jsonify({
+                'watches': [watches.serialize_watch(watch) for watch in rows],
+                'next_cursor': next_cursor
+            }), 200
+        finally:
+            db.close()
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch watches: {str(e)}'}), 500
+
+@app.route("/watches/<int:watch_id>", methods=["GET", "DELETE"])
+def watch_detail(watch_id):
+    """Fetch or delete a watch"""
+    try:
+        db = SessionLocal()
+        try:
+            watch = db.get(Watch, watch_id)
+            if watch is None:
+                return jsonify({'error': 'Watch not found'}), 404
+            if request.method == "DELETE":
+                db.delete(watch)
+                db.commit()
+                return jsonify({'deleted': watch_id}), 200
+            return jsonify(watches.serialize_watch(watch)), 200
+        finally:
+            db.close()
+    except Exception as e:
+        return jsonify({'error': f'Failed to access watch: {str(e)}'}), 500
+
+@app.route("/search", methods=["GET"])
+def search_products():
+    """Full-text search over indexed products, ranked by BM25 and paginated by cursor"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({'error': "Missing required parameter 'q'"}), 400
+    try:
+        limit = parse_limit(request.args.get("limit", 20))
+        db = SessionLocal()
+        try:
+            results, next_cursor = search_index.search(db, query, limit, request.args.get("cursor"))
+            return jsonify({'query': query, 'results': results, 'next_cursor': next_cursor}), 200
+        finally:
+            db.close()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to search products: {str(e)}'}), 500
+
+@app.route("/cheapest", methods=["GET"])
+def get_cheapest():
+    """Cheapest products, or with ?store= the cheapest offers at that store, answered from the offers index"""
+    store = request.args.get("store")
+    include_out_of_stock = request.args.get("in_stock", "true").lower() != "true"
+    try:
+        limit = parse_limit(request.args.get("limit", 20))
+        min_price = price_to_paise(request.args.get("min_price"))
+        max_price = price_to_paise(request.args.get("max_price"))
+        db = SessionLocal()
+        try:
+            if store:
+                query = db.query(Offer, ProductPriceStats.name).outerjoin(
+                    ProductPriceStats, ProductPriceStats.page_id == Offer.page_id
+                ).filter(Offer.store == store.upper(), Offer.price_paise.isnot(None))
+                if not include_out_of_stock:
+                    query = query.filter(Offer.in_stock.is_(True))
+                if min_price is not None:
+                    query = query.filter(Offer.price_paise >= min_price)
+                if max_price is not None:
+                    query = query.filter(Offer.price_paise <= max_price)
+                rows = query.order_by(Offer.price_paise).limit(limit).all()
+                return jsonify({
+                    'store': store.upper(),
+                    'offers': [dict(serialize_offer(offer), name=name) for offer, name in rows]
+                }), 200
+
+            # Without a store the summary already holds each product's in-stock minimum
+            query = db.query(ProductPriceStats).filter(ProductPriceStats.min_price_paise.isnot(None))
+            if min_price is not None:
+                query = query.filter(ProductPriceStats.min_price_paise >= min_price)
+            if max_price is not None:
+                query = query.filter(ProductPriceStats.min_price_paise <= max_price)
+            products = query.order_by(ProductPriceStats.min_price_paise).limit(limit).all()
+            return jsonify({'products': [serialize_stats(stats) for stats in products]}), 200
+        finally:
+            db.close()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch cheapest offers: {str(e)}'}), 500
+
 @app.route("/queue/status", methods=["GET"])
 def get_queue_status():
     """Get current queue status and statistics"""
@@ -555,27 +1289,118 @@ def get_queue_status():
     except Exception as e:
         return jsonify({"error": f"Failed to fetch queue status: {str(e)}"}), 500
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def admin_allowed():
+    """Admin endpoints need ADMIN_TOKEN if one is configured, otherwise a local client"""
+    if config.ADMIN_TOKEN:
+        token = request.headers.get("X-Admin-Token") or request.args.get("token")
+        return hmac.compare_digest(token or "", config.ADMIN_TOKEN)
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+@app.route("/admin/profile", methods=["GET"])
+def admin_profile():
+    """Sample all threads for ?seconds=N and return flamegraph-compatible collapsed stacks"""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        seconds = float(request.args.get("seconds", 10))
+        interval = float(request.args.get("interval_ms", 5)) / 1000
+        collapsed, samples = profiler.sample_profile(seconds, interval)
+        response = Response(collapsed, mimetype="text/plain")
+        response.headers["Content-Disposition"] = "attachment; filename=profile.collapsed"
+        response.headers["X-Profile-Samples"] = str(samples)
+        return response
+    except profiler.ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {str(e)}"}), 400
+
+@app.route("/admin/stacks", methods=["GET"])
+def admin_stacks():
+    """Dump the current stack of every thread"""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    return Response(profiler.dump_stacks(), mimetype="text/plain")
+
+@app.route("/admin/tracemalloc", methods=["GET"])
+def admin_tracemalloc():
+    """Trace allocations for ?seconds=N and return the top ?limit= allocation sites"""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        seconds = float(request.args.get("seconds", 5))
+        limit = int(request.args.get("limit", 25))
+        group_by = request.args.get("group_by", "lineno")
+        if group_by not in ("lineno", "filename", "traceback"):
+            return jsonify({"error": "group_by must be lineno, filename or traceback"}), 400
+        return jsonify(profiler.tracemalloc_top(seconds, limit, group_by)), 200
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {str(e)}"}), 400
+
+@app.route("/job/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running one at its next stage"""
+    try:
+        db = SessionLocal()
+        try:
+            job = db.query(Job).filter(Job.job_id == job_id).first()
+            if not job:
+                return jsonify({"error": "Job not found"}), 404
+            if job.status not in [JobStatus.PENDING.value, JobStatus.QUEUED.value, JobStatus.PROCESSING.value]:
+                return jsonify({"error": f"Job is already {job.status}"}), 409
+            outcome = job_queue_manager.cancel_job(job_id)
+            if outcome == "cancelling":
+                # The worker marks the job cancelled once it stops
+                return jsonify({"job_id": job_id, "status": job.status, "message": "Cancellation requested"}), 202
+            job.status = JobStatus.CANCELLED.value
+            job.completed_at = datetime.now(pytz.timezone('Asia/Kolkata'))
+            db.commit()
+            return jsonify({"job_id": job_id, "status": job.status, "message": "Job cancelled"}), 200
+        finally:
+            db.close()
+    except Exception as e:
+        return jsonify({"error": f"Failed to cancel job: {str(e)}"}), 500
+
+@app.route("/job/<job_id>/priority", methods=["POST"])
+def reprioritize_job(job_id):
+    """Move a queued job to another priority (lower runs first); admin only"""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    data = request.get_json(silent=True) or {}
+    try:
+        priority = int(data["priority"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Missing or invalid integer 'priority'"}), 400
+    try:
+        position = job_queue_manager.job_queue.reprioritize(job_id, priority)
+        if position is None:
+            return jsonify({"error": "Job is not queued"}), 404
+        _, eta_seconds = job_queue_manager.position_info(job_id)
+        return jsonify({"job_id": job_id, "priority": priority, "queue_position": position, "eta_seconds": eta_seconds}), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to reprioritize job: {str(e)}"}), 500
+
 @app.route("/queue/clear", methods=["POST"])
 def clear_queue():
     """Clear all pending jobs from the queue"""
     try:
         with job_queue_manager.job_lock:
-            while not job_queue_manager.job_queue.empty():
-                try:
-                    job_queue_manager.job_queue.get_nowait()
-                except queue.Empty:
-                    break
+            removed = job_queue_manager.job_queue.clear()
             
             db = SessionLocal()
             try:
                 db.query(Job).filter(
                     Job.status.in_([JobStatus.PENDING.value, JobStatus.QUEUED.value])
-                ).update({"status": "cancelled"})
+                ).update({"status": JobStatus.CANCELLED.value})
                 db.commit()
             finally:
                 db.close()
         
-        return jsonify({"message": "Queue cleared successfully"}), 200
+        return jsonify({"message": "Queue cleared successfully", "cancelled": len(removed)}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to clear queue: {str(e)}"}), 500
 
@@ -610,31 +1435,45 @@ def start_job():
         db = SessionLocal()
         try:
             # Check if product already exists within the last day
-            indian_tz = pytz.timezone('Asia/Kolkata')
-            one_day_ago = datetime.now(indian_tz) - timedelta(days=1)
-            existing_product = db.query(Product).filter(
-                Product.productUrl == product_url, 
-                Product.timestamp >= one_day_ago
-            ).first()
+            existing_product = find_fresh_product(db, product_url)
             
             if existing_product:
                 print(f"Product already exists in database (within 1 day) - Page ID: {existing_product.shortCode}")
+                CACHE_HITS.inc(endpoint="job_start")
                 return jsonify({
                     "exists": True,
                     "page_id": existing_product.shortCode,
                     "message": "Product already exists in database"
                 }), 200
             
+            stale_product = find_stale_product(db, product_url)
+            if stale_product:
+                CACHE_HITS.inc(endpoint="job_start_stale")
+                return jsonify({
+                    "exists": True,
+                    "stale": True,
+                    "age_seconds": product_age_seconds(stale_product),
+                    "page_id": stale_product.shortCode,
+                    "refresh_job_id": enqueue_refresh(db, product_url),
+                    "message": "Product exists but is stale; a background refresh has been queued"
+                }), 200
+            
+            # Fail fast on URLs that recently failed to resolve
+            failure = cached_failure_response(db, product_url)
+            if failure is not None:
+                return failure
+            
             # Check for duplicate jobs before creating a new one
             existing_job = job_queue_manager.check_duplicate_job(product_url)
             if existing_job:
+                DEDUPES.inc(endpoint="job_start")
                 return jsonify({
                     "exists": False,
                     "job_id": existing_job.job_id,
                     "status": existing_job.status,
                     "message": "A job for this URL is already pending, queued, or processing",
                     "duplicate": True,
-                    "queue_position": job_queue_manager.get_queue_status()["queue_size"]
+                    "queue_position": job_queue_manager.job_queue.position(existing_job.job_id)
                 }), 409
             
             # Product doesn't exist, create a new job
@@ -642,6 +1481,7 @@ def start_job():
             job = Job(
                 job_id=job_id,
                 product_url=product_url,
+                canonical_key=canonical_key(product_url),
                 status=JobStatus.PENDING.value
             )
             db.add(job)
@@ -712,9 +1552,21 @@ if __name__ == "__main__":
         print(f"Result: {json.dumps(result, indent=2)}")
         print(f"Page ID: {page_id}")
     else:
-        job_queue_manager.start()
+        # With FLASK_DEBUG the reloader re-runs this module in a child process;
+        # only start the background workers in the process that serves requests
+        if not config.FLASK_DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            job_queue_manager.start()
+            retention_worker.start()
+            watches.alert_sender.start()
+            memory_governor.start()
         
         try:
-            app.run(host="0.0.0.0", port=9999, debug=True)
+            app.run(host=config.HOST, port=config.PORT, debug=config.FLASK_DEBUG, threaded=True)
         finally:
+            if shortcode_resolver:
+                shortcode_resolver.stop()
+            image_cache.stop()
+            memory_governor.stop()
+            watches.alert_sender.stop()
+            retention_worker.stop()
             job_queue_manager.stop()
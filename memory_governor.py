@@ -0,0 +1,224 @@
+import os
+import signal
+import threading
+from contextlib import contextmanager
+from time import monotonic
+import config
+from metrics import BROWSER_RSS, MEMORY_AVAILABLE, RENDERERS_KILLED, STAGE_SECONDS
+
+MB = 1024 * 1024
+
+def available_bytes():
+    """MemAvailable from /proc/meminfo, or None where there is no /proc"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def total_bytes():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError):
+        return None
+
+def _read_processes():
+    """{pid: (ppid, rss_bytes)} for every process visible in /proc"""
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    processes = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{entry}/statm") as f:
+                rss = int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+        processes[int(entry)] = (int(fields[1]), rss)
+    return processes
+
+def _is_renderer(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"--type=renderer" in f.read()
+    except OSError:
+        return False
+
+def browser_processes(root_pid=None):
+    """(pid, rss_bytes) of every descendant of this process: the Playwright driver and its Chromium tree"""
+    root_pid = root_pid or os.getpid()
+    processes = _read_processes()
+    children = {}
+    for pid, (ppid, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+    found, stack = [], list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        found.append((pid, processes[pid][1]))
+        stack.extend(children.get(pid, []))
+    return found
+
+class MemoryGovernor:
+    """Admits browser stages only while the host has memory to spare.
+
+    A background thread samples MemAvailable and the RSS of this process's
+    browser tree. A browser is admitted when available memory, less what
+    already-admitted browsers are still expected to grow into, leaves room
+    for one more browser above MEMORY_MIN_AVAILABLE_MB. Under pressure the
+    browser limit shrinks by one per sample, and grows back once there is
+    room for two more; renderers above MEMORY_RENDERER_MAX_MB are killed.
+    """
+    def __init__(self, interval_seconds=None):
+        self.interval_seconds = interval_seconds or config.MEMORY_SAMPLE_SECONDS
+        self.estimate_bytes = config.MEMORY_BROWSER_ESTIMATE_MB * MB
+        self.min_available_bytes = config.MEMORY_MIN_AVAILABLE_MB * MB
+        self.max_limit = max(1, config.MAX_CONCURRENT_JOBS)
+        self.limit = self.max_limit
+        self.active = 0
+        self.available = None
+        self.browser_rss = 0
+        self.sampled_at = None
+        self.peak_browser_rss = 0
+        self.lowest_available = None
+        self.admissions = 0
+        self.admission_waits = 0
+        self.admission_wait_seconds = 0.0
+        self.renderers_killed = 0
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        print("Memory governor started")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval_seconds):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"❌ Memory sample failed: {e}")
+
+    def _kill_runaway_renderers(self, processes):
+        limit = config.MEMORY_RENDERER_MAX_MB * MB
+        for pid, rss in processes:
+            if rss > limit and _is_renderer(pid):
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except OSError:
+                    continue
+                self.renderers_killed += 1
+                RENDERERS_KILLED.inc()
+                print(f"🔪 Killed renderer {pid} using {rss / MB:.0f} MB")
+
+    def sample(self):
+        available = available_bytes()
+        if available is None:
+            return
+        processes = browser_processes()
+        self._kill_runaway_renderers(processes)
+        browser_rss = sum(rss for _, rss in processes)
+        MEMORY_AVAILABLE.set(available)
+        BROWSER_RSS.set(browser_rss)
+        with self.condition:
+            self.available = available
+            self.browser_rss = browser_rss
+            self.sampled_at = monotonic()
+            self.peak_browser_rss = max(self.peak_browser_rss, browser_rss)
+            self.lowest_available = available if self.lowest_available is None else min(self.lowest_available, available)
+            if available < self.min_available_bytes:
+                if self.limit > 1:
+                    self.limit = max(1, min(self.limit, self.active) - 1)
+                    print(f"⚠️ Memory pressure ({available / MB:.0f} MB available), browser limit now {self.limit}")
+            elif self.limit < self.max_limit and self._headroom() >= 2 * self.estimate_bytes:
+                self.limit += 1
+            self.condition.notify_all()
+
+    def _headroom(self):
+        """Bytes above the minimum once admitted browsers have grown to their estimate"""
+        expected_growth = max(0, self.active * self.estimate_bytes - self.browser_rss)
+        return self.available - expected_growth - self.min_available_bytes
+
+    def _admissible(self):
+        if self.available is None:
+            return True
+        if self.active >= self.limit:
+            return False
+        # Always let one browser run, unless the host is already below the minimum
+        if self.active == 0:
+            return self.available >= self.min_available_bytes
+        return self._headroom() >= self.estimate_bytes
+
+    def browser_limit(self):
+        with self.condition:
+            return self.limit
+
+    def acquire(self, deadline):
+        """Wait for room to start a browser; raises DeadlineExceeded if the job's budget runs out first"""
+        start = monotonic()
+        waited = False
+        with self.condition:
+            while True:
+                if self.sampled_at is None or monotonic() - self.sampled_at > self.interval_seconds:
+                    self.condition.release()
+                    try:
+                        self.sample()
+                    finally:
+                        self.condition.acquire()
+                if self._admissible():
+                    break
+                waited = True
+                self.condition.wait(min(self.interval_seconds, deadline.timeout(self.interval_seconds, "memory_admission")))
+            self.active += 1
+            self.admissions += 1
+            if waited:
+                self.admission_waits += 1
+                self.admission_wait_seconds += monotonic() - start
+        STAGE_SECONDS.observe(monotonic() - start, stage="memory_admission")
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def browser_slot(self, deadline):
+        self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                "enabled": self.available is not None,
+                "available_mb": round(self.available / MB) if self.available is not None else None,
+                "total_mb": round(total_bytes() / MB) if total_bytes() else None,
+                "lowest_available_mb": round(self.lowest_available / MB) if self.lowest_available is not None else None,
+                "min_available_mb": config.MEMORY_MIN_AVAILABLE_MB,
+                "browser_rss_mb": round(self.browser_rss / MB),
+                "peak_browser_rss_mb": round(self.peak_browser_rss / MB),
+                "active_browsers": self.active,
+                "browser_limit": self.limit,
+                "admissions": self.admissions,
+                "admission_waits": self.admission_waits,
+                "admission_wait_seconds": round(self.admission_wait_seconds, 2),
+                "renderers_killed": self.renderers_killed,
+            }
+
+memory_governor = MemoryGovernor()
@@ -0,0 +1,195 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+# Stage latencies span fast DB writes to minute-long browser redirects
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    """Gauge whose value is either set directly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        """Read the value lazily so the hot path never has to update it"""
+        self._function = function
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(self._function())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def quantile(self, q, **labels):
+        """Estimate a quantile by linear interpolation inside the bucket, like histogram_quantile()"""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None or series[2] == 0:
+                return None
+            counts = list(series[0])
+            total = series[2]
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+def render():
+    """Render every registered metric in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = Histogram(
+    "scraper_stage_duration_seconds",
+    "Latency of each scraping pipeline stage",
+    ("stage",),
+)
+CACHE_HITS = Counter("scraper_cache_hits_total", "Requests answered from the product cache", ("endpoint",))
+DEDUPES = Counter("scraper_duplicate_jobs_total", "Requests folded into an already pending job", ("endpoint",))
+FAILURES = Counter("scraper_failures_total", "Pipeline failures by stage and class", ("stage", "failure_class"))
+JOBS = Counter("scraper_jobs_total", "Jobs finished by final status", ("status",))
+HTTP_RESPONSES = Counter("scraper_http_responses_total", "Snapshot responses by endpoint and outcome (not_modified, cached, encoded)", ("endpoint", "outcome"))
+ALERTS = Counter("scraper_price_alerts_total", "Price-drop alerts by outcome (queued, sent, retried, failed)", ("outcome",))
+UPSTREAM_CALLS = Counter("scraper_upstream_calls_total", "Upstream calls by outcome (ok, slow, error, rejected)", ("upstream", "outcome"))
+UPSTREAM_CIRCUIT = Gauge("scraper_upstream_circuit_state", "Upstream circuit state: 0 closed, 1 half-open, 2 open", ("upstream",))
+UPSTREAM_LIMIT = Gauge("scraper_upstream_concurrency_limit", "Current AIMD concurrency limit per upstream", ("upstream",))
+RENDERERS_KILLED = Counter("scraper_renderers_killed_total", "Chromium renderers killed for exceeding MEMORY_RENDERER_MAX_MB")
+MEMORY_AVAILABLE = Gauge("scraper_memory_available_bytes", "MemAvailable at the last memory governor sample")
+BROWSER_RSS = Gauge("scraper_browser_rss_bytes", "RSS of the Playwright driver and Chromium processes at the last sample")
+IMAGE_REQUESTS = Counter("scraper_image_requests_total", "/img responses by outcome (variant, original, fallback, failed)", ("outcome",))
+QUEUE_DEPTH = Gauge("scraper_queue_depth", "Jobs waiting in the queue")
+RUNNING_JOBS = Gauge("scraper_running_jobs", "Jobs currently executing")
+
+def timed(stage):
+    """Time a pipeline stage into STAGE_SECONDS"""
+    return STAGE_SECONDS.time(stage=stage)
@@ -1,9 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Index, JSON
+from sqlalchemy import create_engine, event, inspect, text, Boolean, Column, Integer, String, DateTime, Text, Index, JSON, LargeBinary, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import pytz
 import uuid
+import config
 
 # Create the base class for declarative models
 Base = declarative_base()
@@ -16,11 +17,13 @@ class Product(Base):
     productUrl = Column(Text, nullable=False, unique=True)
     shortCode = Column(String(50), nullable=False)
     timestamp = Column(DateTime, default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')))
+    result_hash = Column(String(64), nullable=True)  # latest snapshot in result_blobs
     
     # Add index for better query performance
     __table_args__ = (
         Index('idx_product_url', 'productUrl'),
         Index('idx_short_code', 'shortCode'),
+        Index('idx_product_timestamp_id', 'timestamp', 'id'),
     )
     
     def __repr__(self):
@@ -34,9 +37,15 @@ class Job(Base):
     job_id = Column(String(36), nullable=False, unique=True, default=lambda: str(uuid.uuid4()))
     product_url = Column(Text, nullable=False)
     status = Column(String(20), nullable=False, default='pending')  # pending, processing, completed, failed
-    result = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)  # legacy inline result, superseded by result_hash
+    result_hash = Column(String(64), nullable=True)
+    # Latest usable snapshot taken while the product was still being prepared
+    partial_hash = Column(String(64), nullable=True)
+    progress = Column(Integer, nullable=True)
+    partial_at = Column(DateTime, nullable=True)
     error = Column(Text, nullable=True)
     page_id = Column(String(50), nullable=True)
+    canonical_key = Column(Text, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')))
     completed_at = Column(DateTime, nullable=True)
     
@@ -45,23 +54,245 @@ class Job(Base):
         Index('idx_job_id', 'job_id'),
         Index('idx_status', 'status'),
         Index('idx_created_at', 'created_at'),
+        Index('idx_job_created_at_id', 'created_at', 'id'),
+        Index('idx_job_result_hash', 'result_hash'),
+        Index('idx_job_canonical_key', 'canonical_key'),
     )
     
     def __repr__(self):
         return f"<Job(id={self.id}, job_id='{self.job_id}', status='{self.status}')>"
 
+class ResultBlob(Base):
+    """Compressed product JSON stored once per content hash"""
+    __tablename__ = 'result_blobs'
+    
+    hash = Column(String(64), primary_key=True)  # sha256 of the serialized result
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed JSON
+    size = Column(Integer, nullable=False)  # uncompressed size in bytes
+    created_at = Column(DateTime, default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')))
+    
+    def __repr__(self):
+        return f"<ResultBlob(hash='{self.hash[:12]}', size={self.size}, stored={len(self.data)})>"
+
+class UrlAlias(Base):
+    """Maps the canonical key of a product URL to the shortCode it resolved to"""
+    __tablename__ = 'url_aliases'
+    
+    canonical_key = Column(Text, primary_key=True)
+    short_code = Column(String(50), nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')))
+    
+    __table_args__ = (
+        Index('idx_alias_short_code', 'short_code'),
+    )
+    
+    def __repr__(self):
+        return f"<UrlAlias(canonical_key='{self.canonical_key}', short_code='{self.short_code}')>"
+
+class UrlFailure(Base):
+    """Negative cache entry for a URL that recently failed to resolve"""
+    __tablename__ = 'url_failures'
+    
+    canonical_key = Column(Text, primary_key=True)
+    product_url = Column(Text, nullable=False)
+    failure_class = Column(String(20), nullable=False)  # fallback, timeout, parse
+    failure_count = Column(Integer, nullable=False, default=1)
+    last_error = Column(Text, nullable=True)
+    retry_after = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')))
+    
+    def __repr__(self):
+        return f"<UrlFailure(canonical_key='{self.canonical_key}', failure_class='{self.failure_class}', retry_after='{self.retry_after}')>"
+
+class ProductImage(Base):
+    """A gallery image URL seen in a stored snapshot; the original lives on disk under content_hash"""
+    __tablename__ = 'product_images'
+    
+    key = Column(String(32), primary_key=True)  # sha256 of the URL, truncated; used in /img URLs
+    url = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the original, set once fetched
+    content_type = Column(String(50), nullable=True)
+    size = Column(Integer, nullable=True)
+    width = Column(Integer, nullable=True)  # only known when Pillow is installed
+    error = Column(Text, nullable=True)
+    failed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')))
+    
+    def __repr__(self):
+        return f"<ProductImage(key='{self.key}', content_hash='{(self.content_hash or '')[:12]}')>"
+
+class Offer(Base):
+    """One store's current offer for a product, extracted from its latest snapshot"""
+    __tablename__ = 'offers'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    page_id = Column(String(50), nullable=False)
+    store = Column(String(50), nullable=False)  # marketplace code, e.g. AMAZON
+    store_name = Column(Text, nullable=True)
+    price_paise = Column(Integer, nullable=True)
+    base_price_paise = Column(Integer, nullable=True)
+    availability = Column(String(30), nullable=True)
+    in_stock = Column(Boolean, nullable=False, default=True)
+    url = Column(Text, nullable=True)
+    fetched_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('page_id', 'store', name='uq_offer_page_store'),
+        Index('idx_offer_store_price', 'store', 'in_stock', 'price_paise'),
+    )
+    
+    def __repr__(self):
+        return f"<Offer(page_id='{self.page_id}', store='{self.store}', price_paise={self.price_paise})>"
+
+class ProductPriceStats(Base):
+    """Per-product price summary over in-stock offers, refreshed with the offers"""
+    __tablename__ = 'product_price_stats'
+    
+    page_id = Column(String(50), primary_key=True)
+    name = Column(Text, nullable=True)
+    brand = Column(Text, nullable=True)
+    min_price_paise = Column(Integer, nullable=True)
+    median_price_paise = Column(Integer, nullable=True)
+    max_price_paise = Column(Integer, nullable=True)
+    min_store = Column(String(50), nullable=True)
+    offer_count = Column(Integer, nullable=False, default=0)
+    in_stock_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_price_stats_min_price', 'min_price_paise'),
+    )
+    
+    def __repr__(self):
+        return f"<ProductPriceStats(page_id='{self.page_id}', min_price_paise={self.min_price_paise})>"
+
+class PriceHistoryChunk(Base):
+    """Raw price observations for one product and store, delta-encoded.
+
+    data holds zigzag varint pairs (seconds since previous point, paise change
+    since previous point); the first pair is relative to (start_epoch, 0).
+    last_epoch and last_price_paise let new points be appended without decoding.
+    """
+    __tablename__ = 'price_history_chunks'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    page_id = Column(String(50), nullable=False)
+    store = Column(String(50), nullable=False)
+    start_epoch = Column(Integer, nullable=False)
+    last_epoch = Column(Integer, nullable=False)
+    last_price_paise = Column(Integer, nullable=False)
+    point_count = Column(Integer, nullable=False, default=0)
+    data = Column(LargeBinary, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_history_chunk_range', 'page_id', 'store', 'start_epoch'),
+    )
+    
+    def __repr__(self):
+        return f"<PriceHistoryChunk(page_id='{self.page_id}', store='{self.store}', points={self.point_count})>"
+
+class PriceRollup(Base):
+    """Min/max/last price per product, store and hour or day bucket"""
+    __tablename__ = 'price_rollups'
+    
+    page_id = Column(String(50), primary_key=True)
+    store = Column(String(50), primary_key=True)
+    resolution = Column(String(4), primary_key=True)  # hour, day
+    bucket_epoch = Column(Integer, primary_key=True)  # bucket start, seconds since epoch
+    min_paise = Column(Integer, nullable=False)
+    max_paise = Column(Integer, nullable=False)
+    last_paise = Column(Integer, nullable=False)
+    point_count = Column(Integer, nullable=False, default=1)
+    
+    __table_args__ = (
+        Index('idx_rollup_range', 'page_id', 'resolution', 'bucket_epoch'),
+    )
+    
+    def __repr__(self):
+        return f"<PriceRollup(page_id='{self.page_id}', store='{self.store}', {self.resolution}@{self.bucket_epoch})>"
+
+class Watch(Base):
+    """A user's price threshold for a product, at one store or any store ('*')"""
+    __tablename__ = 'watches'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    page_id = Column(String(50), nullable=False)
+    store = Column(String(50), nullable=False, default='*')
+    threshold_paise = Column(Integer, nullable=False)
+    webhook_url = Column(Text, nullable=True)  # falls back to ALERT_WEBHOOK_URL
+    label = Column(Text, nullable=True)
+    # Price that last triggered an alert; cleared when the price climbs back above the threshold
+    last_alert_paise = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')))
+    
+    __table_args__ = (
+        Index('idx_watch_page_store_threshold', 'page_id', 'store', 'threshold_paise'),
+        Index('idx_watch_created_at_id', 'created_at', 'id'),
+    )
+    
+    def __repr__(self):
+        return f"<Watch(id={self.id}, page_id='{self.page_id}', store='{self.store}', threshold_paise={self.threshold_paise})>"
+
+class AlertOutbox(Base):
+    """Price-drop alerts waiting for the batched sender, written in the snapshot's transaction"""
+    __tablename__ = 'alert_outbox'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    watch_id = Column(Integer, nullable=False)
+    webhook_url = Column(Text, nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    failed = Column(Boolean, nullable=False, default=False)
+    
+    __table_args__ = (
+        Index('idx_outbox_pending', 'sent_at', 'failed', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f"<AlertOutbox(id={self.id}, watch_id={self.watch_id}, attempts={self.attempts})>"
+
 # Database configuration
-DATABASE_URL = "sqlite:///products.db"
+DATABASE_URL = config.DATABASE_URL
 
 # Create engine
 engine = create_engine(DATABASE_URL, echo=False)
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # Only takes effect on a fresh database; result_store.compact() converts existing ones
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.close()
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _add_missing_columns():
+    """Add columns introduced after a table was first created.
+
+    SQLite only supports adding nullable columns without a table rebuild, which
+    is all the incremental schema changes here need.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
 def create_tables():
     """Create all tables"""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    # create_all skips tables that already exist, so indexes added to an
+    # existing model have to be created explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 def get_db():
     """Get database session"""
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+import pytz
+import config
+from canonical_url import canonical_key
+from model import UrlFailure
+
+FAILURE_TTLS = {
+    "fallback": config.NEGATIVE_TTL_FALLBACK_SECONDS,
+    "timeout": config.NEGATIVE_TTL_TIMEOUT_SECONDS,
+    "parse": config.NEGATIVE_TTL_PARSE_SECONDS,
+}
+
+def _now():
+    # SQLite hands DateTime columns back naive, so compare in naive IST
+    return datetime.now(pytz.timezone('Asia/Kolkata')).replace(tzinfo=None)
+
+def record_failure(db, product_url, failure_class, error=None):
+    """Remember that a URL failed, backing off exponentially on repeat failures.
+
+    Runs inside the caller's transaction.
+    """
+    key = canonical_key(product_url)
+    entry = db.get(UrlFailure, key)
+    if entry is None:
+        entry = UrlFailure(canonical_key=key, failure_count=0)
+        db.add(entry)
+    entry.failure_count = entry.failure_count + 1 if entry.failure_class == failure_class else 1
+    ttl = FAILURE_TTLS.get(failure_class, config.NEGATIVE_TTL_PARSE_SECONDS)
+    ttl = min(ttl * 2 ** (entry.failure_count - 1), max(ttl, config.NEGATIVE_TTL_MAX_SECONDS))
+    now = _now()
+    entry.product_url = product_url
+    entry.failure_class = failure_class
+    entry.last_error = error
+    entry.updated_at = now
+    entry.retry_after = now + timedelta(seconds=ttl)
+    print(f"🚫 Negative-cached {failure_class} failure for {key} until {entry.retry_after.isoformat()}")
+    return entry
+
+def lookup_failure(db, product_url):
+    """Return the unexpired failure entry for this URL (or a variant of it), if any"""
+    entry = db.get(UrlFailure, canonical_key(product_url))
+    if entry is None or entry.retry_after <= _now():
+        return None
+    return entry
+
+def clear_failure(db, product_url):
+    """Forget a previous failure once the URL resolves successfully"""
+    entry = db.get(UrlFailure, canonical_key(product_url))
+    if entry is not None:
+        db.delete(entry)
+
+def failure_response(entry):
+    """Body and Retry-After seconds for a cached failure"""
+    retry_in = max(0, int((entry.retry_after - _now()).total_seconds()))
+    return {
+        "error": entry.last_error or f"URL previously failed to resolve ({entry.failure_class})",
+        "failure_class": entry.failure_class,
+        "cached": True,
+        "failure_count": entry.failure_count,
+        "retry_after": entry.retry_after.isoformat(),
+        "retry_after_seconds": retry_in,
+    }, retry_in
@@ -0,0 +1,119 @@
+import re
+import statistics
+from decimal import Decimal, InvalidOperation
+from model import Offer, ProductPriceStats
+
+OUT_OF_STOCK = {"OUT_OF_STOCK", "SOLD_OUT", "UNAVAILABLE", "NOT_AVAILABLE", "COMING_SOON"}
+
+_PRICE_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+def price_to_paise(value):
+    """Convert "₹16,999", "16999.50" or a number to integer paise; None if there is no price"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(round(value * 100))
+    match = _PRICE_NUMBER.search(str(value))
+    if not match:
+        return None
+    try:
+        return int(Decimal(match.group().replace(",", "")) * 100)
+    except InvalidOperation:
+        return None
+
+def store_code(store):
+    code = store.get("marketplace") or store.get("name") or ""
+    return re.sub(r"\W+", "_", str(code).strip()).upper()[:50]
+
+def extract_offers(header):
+    """Normalized offers from a PRODUCT_HEADER widget, one per store"""
+    extracted = {}
+    for store in header.get("stores") or []:
+        if not isinstance(store, dict):
+            continue
+        code = store_code(store)
+        if not code or code in extracted:
+            continue
+        availability = store.get("availability")
+        extracted[code] = {
+            "store": code,
+            "store_name": store.get("name"),
+            "price_paise": price_to_paise(store.get("totalPrice") or store.get("price")),
+            "base_price_paise": price_to_paise(store.get("basePrice")),
+            "availability": availability,
+            "in_stock": str(availability or "").upper() not in OUT_OF_STOCK,
+            "url": store.get("directLink"),
+        }
+    return list(extracted.values())
+
+def update_offers(db, page_id, new_offers, fetched_at):
+    """Upsert a product's offers and drop stores that disappeared.
+
+    Returns the offers whose price or stock changed as dicts with the previous
+    price, which is what price-drop evaluation needs.
+    """
+    existing = {offer.store: offer for offer in db.query(Offer).filter(Offer.page_id == page_id)}
+    changed = []
+    for data in new_offers:
+        offer = existing.pop(data["store"], None)
+        if offer is None:
+            offer = Offer(page_id=page_id, **data)
+            db.add(offer)
+            previous_price, previous_in_stock = None, None
+        else:
+            previous_price, previous_in_stock = offer.price_paise, offer.in_stock
+            for key, value in data.items():
+                setattr(offer, key, value)
+        offer.fetched_at = fetched_at
+        if previous_price != data["price_paise"] or previous_in_stock != data["in_stock"]:
+            changed.append(dict(data, page_id=page_id, previous_price_paise=previous_price))
+    for offer in existing.values():
+        db.delete(offer)
+    db.flush()
+    return changed
+
+def refresh_stats(db, page_id, header, updated_at):
+    """Recompute one product's price summary from its offers"""
+    rows = db.query(Offer).filter(Offer.page_id == page_id).all()
+    priced = sorted((offer.price_paise, offer.store) for offer in rows if offer.in_stock and offer.price_paise is not None)
+    stats = db.get(ProductPriceStats, page_id)
+    if stats is None:
+        stats = ProductPriceStats(page_id=page_id)
+        db.add(stats)
+    stats.name = header.get("name")
+    stats.brand = header.get("brand")
+    stats.offer_count = len(rows)
+    stats.in_stock_count = len(priced)
+    stats.min_price_paise = priced[0][0] if priced else None
+    stats.min_store = priced[0][1] if priced else None
+    stats.max_price_paise = priced[-1][0] if priced else None
+    stats.median_price_paise = int(statistics.median(price for price, _ in priced)) if priced else None
+    stats.updated_at = updated_at
+    return stats
+
+def serialize_offer(offer):
+    return {
+        "page_id": offer.page_id,
+        "store": offer.store,
+        "store_name": offer.store_name,
+        "price_paise": offer.price_paise,
+        "base_price_paise": offer.base_price_paise,
+        "availability": offer.availability,
+        "in_stock": offer.in_stock,
+        "url": offer.url,
+        "fetched_at": offer.fetched_at.isoformat(),
+    }
+
+def serialize_stats(stats):
+    return {
+        "page_id": stats.page_id,
+        "name": stats.name,
+        "brand": stats.brand,
+        "min_price_paise": stats.min_price_paise,
+        "median_price_paise": stats.median_price_paise,
+        "max_price_paise": stats.max_price_paise,
+        "min_store": stats.min_store,
+        "offer_count": stats.offer_count,
+        "in_stock_count": stats.in_stock_count,
+        "updated_at": stats.updated_at.isoformat(),
+    }
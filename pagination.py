@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+class CursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(timestamp, row_id):
+    """Encode the (timestamp, id) of the last row on a page as an opaque cursor"""
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back into (timestamp, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise CursorError(f"Invalid cursor: {cursor}") from e
+
+def parse_limit(value):
+    """Parse the ?limit= query parameter, clamped to MAX_PAGE_SIZE"""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise CursorError(f"Invalid limit: {value}")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def keyset_query(query, timestamp_column, id_column, cursor=None):
+    """Order a query newest-first on (timestamp, id) and seek past the cursor.
+
+    Seeking on the composite key instead of using OFFSET keeps every page an
+    index range scan, so page N costs the same as page 1.
+    """
+    if cursor:
+        cursor_ts, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(timestamp_column, id_column) < tuple_(cursor_ts, cursor_id))
+    return query.order_by(timestamp_column.desc(), id_column.desc())
+
+def keyset_page(query, timestamp_column, id_column, cursor=None, limit=DEFAULT_PAGE_SIZE, timestamp_attr=None):
+    """Fetch one page and the cursor for the next one (None on the last page)"""
+    rows = keyset_query(query, timestamp_column, id_column, cursor).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_attr or timestamp_column.key), last.id)
+    return rows, next_cursor
+
+def stream_ndjson(session_factory, build_query, timestamp_column, id_column, serialize, cursor=None):
+    """Yield NDJSON lines for every row after the cursor.
+
+    Rows are pulled from a server-side cursor in STREAM_BATCH_SIZE chunks, so
+    memory stays flat no matter how large the table is. The session is owned by
+    the generator because Flask keeps iterating after the view has returned.
+    """
+    db = session_factory()
+    try:
+        query = keyset_query(build_query(db), timestamp_column, id_column, cursor)
+        for row in query.yield_per(STREAM_BATCH_SIZE):
+            yield json.dumps(serialize(row), ensure_ascii=False) + "\n"
+    finally:
+        db.close()
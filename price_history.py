@@ -0,0 +1,180 @@
+import time
+from datetime import datetime, timedelta, timezone
+import pytz
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+import config
+from model import PriceHistoryChunk, PriceRollup
+
+CHUNK_MAX_POINTS = 512
+RESOLUTIONS = {"hour": 3600, "day": 86400}
+# Day buckets start at midnight India time
+BUCKET_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+# India has no DST, and a fixed offset formats much faster than the pytz zone
+IST = timezone(timedelta(seconds=BUCKET_OFFSET_SECONDS))
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def _unzigzag(value):
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+def _varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _read_varints(data):
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = shift = 0
+
+def encode_point(epoch, price_paise, previous_epoch, previous_price):
+    return _varint(_zigzag(epoch - previous_epoch)) + _varint(_zigzag(price_paise - previous_price))
+
+def decode_chunk(chunk):
+    """(epoch, price_paise) points stored in a chunk, oldest first"""
+    points = []
+    epoch, price = chunk.start_epoch, 0
+    values = _read_varints(chunk.data)
+    for delta_epoch in values:
+        epoch += _unzigzag(delta_epoch)
+        price += _unzigzag(next(values))
+        points.append((epoch, price))
+    return points
+
+def to_epoch(moment):
+    # Naive datetimes are India time, as everywhere else in the database
+    if moment.tzinfo is None:
+        moment = pytz.timezone('Asia/Kolkata').localize(moment)
+    return int(moment.timestamp())
+
+def from_epoch(epoch):
+    return datetime.fromtimestamp(epoch, IST)
+
+def bucket_start(epoch, resolution):
+    size = RESOLUTIONS[resolution]
+    return (epoch + BUCKET_OFFSET_SECONDS) // size * size - BUCKET_OFFSET_SECONDS
+
+def _open_chunks(db, page_id, stores):
+    """Newest chunk per store for this product"""
+    latest = {}
+    chunks = db.query(PriceHistoryChunk).filter(
+        PriceHistoryChunk.page_id == page_id,
+        PriceHistoryChunk.store.in_(stores)
+    ).order_by(PriceHistoryChunk.start_epoch.desc())
+    for chunk in chunks:
+        latest.setdefault(chunk.store, chunk)
+        if len(latest) == len(stores):
+            break
+    return latest
+
+def record_points(db, page_id, observations, observed_at):
+    """Append (store, price_paise) observations and fold them into the rollups.
+
+    History is append-only: an observation at or before a store's last point
+    is ignored, which also makes re-indexing old snapshots harmless.
+    """
+    observations = [(store, price) for store, price in observations if price is not None]
+    if not observations:
+        return 0
+    epoch = to_epoch(observed_at)
+    open_chunks = _open_chunks(db, page_id, [store for store, _ in observations])
+    recorded = 0
+    for store, price in observations:
+        chunk = open_chunks.get(store)
+        if chunk is not None and epoch <= chunk.last_epoch:
+            continue
+        if chunk is None or chunk.point_count >= CHUNK_MAX_POINTS:
+            db.add(PriceHistoryChunk(
+                page_id=page_id, store=store, start_epoch=epoch, last_epoch=epoch,
+                last_price_paise=price, point_count=1, data=encode_point(epoch, price, epoch, 0)
+            ))
+        else:
+            chunk.data = chunk.data + encode_point(epoch, price, chunk.last_epoch, chunk.last_price_paise)
+            chunk.last_epoch = epoch
+            chunk.last_price_paise = price
+            chunk.point_count += 1
+        for resolution in RESOLUTIONS:
+            statement = insert(PriceRollup).values(
+                page_id=page_id, store=store, resolution=resolution,
+                bucket_epoch=bucket_start(epoch, resolution),
+                min_paise=price, max_paise=price, last_paise=price, point_count=1
+            )
+            db.execute(statement.on_conflict_do_update(
+                index_elements=["page_id", "store", "resolution", "bucket_epoch"],
+                set_={
+                    "min_paise": func.min(PriceRollup.min_paise, statement.excluded.min_paise),
+                    "max_paise": func.max(PriceRollup.max_paise, statement.excluded.max_paise),
+                    "last_paise": statement.excluded.last_paise,
+                    "point_count": PriceRollup.point_count + 1,
+                }
+            ))
+        recorded += 1
+    return recorded
+
+def choose_resolution(start_epoch, end_epoch):
+    span = end_epoch - start_epoch
+    if span <= 2 * 86400:
+        return "raw"
+    if span <= 60 * 86400:
+        return "hour"
+    return "day"
+
+def query_history(db, page_id, start_epoch, end_epoch, resolution, store=None):
+    """Points in [start_epoch, end_epoch] grouped by store.
+
+    Raw rows are (epoch, price_paise); rollup rows are
+    (bucket_epoch, min_paise, max_paise, last_paise).
+    """
+    series = {}
+    if resolution == "raw":
+        query = db.query(PriceHistoryChunk).filter(
+            PriceHistoryChunk.page_id == page_id,
+            PriceHistoryChunk.start_epoch <= end_epoch,
+            PriceHistoryChunk.last_epoch >= start_epoch
+        )
+        if store:
+            query = query.filter(PriceHistoryChunk.store == store)
+        for chunk in query.order_by(PriceHistoryChunk.start_epoch):
+            points = [point for point in decode_chunk(chunk) if start_epoch <= point[0] <= end_epoch]
+            series.setdefault(chunk.store, []).extend(points)
+        for points in series.values():
+            points.sort()
+        return series
+
+    query = db.query(
+        PriceRollup.store, PriceRollup.bucket_epoch, PriceRollup.min_paise,
+        PriceRollup.max_paise, PriceRollup.last_paise
+    ).filter(
+        PriceRollup.page_id == page_id,
+        PriceRollup.resolution == resolution,
+        PriceRollup.bucket_epoch >= bucket_start(start_epoch, resolution),
+        PriceRollup.bucket_epoch <= end_epoch
+    )
+    if store:
+        query = query.filter(PriceRollup.store == store)
+    for row_store, bucket, low, high, last in query.order_by(PriceRollup.bucket_epoch):
+        series.setdefault(row_store, []).append((bucket, low, high, last))
+    return series
+
+def prune_history(db, now_epoch=None):
+    """Drop raw chunks and hourly rollups past their retention; daily rollups stay"""
+    now_epoch = now_epoch or int(time.time())
+    deleted_chunks = db.query(PriceHistoryChunk).filter(
+        PriceHistoryChunk.last_epoch < now_epoch - config.PRICE_HISTORY_RAW_DAYS * 86400
+    ).delete(synchronize_session=False)
+    deleted_rollups = db.query(PriceRollup).filter(
+        PriceRollup.resolution == "hour",
+        PriceRollup.bucket_epoch < now_epoch - config.PRICE_HISTORY_HOURLY_DAYS * 86400
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted_chunks, deleted_rollups
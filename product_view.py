@@ -0,0 +1,98 @@
+"""View model for the server-rendered /view page.
+
+Mirrors what the old client-side viewer pulled out of the widgets
+(gallery, header, offers, specs, reviews, score) so the template only has
+to loop over plain lists.
+"""
+from catalog import find_widget, load_payload, product_widgets
+
+MAX_STORES = 10
+MAX_SPECS = 40
+MAX_REVIEWS = 8
+
+def _section(widgets, section_type):
+    details = find_widget(widgets, "PRODUCT_DETAILS") or {}
+    for section in details.get("sections") or []:
+        if isinstance(section, dict) and section.get("type") == section_type:
+            return section
+    return None
+
+def _stores(header):
+    stores = []
+    for store in (header.get("stores") or [])[:MAX_STORES]:
+        if not isinstance(store, dict):
+            continue
+        offers = [offer.get("text") for offer in store.get("detailsAndOffers") or [] if isinstance(offer, dict)]
+        stores.append({
+            "name": store.get("name") or store.get("marketplace") or "Store",
+            "offers": " • ".join(text for text in offers if text),
+            "price": store.get("totalPrice") or store.get("basePrice") or "",
+            "link": store.get("directLink") or store.get("link") or "#",
+        })
+    return stores
+
+def _price(header):
+    if header.get("price"):
+        return header["price"]
+    stores = [store for store in header.get("stores") or [] if isinstance(store, dict)]
+    priced = next((store for store in stores if store.get("totalPrice")), None)
+    return priced["totalPrice"] if priced else ""
+
+def _reviews(section):
+    if not section:
+        return None
+    reviews = []
+    for review in (section.get("detailedReviews") or [])[:MAX_REVIEWS]:
+        if not isinstance(review, dict):
+            continue
+        content = review.get("content")
+        # "$..." values are unresolved references in Flash's payload, not review text
+        if not isinstance(content, str) or content.startswith("$"):
+            content = ""
+        stars = review.get("starRating")
+        reviews.append({
+            "title": review.get("title") or review.get("heading") or "Review",
+            "stars": "★" * stars if isinstance(stars, int) and stars > 0 else "",
+            "content": content,
+        })
+    return {"total": section.get("reviewsCount"), "rating": section.get("rating"), "entries": reviews}
+
+def _score(widgets):
+    picked = find_widget(widgets, "PICKED_REASONS") or _section(widgets, "PICKED_REASONS")
+    score = (picked or {}).get("scoreData")
+    if not isinstance(score, dict):
+        return None
+    bars = []
+    for item in score.get("scoreBreakdown") or []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            width = max(0.0, min(100.0, float(item.get("value") or 0)))
+        except (TypeError, ValueError):
+            width = 0.0
+        bars.append({"label": item.get("label") or "", "width": width})
+    return {"value": score.get("score"), "bars": bars}
+
+def build_view(result):
+    """Everything product.html renders, or None if the result is not a product payload"""
+    payload = load_payload(result)
+    if payload is None:
+        return None
+    widgets = product_widgets(payload)
+    header = find_widget(widgets, "PRODUCT_HEADER") or {}
+    carousel = find_widget(widgets, "IMAGE_CAROUSEL") or {}
+    images = [image for image in carousel.get("images") or [] if isinstance(image, str)]
+    specs = (_section(widgets, "SPECIFICATIONS") or {}).get("details") or []
+    return {
+        "name": header.get("name") or "Product",
+        "price": _price(header),
+        "rating": header.get("rating"),
+        "images": images,
+        "stores": _stores(header),
+        "specs": [
+            {"label": spec.get("label") or "", "value": spec.get("value") or "—"}
+            for spec in specs[:MAX_SPECS] if isinstance(spec, dict)
+        ],
+        "reviews": _reviews(_section(widgets, "REVIEWS")),
+        "score": _score(widgets),
+    }
@@ -0,0 +1,103 @@
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+
+MAX_PROFILE_SECONDS = 120
+
+# One profile at a time; nothing here runs unless an admin endpoint asks for it
+_profile_lock = threading.Lock()
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+def _thread_names():
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+def _collapse(frame, thread_name):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+def sample_profile(seconds, interval=0.005):
+    """Sample every thread's stack for `seconds` and return collapsed stacks.
+
+    The output is one "thread;outer;...;inner count" line per distinct stack,
+    ready for flamegraph.pl or speedscope. The sampling thread skips itself.
+    """
+    seconds = max(0.1, min(float(seconds), MAX_PROFILE_SECONDS))
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        names = _thread_names()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if ident not in names:
+                    names = _thread_names()
+                stacks[_collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        _profile_lock.release()
+    lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+    return "\n".join(lines) + "\n", samples
+
+def dump_stacks():
+    """Return the current stack of every thread as text"""
+    names = _thread_names()
+    sections = []
+    for ident, frame in sys._current_frames().items():
+        header = f"--- {names.get(ident, 'unknown')} (ident {ident}) ---"
+        sections.append(header + "\n" + "".join(traceback.format_stack(frame)))
+    return "\n".join(sections)
+
+def tracemalloc_top(seconds=5, limit=25, group_by="lineno"):
+    """Report the top allocation sites.
+
+    If tracemalloc is not already tracing it is started for `seconds` and then
+    stopped again, so there is no allocation overhead outside the request.
+    """
+    seconds = max(0.0, min(float(seconds), MAX_PROFILE_SECONDS))
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(25)
+        time.sleep(seconds)
+    try:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    stats = snapshot.statistics(group_by)[:limit]
+    return {
+        "window_seconds": seconds if started_here else None,
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "top": [
+            {
+                "location": str(stat.traceback[0]) if stat.traceback else "unknown",
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in stats
+        ],
+    }
@@ -0,0 +1,179 @@
+"""Priority queue of jobs with O(log n) rank lookup, removal and reprioritization.
+
+Entries are ordered by (priority, sequence): lower priorities first, FIFO
+within a priority. They live in a treap whose nodes carry their subtree
+size, so a job's position in line is the number of entries ahead of its key,
+counted on the way down from the root. A dict from job id to key finds the
+entry to remove or move without scanning the queue.
+"""
+import itertools
+import queue
+import random
+import threading
+from time import monotonic
+
+class _Node:
+    __slots__ = ("key", "value", "weight", "size", "left", "right")
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.weight = random.random()
+        self.size = 1
+        self.left = None
+        self.right = None
+
+def _size(node):
+    return node.size if node else 0
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+def _split(node, key):
+    """(keys < key, keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        return _update(node), right
+    left, right = _split(node.left, key)
+    node.left = right
+    return left, _update(node)
+
+def _merge(left, right):
+    """Join two treaps where every key in left is below every key in right"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.weight > right.weight:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+class RankedQueue:
+    """Thread-safe job queue; get() returns (job_id, product_url, priority)"""
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self.root = None
+        self.keys = {}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+
+    def qsize(self):
+        with self.condition:
+            return len(self.keys)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def full(self):
+        return self.maxsize > 0 and self.qsize() >= self.maxsize
+
+    def _insert(self, key, value):
+        left, right = _split(self.root, key)
+        self.root = _merge(_merge(left, _Node(key, value)), right)
+
+    def _delete(self, key):
+        left, right = _split(self.root, key)
+        node, right = _split(right, (key[0], key[1] + 1))
+        self.root = _merge(left, right)
+        return node
+
+    def put_nowait(self, job_id, product_url, priority=0):
+        with self.condition:
+            if job_id in self.keys:
+                raise ValueError(f"Job {job_id} is already queued")
+            if self.maxsize > 0 and len(self.keys) >= self.maxsize:
+                raise queue.Full
+            key = (priority, next(self.sequence))
+            self._insert(key, (job_id, product_url))
+            self.keys[job_id] = key
+            self.condition.notify()
+            return self._rank(key) + 1
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.condition:
+            while not self.keys:
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self.condition.wait(remaining)
+            return self._pop_first()
+
+    def get_nowait(self):
+        with self.condition:
+            if not self.keys:
+                raise queue.Empty
+            return self._pop_first()
+
+    def _pop_first(self):
+        node = self.root
+        while node.left:
+            node = node.left
+        self._delete(node.key)
+        job_id, product_url = node.value
+        del self.keys[job_id]
+        return job_id, product_url, node.key[0]
+
+    def _rank(self, key):
+        """Number of entries ahead of key"""
+        rank, node = 0, self.root
+        while node:
+            if key <= node.key:
+                node = node.left
+            else:
+                rank += _size(node.left) + 1
+                node = node.right
+        return rank
+
+    def position(self, job_id):
+        """1-based place in line, or None if the job is not queued"""
+        with self.condition:
+            key = self.keys.get(job_id)
+            return None if key is None else self._rank(key) + 1
+
+    def remove(self, job_id):
+        with self.condition:
+            key = self.keys.pop(job_id, None)
+            if key is None:
+                return False
+            self._delete(key)
+            return True
+
+    def reprioritize(self, job_id, priority):
+        """Move a job to another priority, keeping its enqueue order; returns its new position or None"""
+        with self.condition:
+            key = self.keys.get(job_id)
+            if key is None:
+                return None
+            node = self._delete(key)
+            new_key = (priority, key[1])
+            self._insert(new_key, node.value)
+            self.keys[job_id] = new_key
+            return self._rank(new_key) + 1
+
+    def clear(self):
+        """Empty the queue in one step; returns the removed job ids"""
+        with self.condition:
+            job_ids = list(self.keys)
+            self.root = None
+            self.keys = {}
+            return job_ids
+
+    def items(self, limit=None):
+        """(job_id, product_url, priority) in queue order"""
+        with self.condition:
+            out, stack, node = [], [], self.root
+            while (stack or node) and (limit is None or len(out) < limit):
+                while node:
+                    stack.append(node)
+                    node = node.left
+                node = stack.pop()
+                out.append((node.value[0], node.value[1], node.key[0]))
+                node = node.right
+            return out
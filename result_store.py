@@ -0,0 +1,202 @@
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy import null, update
+from sqlalchemy.dialects.sqlite import insert
+import config
+import price_history
+from model import SessionLocal, ResultBlob, Job, Product, engine
+
+_decoded_cache = OrderedDict()
+_decoded_cache_lock = threading.Lock()
+_DECODED_CACHE_SIZE = 64
+
+# Unreferenced blobs younger than this are kept: a writer may have stored one
+# whose job or product row it has not committed yet
+_BLOB_GRACE = timedelta(hours=1)
+
+def serialize_result(result):
+    """Serialize a job result the same way every time so equal results hash equally"""
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def result_hash(result):
+    return hashlib.sha256(serialize_result(result)).hexdigest()
+
+def store_result(db, result):
+    """Store a result once per content hash and return the hash.
+
+    The insert is part of the caller's transaction; concurrent writers of the
+    same content are harmless because the hash is the primary key. An existing
+    blob is touched instead, so retention treats it as new until the caller's
+    row referencing it is committed; if retention already deleted it, it is
+    inserted again.
+    """
+    raw = serialize_result(result)
+    digest = hashlib.sha256(raw).hexdigest()
+    now = datetime.now(pytz.timezone('Asia/Kolkata'))
+    touched = db.execute(
+        update(ResultBlob).where(ResultBlob.hash == digest).values(created_at=now)
+    ).rowcount
+    if not touched:
+        db.execute(insert(ResultBlob).values(
+            hash=digest,
+            data=zlib.compress(raw, 6),
+            size=len(raw),
+            created_at=now
+        ).on_conflict_do_update(index_elements=[ResultBlob.hash], set_={"created_at": now}))
+    return digest
+
+def load_result(db, digest):
+    """Load a result by hash; blobs are immutable so decoded values are cached"""
+    with _decoded_cache_lock:
+        if digest in _decoded_cache:
+            _decoded_cache.move_to_end(digest)
+            return _decoded_cache[digest]
+    blob = db.get(ResultBlob, digest)
+    if blob is None:
+        return None
+    result = json.loads(zlib.decompress(blob.data))
+    with _decoded_cache_lock:
+        _decoded_cache[digest] = result
+        if len(_decoded_cache) > _DECODED_CACHE_SIZE:
+            _decoded_cache.popitem(last=False)
+    return result
+
+def job_result(db, job):
+    """Return a job's result whether it is stored by hash or inline (older rows)"""
+    if job.result_hash:
+        return load_result(db, job.result_hash)
+    return job.result
+
+def prune_jobs(db, retention_days=None):
+    """Delete finished jobs older than the retention window and unreferenced blobs past the grace period"""
+    retention_days = config.JOB_RETENTION_DAYS if retention_days is None else retention_days
+    now = datetime.now(pytz.timezone('Asia/Kolkata'))
+    cutoff = now - timedelta(days=retention_days)
+    deleted_jobs = db.query(Job).filter(
+        Job.created_at < cutoff,
+        Job.status.in_(["completed", "failed", "cancelled"])
+    ).delete(synchronize_session=False)
+    deleted_blobs = db.query(ResultBlob).filter(
+        ResultBlob.created_at < now - _BLOB_GRACE,
+        ~ResultBlob.hash.in_(db.query(Job.result_hash).filter(Job.result_hash.isnot(None))),
+        ~ResultBlob.hash.in_(db.query(Job.partial_hash).filter(Job.partial_hash.isnot(None))),
+        ~ResultBlob.hash.in_(db.query(Product.result_hash).filter(Product.result_hash.isnot(None)))
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted_jobs, deleted_blobs
+
+def incremental_vacuum(pages=None):
+    """Return up to `pages` free pages to the filesystem without locking the database for a full VACUUM"""
+    pages = config.VACUUM_PAGES_PER_RUN if pages is None else pages
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+
+def database_size():
+    """Report the database file size and how much of it is free pages"""
+    with engine.connect() as conn:
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+        page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        freelist = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    return {
+        "bytes": page_size * page_count,
+        "free_bytes": page_size * freelist,
+    }
+
+def compact(retention_days=None):
+    """Move inline job results into result_blobs, prune old rows and shrink the file.
+
+    The first run on an existing database switches it to incremental
+    auto-vacuum, which needs one full VACUUM.
+    """
+    before = database_size()
+    db = SessionLocal()
+    migrated = 0
+    try:
+        while True:
+            jobs = db.query(Job).filter(Job.result.isnot(None), Job.result_hash.is_(None)).limit(500).all()
+            if not jobs:
+                break
+            for job in jobs:
+                job.result_hash = store_result(db, job.result)
+                job.result = null()
+            db.commit()
+            migrated += len(jobs)
+        deleted_jobs, deleted_blobs = prune_jobs(db, retention_days)
+    finally:
+        db.close()
+
+    with engine.connect() as conn:
+        auto_vacuum = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+    if auto_vacuum != 2:
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+    else:
+        incremental_vacuum(0)
+    after = database_size()
+    return {
+        "migrated_results": migrated,
+        "deleted_jobs": deleted_jobs,
+        "deleted_blobs": deleted_blobs,
+        "before": before,
+        "after": after,
+    }
+
+class RetentionWorker:
+    """Background thread that periodically prunes old jobs and vacuums free pages"""
+    def __init__(self, interval_seconds=None):
+        self.interval_seconds = interval_seconds or config.RETENTION_INTERVAL_SECONDS
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        print("Retention worker started")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval_seconds):
+            db = SessionLocal()
+            try:
+                deleted_jobs, deleted_blobs = prune_jobs(db)
+                deleted_chunks, deleted_rollups = price_history.prune_history(db)
+                incremental_vacuum()
+                if deleted_jobs or deleted_blobs:
+                    print(f"🧹 Retention pruned {deleted_jobs} jobs and {deleted_blobs} result blobs")
+                if deleted_chunks or deleted_rollups:
+                    print(f"🧹 Retention downsampled {deleted_chunks} raw price chunks and {deleted_rollups} hourly rollups")
+            except Exception as e:
+                db.rollback()
+                print(f"❌ Retention run failed: {e}")
+            finally:
+                db.close()
+
+retention_worker = RetentionWorker()
+
+def _format_mb(num_bytes):
+    return f"{num_bytes / (1024 * 1024):.2f} MB"
+
+if __name__ == "__main__":
+    import sys
+    from model import create_tables
+    create_tables()
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    report = compact(days)
+    print(f"Migrated {report['migrated_results']} inline results into result_blobs")
+    print(f"Pruned {report['deleted_jobs']} jobs and {report['deleted_blobs']} orphaned blobs")
+    print(f"Database size before: {_format_mb(report['before']['bytes'])} ({_format_mb(report['before']['free_bytes'])} free)")
+    print(f"Database size after:  {_format_mb(report['after']['bytes'])} ({_format_mb(report['after']['free_bytes'])} free)")
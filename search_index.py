@@ -0,0 +1,159 @@
+import base64
+import hashlib
+import json
+import re
+import sys
+from sqlalchemy import DDL, bindparam, event, text
+from model import Base, engine
+from pagination import CursorError
+
+# Kept outside the ORM: SQLAlchemy has no model for FTS5 virtual tables.
+# page_id is stored but not tokenized; rowid is derived from it so a
+# product's row can be replaced by rowid without scanning the index.
+CREATE_SEARCH_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5(
+    page_id UNINDEXED,
+    name,
+    brand,
+    specs,
+    summary,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# bm25 weights per column: name matches matter most, summary text least
+RANK_EXPRESSION = "bm25(product_search, 0.0, 10.0, 5.0, 2.0, 1.0)"
+
+MAX_QUERY_TERMS = 16
+
+event.listen(Base.metadata, "after_create", DDL(CREATE_SEARCH_TABLE))
+
+def doc_id(page_id):
+    """Stable 56-bit rowid for a pageId"""
+    return int.from_bytes(hashlib.sha1(page_id.encode("utf-8")).digest()[:7], "big")
+
+def _details_section(widgets, section_type):
+    for widget in widgets:
+        if isinstance(widget, dict) and widget.get("type") == "PRODUCT_DETAILS":
+            for section in widget.get("sections") or []:
+                if isinstance(section, dict) and section.get("type") == section_type:
+                    return section
+    return {}
+
+def document_fields(header, widgets):
+    """Searchable text for one product: name, brand, key specs and the AI summary"""
+    specs = _details_section(widgets, "SPECIFICATIONS").get("details") or []
+    summary = _details_section(widgets, "AI_SUMMARY")
+    summary_parts = [summary.get("summary") or ""]
+    summary_parts += summary.get("keyStrengths") or []
+    summary_parts += summary.get("keyLimitations") or []
+    return {
+        "name": header.get("name") or "",
+        "brand": header.get("brand") or "",
+        "specs": " ".join(f"{spec.get('label', '')} {spec.get('value', '')}" for spec in specs if isinstance(spec, dict)),
+        "summary": " ".join(str(part) for part in summary_parts if part),
+    }
+
+def index_product(db, page_id, header, widgets):
+    """Replace a product's search document in the caller's transaction"""
+    fields = document_fields(header, widgets)
+    rowid = doc_id(page_id)
+    db.execute(text("DELETE FROM product_search WHERE rowid = :rowid"), {"rowid": rowid})
+    if any(fields.values()):
+        db.execute(
+            text("INSERT INTO product_search (rowid, page_id, name, brand, specs, summary) "
+                 "VALUES (:rowid, :page_id, :name, :brand, :specs, :summary)"),
+            dict(fields, rowid=rowid, page_id=page_id),
+        )
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: all terms required, the last one as a prefix"""
+    terms = re.findall(r"\w+", query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def encode_search_cursor(score, rowid):
+    raw = json.dumps([score, rowid])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_search_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, rowid = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(score), int(rowid)
+    except (ValueError, TypeError) as e:
+        raise CursorError(f"Invalid cursor: {cursor}") from e
+
+def search(db, query, limit, cursor=None):
+    """Rank matches by BM25, keyset-paginated on (score, rowid).
+
+    Returns (results, next_cursor). Raises ValueError for a query with no
+    searchable terms.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        raise ValueError("Query must contain at least one word")
+    params = {"match": expression, "limit": limit + 1}
+    seek = ""
+    if cursor:
+        params["score"], params["rowid"] = decode_search_cursor(cursor)
+        seek = "WHERE score > :score OR (score = :score AND doc_rowid > :rowid)"
+    # Rank first and decorate only the page: snippet() and the price join are
+    # far more expensive than bm25() when a common term matches most products
+    ranked = db.execute(text(f"""
+        SELECT doc_rowid, score FROM (
+            SELECT rowid AS doc_rowid, {RANK_EXPRESSION} AS score
+            FROM product_search
+            WHERE product_search MATCH :match
+        )
+        {seek}
+        ORDER BY score, doc_rowid
+        LIMIT :limit
+    """), params).all()
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        next_cursor = encode_search_cursor(ranked[-1].score, ranked[-1].doc_rowid)
+    if not ranked:
+        return [], None
+    rows = db.execute(text("""
+        SELECT product_search.rowid AS doc_rowid, product_search.page_id, product_search.name, product_search.brand,
+               snippet(product_search, -1, '[', ']', '…', 12) AS snippet,
+               stats.min_price_paise, stats.min_store
+        FROM product_search
+        LEFT JOIN product_price_stats AS stats ON stats.page_id = product_search.page_id
+        WHERE product_search MATCH :match AND product_search.rowid IN :rowids
+    """).bindparams(bindparam("rowids", expanding=True)),
+        {"match": expression, "rowids": [row.doc_rowid for row in ranked]},
+    ).mappings().all()
+    by_rowid = {row["doc_rowid"]: row for row in rows}
+    results = []
+    for doc_rowid, score in ranked:
+        row = by_rowid[doc_rowid]
+        results.append({
+            "page_id": row["page_id"],
+            "name": row["name"],
+            "brand": row["brand"],
+            "snippet": row["snippet"],
+            "score": score,
+            "min_price_paise": row["min_price_paise"],
+            "min_store": row["min_store"],
+        })
+    return results, next_cursor
+
+def optimize():
+    """Merge the index's b-trees into one; worth running after a large rebuild"""
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO product_search (product_search) VALUES ('optimize')"))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "optimize":
+        optimize()
+        print("✅ Search index optimized")
+    else:
+        print("Usage: python search_index.py optimize")
+        sys.exit(1)
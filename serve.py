@@ -0,0 +1,48 @@
+"""Production entry point: serve the API with waitress and run the background workers once.
+
+    python serve.py                       # HOST, PORT and SERVER_THREADS from config
+    SERVER_THREADS=16 PORT=8080 python serve.py
+
+The job queue is in memory, so requests and the background workers have to
+share one process; scaling is done with request threads rather than worker
+processes.
+Falls back to Werkzeug's threaded server (debugger and reloader off) when
+waitress is not installed.
+"""
+import config
+from main import app, job_queue_manager, shortcode_resolver
+from image_cache import image_cache
+from memory_governor import memory_governor
+from model import init_db
+from result_store import retention_worker
+from watches import alert_sender
+
+def run_server(host, port, threads):
+    try:
+        from waitress import serve
+    except ImportError:
+        print("⚠️ waitress not installed, falling back to the threaded Werkzeug server")
+        app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+        return
+    print(f"🚀 Serving on http://{host}:{port} with waitress ({threads} threads)")
+    serve(app, host=host, port=port, threads=threads, ident="price-comparison")
+
+def main():
+    init_db()
+    job_queue_manager.start()
+    retention_worker.start()
+    alert_sender.start()
+    memory_governor.start()
+    try:
+        run_server(config.HOST, config.PORT, config.SERVER_THREADS)
+    finally:
+        if shortcode_resolver:
+            shortcode_resolver.stop()
+        image_cache.stop()
+        memory_governor.stop()
+        alert_sender.stop()
+        retention_worker.stop()
+        job_queue_manager.stop()
+
+if __name__ == "__main__":
+    main()
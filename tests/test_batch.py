@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from batch import default_checkpoint, load_checkpoint, read_inputs
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_plain_lines_skip_blanks_and_comments(tmp_path):
+    path = write(tmp_path, "urls.txt", "https://a.example/1\n\n# a comment\n  https://a.example/2  \n")
+    items, invalid = read_inputs(path)
+    assert items == [("https://a.example/1", None), ("https://a.example/2", None)]
+    assert invalid == 0
+
+def test_jsonl_keeps_the_record_and_counts_bad_lines(tmp_path):
+    path = write(tmp_path, "urls.jsonl", '{"url": "https://a.example/1", "sku": 7}\n"https://a.example/2"\n{"name": "no url"}\nnot json\n')
+    items, invalid = read_inputs(path)
+    assert items == [("https://a.example/1", {"url": "https://a.example/1", "sku": 7}), ("https://a.example/2", None)]
+    assert invalid == 2
+
+def test_csv_detected_from_the_header(tmp_path):
+    path = write(tmp_path, "catalog", "sku,product_url\n7,https://a.example/1\n8,\n")
+    items, invalid = read_inputs(path)
+    assert items == [("https://a.example/1", {"sku": "7", "product_url": "https://a.example/1"})]
+    assert invalid == 1
+
+def test_csv_without_a_url_column_is_refused(tmp_path):
+    path = write(tmp_path, "catalog.csv", "sku,name\n7,phone\n")
+    with pytest.raises(ValueError):
+        read_inputs(path)
+
+def test_checkpoint_skips_finished_urls_and_a_torn_last_line(tmp_path):
+    path = write(tmp_path, "out.checkpoint", "".join([
+        json.dumps({"url": "https://a.example/1", "status": "completed"}) + "\n",
+        json.dumps({"url": "https://a.example/2", "status": "failed"}) + "\n",
+        '{"url": "https://a.exa',
+    ]))
+    assert load_checkpoint(path) == {"https://a.example/1", "https://a.example/2"}
+    assert load_checkpoint(path, retry_failed=True) == {"https://a.example/1"}
+
+def test_failed_then_completed_counts_as_done_on_retry(tmp_path):
+    path = write(tmp_path, "out.checkpoint", "".join([
+        json.dumps({"url": "https://a.example/1", "status": "failed"}) + "\n",
+        json.dumps({"url": "https://a.example/1", "status": "completed"}) + "\n",
+    ]))
+    assert load_checkpoint(path, retry_failed=True) == {"https://a.example/1"}
+
+def test_missing_checkpoint_is_empty(tmp_path):
+    assert load_checkpoint(str(tmp_path / "missing")) == set()
+    assert load_checkpoint(None) == set()
+
+def test_default_checkpoint():
+    assert default_checkpoint("urls.txt", "out.ndjson") == "out.ndjson.checkpoint"
+    assert default_checkpoint("urls.txt", "-") == "urls.txt.checkpoint"
+    assert default_checkpoint("-", "-") is None
@@ -0,0 +1,32 @@
+import pytest
+
+from canonical_url import canonical_key, lookup_short_code, learn_alias
+
+@pytest.mark.parametrize("url", [
+    "https://www.amazon.in/Apple-iPhone-15/dp/B0CHX1W1XY/ref=sr_1_1?th=1&psc=1",
+    "https://amazon.in/dp/B0CHX1W1XY",
+    "amzn.in/dp/B0CHX1W1XY",
+    "https://m.amazon.in/gp/product/b0chx1w1xy?utm_source=share",
+])
+def test_amazon_variants_share_the_asin_key(url):
+    assert canonical_key(url) == "amazon:B0CHX1W1XY"
+
+def test_flipkart_pid_beats_the_item_path():
+    url = "https://dl.flipkart.com/s/apple-iphone/p/itm6ac6485515ae4?pid=MOBGTAGPTB3VS24W&lid=LST&marketplace=FLIPKART"
+    assert canonical_key(url) == "flipkart:MOBGTAGPTB3VS24W"
+
+def test_flipkart_item_path_without_pid():
+    assert canonical_key("https://www.flipkart.com/apple/p/itm6ac6485515ae4") == "flipkart:ITM6AC6485515AE4"
+
+def test_unknown_host_keeps_meaningful_params_only():
+    url = "https://m.example.com/shop/item//42/?utm_source=x&size=l&color=red&gclid=1"
+    assert canonical_key(url) == "example.com/shop/item/42?color=red&size=l"
+
+def test_host_case_port_and_trailing_slash_are_normalized():
+    assert canonical_key("HTTPS://Example.COM:443/a/") == canonical_key("https://example.com/a")
+
+def test_learned_alias_serves_other_variants(db):
+    learn_alias(db, "https://www.amazon.in/dp/B0CHX1W1XY?tag=aff-21", "abc123")
+    db.commit()
+    assert lookup_short_code(db, "amzn.in/dp/B0CHX1W1XY") == "abc123"
+    assert lookup_short_code(db, "https://www.amazon.in/dp/B0OTHER0001") is None
@@ -0,0 +1,45 @@
+from time import monotonic
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded, raise_if_cut_short, stage_timeout
+
+def test_child_is_capped():
+    parent = Deadline(100)
+    child = parent.child(5)
+    assert 4 < child.remaining() <= 5
+
+def test_child_leaves_the_reserve_to_the_parent():
+    parent = Deadline(10)
+    child = parent.child(60, reserve=4)
+    assert 5 < child.remaining() <= 6
+    assert child.expires_at == pytest.approx(parent.expires_at - 4)
+
+def test_child_is_already_spent_when_the_reserve_covers_the_rest():
+    parent = Deadline(3)
+    child = parent.child(60, reserve=5)
+    assert child.expired()
+    assert not parent.expired()
+    with pytest.raises(DeadlineExceeded) as raised:
+        child.check("readiness_poll")
+    assert not raised.value.cancelled
+
+def test_cancelling_the_parent_cancels_the_child():
+    parent = Deadline(100)
+    child = parent.child(10)
+    parent.cancel()
+    with pytest.raises(DeadlineExceeded) as raised:
+        child.check("detail_fetch")
+    assert raised.value.cancelled
+
+def test_timeout_is_the_smaller_of_cap_and_budget():
+    assert Deadline(100).timeout(30, "stage") == 30
+    assert Deadline(None, expires_at=monotonic() + 2).timeout(30, "stage") <= 2
+
+def test_stage_timeout_without_a_job_uses_the_cap():
+    assert stage_timeout(None, 30, "stage") == 30
+
+def test_raise_if_cut_short():
+    raise_if_cut_short(30, 30, "stage")
+    with pytest.raises(DeadlineExceeded):
+        raise_if_cut_short(2.5, 30, "stage")
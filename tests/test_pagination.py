@@ -0,0 +1,28 @@
+from datetime import datetime
+
+import pytest
+
+from pagination import MAX_PAGE_SIZE, CursorError, decode_cursor, encode_cursor, parse_limit
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 3, 1, 12, 30, 5, 123456)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor(datetime(2026, 3, 1), 7)
+    assert "=" not in cursor
+    assert "+" not in cursor and "/" not in cursor
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "bnVsbA", encode_cursor(None, 1)])
+def test_bad_cursor_raises_cursor_error(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor)
+
+def test_parse_limit_clamps():
+    assert parse_limit("0") == 1
+    assert parse_limit("25") == 25
+    assert parse_limit(str(MAX_PAGE_SIZE + 1)) == MAX_PAGE_SIZE
+
+def test_parse_limit_rejects_non_numbers():
+    with pytest.raises(CursorError):
+        parse_limit("ten")
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+import price_history
+from model import PriceHistoryChunk
+from price_history import (
+    bucket_start, decode_chunk, encode_point, from_epoch, query_history,
+    record_points, to_epoch,
+)
+
+class _Chunk:
+    def __init__(self, start_epoch, data):
+        self.start_epoch = start_epoch
+        self.data = data
+
+def encode(points):
+    data = b""
+    previous_epoch, previous_price = points[0][0], 0
+    for epoch, price in points:
+        data += encode_point(epoch, price, previous_epoch, previous_price)
+        previous_epoch, previous_price = epoch, price
+    return _Chunk(points[0][0], data)
+
+def test_delta_encoding_round_trips_rises_drops_and_large_values():
+    points = [(1_700_000_000, 1_599_900), (1_700_003_600, 1_499_900), (1_700_003_601, 1_499_900),
+              (1_700_090_000, 99_999_999), (1_700_090_060, 1)]
+    assert decode_chunk(encode(points)) == points
+
+def test_steady_prices_cost_two_bytes_a_point():
+    points = [(1_700_000_000 + i * 60, 1_599_900) for i in range(100)]
+    chunk = encode(points)
+    assert len(chunk.data) - len(encode(points[:1]).data) == 2 * 99
+
+def test_day_buckets_start_at_midnight_india_time():
+    epoch = to_epoch(datetime(2026, 3, 1, 23, 59))
+    assert from_epoch(bucket_start(epoch, "day")).replace(tzinfo=None) == datetime(2026, 3, 1)
+    assert from_epoch(bucket_start(epoch, "hour")).replace(tzinfo=None) == datetime(2026, 3, 1, 23)
+
+def test_points_fold_into_hourly_and_daily_rollups(db):
+    for minute, price in ((0, 1000), (20, 800), (40, 900)):
+        record_points(db, "p1", [("AMAZON", price)], datetime(2026, 3, 1, 10, minute))
+    record_points(db, "p1", [("AMAZON", 1200)], datetime(2026, 3, 1, 11, 5))
+    db.commit()
+    start, end = to_epoch(datetime(2026, 3, 1)), to_epoch(datetime(2026, 3, 2))
+
+    hours = query_history(db, "p1", start, end, "hour")["AMAZON"]
+    assert [row[1:] for row in hours] == [(800, 1000, 900), (1200, 1200, 1200)]
+    days = query_history(db, "p1", start, end, "day")["AMAZON"]
+    assert [row[1:] for row in days] == [(800, 1200, 1200)]
+    raw = query_history(db, "p1", start, end, "raw")["AMAZON"]
+    assert [price for _, price in raw] == [1000, 800, 900, 1200]
+
+def test_history_is_append_only(db):
+    assert record_points(db, "p1", [("AMAZON", 1000)], datetime(2026, 3, 1, 10)) == 1
+    db.flush()
+    assert record_points(db, "p1", [("AMAZON", 500)], datetime(2026, 3, 1, 9)) == 0
+    assert record_points(db, "p1", [("AMAZON", None)], datetime(2026, 3, 1, 11)) == 0
+
+def test_full_chunks_roll_over(db, monkeypatch):
+    monkeypatch.setattr(price_history, "CHUNK_MAX_POINTS", 3)
+    for minute in range(7):
+        record_points(db, "p1", [("AMAZON", 1000 + minute)], datetime(2026, 3, 1, 10, minute))
+        db.flush()
+    assert [chunk.point_count for chunk in db.query(PriceHistoryChunk).order_by(PriceHistoryChunk.start_epoch)] == [3, 3, 1]
+    start, end = to_epoch(datetime(2026, 3, 1)), to_epoch(datetime(2026, 3, 2))
+    assert [price for _, price in query_history(db, "p1", start, end, "raw")["AMAZON"]] == list(range(1000, 1007))
+
+@pytest.mark.parametrize("days, resolution", [(1, "raw"), (30, "hour"), (365, "day")])
+def test_choose_resolution(days, resolution):
+    assert price_history.choose_resolution(0, days * 86400) == resolution
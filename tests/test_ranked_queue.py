@@ -0,0 +1,64 @@
+import queue
+
+import pytest
+
+from ranked_queue import RankedQueue
+
+def test_lower_priority_first_then_fifo():
+    jobs = RankedQueue()
+    jobs.put_nowait("a", "url-a", priority=5)
+    jobs.put_nowait("b", "url-b", priority=0)
+    jobs.put_nowait("c", "url-c", priority=5)
+    jobs.put_nowait("d", "url-d", priority=0)
+    assert [jobs.get_nowait()[0] for _ in range(4)] == ["b", "d", "a", "c"]
+
+def test_put_returns_position_and_position_tracks_removals():
+    jobs = RankedQueue()
+    assert jobs.put_nowait("a", "url-a") == 1
+    assert jobs.put_nowait("b", "url-b") == 2
+    assert jobs.put_nowait("urgent", "url-u", priority=-1) == 1
+    assert jobs.position("b") == 3
+    assert jobs.remove("a")
+    assert jobs.position("b") == 2
+    assert jobs.position("a") is None
+    assert not jobs.remove("a")
+
+def test_reprioritize_keeps_enqueue_order_within_priority():
+    jobs = RankedQueue()
+    for job_id in ("a", "b", "c", "d"):
+        jobs.put_nowait(job_id, f"url-{job_id}", priority=1)
+    assert jobs.reprioritize("c", 0) == 1
+    assert jobs.reprioritize("a", 0) == 1
+    assert [item[0] for item in jobs.items()] == ["a", "c", "b", "d"]
+    assert jobs.reprioritize("missing", 0) is None
+
+def test_positions_match_queue_order_under_churn():
+    jobs = RankedQueue()
+    for i in range(200):
+        jobs.put_nowait(f"job-{i}", "url", priority=i % 3)
+    for i in range(0, 200, 7):
+        jobs.remove(f"job-{i}")
+    for i in range(1, 200, 11):
+        jobs.reprioritize(f"job-{i}", -1)
+    order = [item[0] for item in jobs.items()]
+    assert len(order) == jobs.qsize()
+    assert all(jobs.position(job_id) == index + 1 for index, job_id in enumerate(order))
+
+def test_maxsize_and_duplicates():
+    jobs = RankedQueue(maxsize=1)
+    jobs.put_nowait("a", "url-a")
+    with pytest.raises(ValueError):
+        jobs.put_nowait("a", "url-a")
+    with pytest.raises(queue.Full):
+        jobs.put_nowait("b", "url-b")
+
+def test_get_times_out_on_empty_queue():
+    with pytest.raises(queue.Empty):
+        RankedQueue().get(timeout=0.01)
+
+def test_clear_returns_removed_ids():
+    jobs = RankedQueue()
+    jobs.put_nowait("a", "url-a")
+    jobs.put_nowait("b", "url-b")
+    assert sorted(jobs.clear()) == ["a", "b"]
+    assert jobs.empty()
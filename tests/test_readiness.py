@@ -0,0 +1,72 @@
+"""Readiness polling and partial fetches on the readiness sub-budget"""
+from time import monotonic
+
+import pytest
+import requests
+
+import checkforready
+import config
+import main
+from deadline import Deadline, DeadlineExceeded
+from upstream import UpstreamController
+
+@pytest.fixture
+def flash_api(monkeypatch):
+    controller = UpstreamController("flash_api_test", slow_seconds=10, max_limit=4)
+    monkeypatch.setattr(checkforready, "FLASH_API", controller)
+    return controller
+
+def timing_out(*args, **kwargs):
+    raise requests.Timeout("read timed out")
+
+def test_poll_cut_short_by_the_deadline_is_not_an_upstream_failure(monkeypatch, flash_api):
+    monkeypatch.setattr(requests, "get", timing_out)
+    nearly_spent = Deadline(None, expires_at=monotonic() + 1)
+    with pytest.raises(DeadlineExceeded):
+        checkforready.ready_check("page", nearly_spent)
+    assert not flash_api.outcomes
+    assert flash_api.in_flight == 0
+
+def test_poll_timing_out_on_its_own_counts_against_flash_api(monkeypatch, flash_api):
+    monkeypatch.setattr(requests, "get", timing_out)
+    assert checkforready.ready_check("page", Deadline(config.READINESS_POLL_TIMEOUT_SECONDS + 60)) is None
+    assert list(flash_api.outcomes) == [False]
+
+def test_spent_readiness_budget_skips_the_poll(monkeypatch):
+    def unexpected(*args):
+        raise AssertionError("polled with no readiness budget left")
+    monkeypatch.setattr(main, "ready_check", unexpected)
+    job = Deadline(20)
+    readiness = job.child(60, reserve=30)
+    assert main.poll_readiness("page", readiness, job) is None
+
+def test_readiness_running_out_mid_poll_leaves_the_job_alone(monkeypatch):
+    def slow_poll(page_id, deadline):
+        raise DeadlineExceeded("readiness_poll")
+    monkeypatch.setattr(main, "ready_check", slow_poll)
+    job = Deadline(100)
+    assert main.poll_readiness("page", job.child(10), job) is None
+
+def test_cancel_during_a_poll_still_fails_the_job(monkeypatch):
+    def cancelled_poll(page_id, deadline):
+        raise DeadlineExceeded("readiness_poll", cancelled=True)
+    monkeypatch.setattr(main, "ready_check", cancelled_poll)
+    job = Deadline(100)
+    job.cancel()
+    with pytest.raises(DeadlineExceeded):
+        main.poll_readiness("page", job.child(10), job)
+
+def test_partial_fetch_is_skipped_without_enough_budget(monkeypatch):
+    def unexpected(*args):
+        raise AssertionError("partial fetch with no readiness budget left")
+    monkeypatch.setattr(main, "get_details_product", unexpected)
+    job = Deadline(100)
+    readiness = Deadline(None, expires_at=monotonic() + config.PARTIAL_MIN_BUDGET_SECONDS / 2)
+    assert main.fetch_partial("page", readiness, job) is None
+
+def test_partial_fetch_running_out_the_readiness_budget_is_dropped(monkeypatch):
+    def slow_fetch(page_id, deadline):
+        raise DeadlineExceeded("detail_fetch")
+    monkeypatch.setattr(main, "get_details_product", slow_fetch)
+    job = Deadline(100)
+    assert main.fetch_partial("page", job.child(10), job) is None
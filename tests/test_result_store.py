@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from model import Job, ResultBlob
+from result_store import load_result, prune_jobs, store_result
+
+def age_blobs(db, days):
+    db.query(ResultBlob).update({ResultBlob.created_at: datetime.now() - timedelta(days=days)})
+    db.commit()
+
+def test_equal_results_share_one_blob(db):
+    first = store_result(db, {"name": "Phone", "price": 100})
+    second = store_result(db, {"name": "Phone", "price": 100})
+    db.commit()
+    assert first == second
+    assert db.query(ResultBlob).count() == 1
+    assert load_result(db, first) == {"name": "Phone", "price": 100}
+
+def test_prune_keeps_a_just_stored_orphan(db):
+    store_result(db, {"name": "Orphan"})
+    db.commit()
+    assert prune_jobs(db) == (0, 0)
+
+def test_storing_again_rescues_an_old_orphan(db):
+    digest = store_result(db, {"name": "Phone"})
+    db.commit()
+    age_blobs(db, 2)
+    # A new job about to reference the same content touches the blob
+    store_result(db, {"name": "Phone"})
+    db.commit()
+    assert prune_jobs(db) == (0, 0)
+    assert db.get(ResultBlob, digest) is not None
+
+def test_prune_drops_old_unreferenced_blobs_only(db):
+    kept = store_result(db, {"name": "Kept"})
+    dropped = store_result(db, {"name": "Dropped"})
+    db.add(Job(job_id="job-1", product_url="https://a.example/1", status="completed", result_hash=kept))
+    db.commit()
+    age_blobs(db, 2)
+    assert prune_jobs(db) == (0, 1)
+    assert db.get(ResultBlob, kept) is not None
+    assert db.get(ResultBlob, dropped) is None
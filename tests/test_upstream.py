@@ -0,0 +1,93 @@
+from time import monotonic
+
+import pytest
+
+import config
+from deadline import DeadlineExceeded
+from upstream import CLOSED, HALF_OPEN, OPEN, UpstreamController, UpstreamUnavailable
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(config, "UPSTREAM_MIN_CALLS", 4)
+    monkeypatch.setattr(config, "UPSTREAM_FAILURE_RATE", 0.5)
+    monkeypatch.setattr(config, "UPSTREAM_OPEN_SECONDS", 30)
+    monkeypatch.setattr(config, "UPSTREAM_MAX_OPEN_SECONDS", 100)
+    return UpstreamController("test", slow_seconds=10, max_limit=8)
+
+def fail_call(controller):
+    with pytest.raises(RuntimeError):
+        with controller.call(timeout=0):
+            raise RuntimeError("upstream error")
+
+def end_open_period(controller):
+    controller.open_until = monotonic() - 1
+
+def test_failures_halve_the_limit_and_successes_raise_it(controller):
+    fail_call(controller)
+    assert controller.current_limit() == 4
+    for _ in range(3):
+        with controller.call(timeout=0):
+            pass
+    assert 4 < controller.limit < 5
+
+def test_failure_rate_opens_the_circuit(controller):
+    with controller.call(timeout=0):
+        pass
+    with controller.call(timeout=0):
+        pass
+    fail_call(controller)
+    assert controller.state == CLOSED
+    fail_call(controller)
+    assert controller.state == OPEN
+    with pytest.raises(UpstreamUnavailable):
+        controller.acquire(timeout=0)
+
+def test_half_open_probe_closes_or_reopens_for_longer(controller):
+    for _ in range(4):
+        fail_call(controller)
+    end_open_period(controller)
+    assert controller.current_limit() == 1
+    assert controller.state == HALF_OPEN
+    fail_call(controller)
+    assert controller.state == OPEN
+    assert controller.open_seconds == 60
+    end_open_period(controller)
+    with controller.call(timeout=0):
+        pass
+    assert controller.state == CLOSED
+    assert controller.open_seconds == 30
+
+def test_half_open_allows_one_probe_at_a_time(controller):
+    for _ in range(4):
+        fail_call(controller)
+    end_open_period(controller)
+    controller.acquire(timeout=0)
+    with pytest.raises(UpstreamUnavailable):
+        controller.acquire(timeout=0)
+
+def test_marked_failure_counts_like_an_exception(controller):
+    with controller.call(timeout=0) as call:
+        call.fail()
+    assert controller.outcomes.count(False) == 1
+
+def test_deadline_and_cancel_only_free_the_slot(controller):
+    for cancelled in (False, True) * 10:
+        with pytest.raises(DeadlineExceeded):
+            with controller.call(timeout=0):
+                raise DeadlineExceeded("detail_fetch", cancelled=cancelled)
+    assert controller.state == CLOSED
+    assert controller.in_flight == 0
+    assert controller.current_limit() == 8
+    assert not controller.outcomes
+
+def test_deadline_during_the_probe_lets_another_probe_run(controller):
+    for _ in range(4):
+        fail_call(controller)
+    end_open_period(controller)
+    with pytest.raises(DeadlineExceeded):
+        with controller.call(timeout=0):
+            raise DeadlineExceeded("readiness_poll", cancelled=True)
+    assert controller.state == HALF_OPEN
+    with controller.call(timeout=0):
+        pass
+    assert controller.state == CLOSED
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+import config
+import watches
+from model import AlertOutbox, Offer, Watch
+
+@pytest.fixture(autouse=True)
+def alert_webhook(monkeypatch):
+    monkeypatch.setattr(config, "ALERT_WEBHOOK_URL", "https://alerts.example.com/hook")
+
+def add_watch(db, store, threshold, webhook_url=None):
+    watch = Watch(page_id="p1", store=store, threshold_paise=threshold, webhook_url=webhook_url)
+    db.add(watch)
+    db.flush()
+    return watch
+
+def offer(store, price, in_stock=True, previous=None):
+    return {"store": store, "price_paise": price, "in_stock": in_stock,
+            "previous_price_paise": previous, "url": f"https://{store.lower()}.example.com/p1"}
+
+def alerted_watches(db):
+    return [alert.watch_id for alert in db.query(AlertOutbox).order_by(AlertOutbox.id)]
+
+def test_only_watches_whose_threshold_is_met_alert(db):
+    met = add_watch(db, "AMAZON", 15000)
+    too_low = add_watch(db, "AMAZON", 14000)
+    other_store = add_watch(db, "FLIPKART", 20000)
+    assert watches.evaluate_changes(db, "p1", [offer("AMAZON", 14500, previous=16000)], 14500) == 1
+    assert alerted_watches(db) == [met.id]
+    payload = db.query(AlertOutbox).one().payload
+    assert payload["price_paise"] == 14500 and payload["previous_price_paise"] == 16000
+    assert too_low.id not in alerted_watches(db) and other_store.id not in alerted_watches(db)
+
+def test_a_watch_alerts_once_per_crossing(db):
+    watch = add_watch(db, "AMAZON", 15000)
+    watches.evaluate_changes(db, "p1", [offer("AMAZON", 14500)], 14500)
+    # Same or higher price below the threshold: already alerted
+    assert watches.evaluate_changes(db, "p1", [offer("AMAZON", 14800)], 14800) == 0
+    # A lower price alerts again
+    assert watches.evaluate_changes(db, "p1", [offer("AMAZON", 14000)], 14000) == 1
+    # Back above the threshold re-arms it
+    assert watches.evaluate_changes(db, "p1", [offer("AMAZON", 16000)], 16000) == 0
+    assert watches.evaluate_changes(db, "p1", [offer("AMAZON", 14900)], 14900) == 1
+    assert alerted_watches(db) == [watch.id] * 3
+
+def test_out_of_stock_offers_never_alert(db):
+    add_watch(db, "AMAZON", 15000)
+    assert watches.evaluate_changes(db, "p1", [offer("AMAZON", 10000, in_stock=False)], None) == 0
+
+def test_any_store_watch_follows_the_cheapest_offer(db):
+    watch = add_watch(db, watches.ANY_STORE, 15000)
+    changed = [offer("AMAZON", 14800), offer("FLIPKART", 14200)]
+    assert watches.evaluate_changes(db, "p1", changed, 14200) == 1
+    alert = db.query(AlertOutbox).one()
+    assert alert.watch_id == watch.id
+    assert alert.payload["store"] == "FLIPKART"
+
+def test_any_store_watch_ignores_changes_that_are_not_the_minimum(db):
+    add_watch(db, watches.ANY_STORE, 15000)
+    # Amazon dropped, but another store (unchanged) is still the cheapest
+    assert watches.evaluate_changes(db, "p1", [offer("AMAZON", 14800)], 14000) == 0
+
+def test_watches_without_a_target_queue_nothing(db, monkeypatch):
+    monkeypatch.setattr(config, "ALERT_WEBHOOK_URL", "")
+    add_watch(db, "AMAZON", 15000)
+    own = add_watch(db, "AMAZON", 15000, webhook_url="https://own.example.com/hook")
+    assert watches.evaluate_changes(db, "p1", [offer("AMAZON", 14000)], 14000) == 1
+    alert = db.query(AlertOutbox).one()
+    assert (alert.watch_id, alert.webhook_url) == (own.id, "https://own.example.com/hook")
+
+def test_new_watch_already_met_alerts_straight_away(db):
+    db.add(Offer(page_id="p1", store="AMAZON", price_paise=14000, in_stock=True, url="https://amazon.example.com/p1",
+                 fetched_at=datetime(2026, 3, 1, 10)))
+    db.flush()
+    assert watches.evaluate_watch(db, add_watch(db, "AMAZON", 15000)) == 1
+    assert watches.evaluate_watch(db, add_watch(db, "AMAZON", 13000)) == 0
@@ -0,0 +1,214 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+from time import monotonic
+import config
+from deadline import DeadlineExceeded
+from metrics import UPSTREAM_CALLS, UPSTREAM_CIRCUIT, UPSTREAM_LIMIT
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Weight of the newest call in the latency moving average
+LATENCY_ALPHA = 0.2
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream whose circuit is open or that has no free slot"""
+    def __init__(self, upstream, reason, retry_in):
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_in = max(1, int(retry_in + 0.999))
+        super().__init__(f"Upstream {upstream} unavailable ({reason}), retry in {self.retry_in}s")
+
+class _Call:
+    """Handle for one upstream call; mark it failed when the response itself says so"""
+    def __init__(self):
+        self.ok = True
+
+    def fail(self):
+        self.ok = False
+
+class UpstreamController:
+    """Latency and error tracking, an AIMD concurrency limit and a circuit breaker for one upstream.
+
+    Each call that succeeds under slow_seconds raises the limit by 1/limit
+    (about one slot per limit's worth of calls); a slow or failed call halves
+    it. When the failure rate over the recent window reaches
+    UPSTREAM_FAILURE_RATE the circuit opens and calls are refused until the
+    open time passes; then a single probe call decides whether it closes or
+    reopens for twice as long.
+    """
+    def __init__(self, name, slow_seconds, max_limit):
+        self.name = name
+        self.slow_seconds = slow_seconds
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.outcomes = deque(maxlen=config.UPSTREAM_WINDOW)
+        self.latency_ewma = None
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.open_seconds = config.UPSTREAM_OPEN_SECONDS
+        self.probing = False
+        self.condition = threading.Condition()
+        self._publish()
+
+    def _publish(self):
+        UPSTREAM_CIRCUIT.set(STATE_VALUES[self.state], upstream=self.name)
+        UPSTREAM_LIMIT.set(int(self.limit), upstream=self.name)
+
+    def _refresh(self):
+        if self.state == OPEN and monotonic() >= self.open_until:
+            self.state = HALF_OPEN
+            self.probing = False
+            self._publish()
+            print(f"🟡 Upstream {self.name} circuit half-open, allowing a probe call")
+
+    def _open(self):
+        self.state = OPEN
+        self.open_until = monotonic() + self.open_seconds
+        self.outcomes.clear()
+        self.limit = 1.0
+        self._publish()
+        print(f"🔴 Upstream {self.name} circuit open for {self.open_seconds:g} seconds")
+
+    def _close(self):
+        self.state = CLOSED
+        self.open_seconds = config.UPSTREAM_OPEN_SECONDS
+        self.outcomes.clear()
+        self._publish()
+        print(f"🟢 Upstream {self.name} circuit closed")
+
+    def retry_in(self):
+        with self.condition:
+            return max(0.0, self.open_until - monotonic()) if self.state == OPEN else 0.0
+
+    def is_open(self):
+        with self.condition:
+            self._refresh()
+            return self.state == OPEN
+
+    def current_limit(self):
+        """Concurrent calls currently allowed; one while half-open, none while open"""
+        with self.condition:
+            self._refresh()
+            if self.state == OPEN:
+                return 0
+            if self.state == HALF_OPEN:
+                return 1
+            return int(self.limit)
+
+    def acquire(self, timeout=None):
+        """Take a call slot, waiting up to timeout for one; raises UpstreamUnavailable"""
+        timeout = config.UPSTREAM_ACQUIRE_TIMEOUT_SECONDS if timeout is None else timeout
+        deadline = monotonic() + timeout
+        with self.condition:
+            while True:
+                self._refresh()
+                if self.state == OPEN:
+                    UPSTREAM_CALLS.inc(upstream=self.name, outcome="rejected")
+                    raise UpstreamUnavailable(self.name, "circuit open", self.open_until - monotonic())
+                if self.state == HALF_OPEN and not self.probing and self.in_flight == 0:
+                    self.probing = True
+                    break
+                if self.state == CLOSED and self.in_flight < int(self.limit):
+                    break
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    UPSTREAM_CALLS.inc(upstream=self.name, outcome="rejected")
+                    raise UpstreamUnavailable(self.name, "concurrency limit reached", 1)
+                self.condition.wait(min(remaining, 1.0))
+            self.in_flight += 1
+
+    def release(self, ok, latency):
+        """Record a finished call and adjust the limit and circuit state"""
+        slow = ok and latency > self.slow_seconds
+        UPSTREAM_CALLS.inc(upstream=self.name, outcome="error" if not ok else "slow" if slow else "ok")
+        with self.condition:
+            self.in_flight -= 1
+            self.latency_ewma = latency if self.latency_ewma is None else (
+                LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency_ewma
+            )
+            if self.state == HALF_OPEN and self.probing:
+                self.probing = False
+                if ok:
+                    self._close()
+                else:
+                    self.open_seconds = min(self.open_seconds * 2, config.UPSTREAM_MAX_OPEN_SECONDS)
+                    self._open()
+            elif self.state == CLOSED:
+                self.outcomes.append(ok)
+                if ok and not slow:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                else:
+                    self.limit = max(1.0, self.limit / 2)
+                failures = self.outcomes.count(False)
+                if len(self.outcomes) >= config.UPSTREAM_MIN_CALLS and failures >= config.UPSTREAM_FAILURE_RATE * len(self.outcomes):
+                    self._open()
+                else:
+                    self._publish()
+            self.condition.notify_all()
+
+    def abandon(self):
+        """Free the slot of a call our own job gave up on, without judging the upstream by it"""
+        with self.condition:
+            self.in_flight -= 1
+            if self.state == HALF_OPEN and self.probing:
+                # Let the next caller probe instead
+                self.probing = False
+            self.condition.notify_all()
+
+    @contextmanager
+    def call(self, timeout=None):
+        """Run one upstream call under the limit; exceptions count as failures and are re-raised.
+
+        DeadlineExceeded is the job's own deadline or a cancel, not the upstream
+        misbehaving, so it only frees the slot.
+        """
+        self.acquire(timeout)
+        handle = _Call()
+        start = monotonic()
+        try:
+            yield handle
+        except DeadlineExceeded:
+            self.abandon()
+            raise
+        except BaseException:
+            handle.fail()
+            self.release(False, monotonic() - start)
+            raise
+        else:
+            self.release(handle.ok, monotonic() - start)
+
+    def snapshot(self):
+        with self.condition:
+            self._refresh()
+            failures = self.outcomes.count(False)
+            return {
+                "state": self.state,
+                "limit": int(self.limit) if self.state == CLOSED else (1 if self.state == HALF_OPEN else 0),
+                "max_limit": self.max_limit,
+                "in_flight": self.in_flight,
+                "latency_ewma_seconds": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                "error_rate": round(failures / len(self.outcomes), 3) if self.outcomes else 0.0,
+                "window_calls": len(self.outcomes),
+                "retry_in_seconds": round(max(0.0, self.open_until - monotonic()), 1) if self.state == OPEN else 0,
+            }
+
+# The browser redirect on flash.co, the readiness API and the webapp details page
+FLASH = UpstreamController("flash", config.FLASH_SLOW_SECONDS, config.MAX_CONCURRENT_JOBS)
+FLASH_API = UpstreamController("flash_api", config.FLASH_API_SLOW_SECONDS, config.UPSTREAM_MAX_CONCURRENCY)
+FLASH_WEBAPP = UpstreamController("flash_webapp", config.FLASH_WEBAPP_SLOW_SECONDS, config.UPSTREAM_MAX_CONCURRENCY)
+UPSTREAMS = {controller.name: controller for controller in (FLASH, FLASH_API, FLASH_WEBAPP)}
+
+def open_circuits():
+    """Names of the upstreams a job would need that are currently refusing calls"""
+    return [name for name, controller in UPSTREAMS.items() if controller.is_open()]
+
+def retry_in(names):
+    return max((UPSTREAMS[name].retry_in() for name in names), default=0.0)
+
+def snapshot():
+    return {name: controller.snapshot() for name, controller in UPSTREAMS.items()}
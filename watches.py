@@ -0,0 +1,200 @@
+import threading
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy import func, insert, or_
+import config
+from metrics import ALERTS
+from model import SessionLocal, AlertOutbox, Offer, Watch
+
+ANY_STORE = "*"
+
+def _now():
+    return datetime.now(pytz.timezone('Asia/Kolkata'))
+
+def _queue_alerts(db, rows, page_id, store, price_paise, previous_price_paise, offer_url):
+    """Mark watches as alerted at this price and write their outbox rows"""
+    # Without its own URL or ALERT_WEBHOOK_URL a watch has nowhere to deliver to
+    rows = [row for row in rows if row.webhook_url or config.ALERT_WEBHOOK_URL]
+    if not rows:
+        return 0
+    now = _now()
+    db.query(Watch).filter(Watch.id.in_([row.id for row in rows])).update(
+        {Watch.last_alert_paise: price_paise}, synchronize_session=False
+    )
+    db.execute(insert(AlertOutbox), [
+        {
+            "watch_id": row.id,
+            "webhook_url": row.webhook_url or config.ALERT_WEBHOOK_URL,
+            "payload": {
+                "watch_id": row.id,
+                "label": row.label,
+                "page_id": page_id,
+                "store": store,
+                "price_paise": price_paise,
+                "previous_price_paise": previous_price_paise,
+                "threshold_paise": row.threshold_paise,
+                "url": offer_url,
+                "detected_at": now.isoformat(),
+            },
+            "attempts": 0,
+            "next_attempt_at": now,
+            "failed": False,
+        }
+        for row in rows
+    ])
+    ALERTS.inc(len(rows), outcome="queued")
+    return len(rows)
+
+def _triggered(db, page_id, store, price_paise):
+    """Watches at this store whose threshold the price meets and that have not alerted at or below it"""
+    return db.query(Watch.id, Watch.webhook_url, Watch.label, Watch.threshold_paise).filter(
+        Watch.page_id == page_id,
+        Watch.store == store,
+        Watch.threshold_paise >= price_paise,
+        or_(Watch.last_alert_paise.is_(None), Watch.last_alert_paise > price_paise)
+    ).all()
+
+def _rearm(db, page_id, store, price_paise):
+    """Watches the price has climbed back above (or that went out of stock) may alert again"""
+    query = db.query(Watch).filter(
+        Watch.page_id == page_id,
+        Watch.store == store,
+        Watch.last_alert_paise.isnot(None)
+    )
+    if price_paise is not None:
+        query = query.filter(Watch.threshold_paise < price_paise)
+    query.update({Watch.last_alert_paise: None}, synchronize_session=False)
+
+def evaluate_changes(db, page_id, changed_offers, min_price_paise):
+    """Queue alerts for the watches a refresh's changed offers affect; runs in the caller's transaction.
+
+    Only watches on this product at the changed stores (plus any-store
+    watches) are touched, through the (page_id, store, threshold) index.
+    """
+    if not changed_offers:
+        return 0
+    queued = 0
+    for offer in changed_offers:
+        price = offer["price_paise"] if offer["in_stock"] else None
+        _rearm(db, page_id, offer["store"], price)
+        if price is not None:
+            rows = _triggered(db, page_id, offer["store"], price)
+            queued += _queue_alerts(db, rows, page_id, offer["store"], price, offer["previous_price_paise"], offer["url"])
+
+    # Any-store watches follow the product's cheapest in-stock offer
+    _rearm(db, page_id, ANY_STORE, min_price_paise)
+    in_stock = [offer for offer in changed_offers if offer["in_stock"] and offer["price_paise"] is not None]
+    if in_stock and min_price_paise is not None:
+        cheapest = min(in_stock, key=lambda offer: offer["price_paise"])
+        if cheapest["price_paise"] == min_price_paise:
+            rows = _triggered(db, page_id, ANY_STORE, min_price_paise)
+            queued += _queue_alerts(db, rows, page_id, cheapest["store"], min_price_paise, cheapest["previous_price_paise"], cheapest["url"])
+    return queued
+
+def evaluate_watch(db, watch):
+    """Alert a new watch straight away if the current offers already meet it"""
+    query = db.query(Offer).filter(Offer.page_id == watch.page_id, Offer.in_stock.is_(True), Offer.price_paise.isnot(None))
+    if watch.store != ANY_STORE:
+        query = query.filter(Offer.store == watch.store)
+    offer = query.order_by(Offer.price_paise).first()
+    if offer is None or offer.price_paise > watch.threshold_paise:
+        return 0
+    rows = _triggered(db, watch.page_id, watch.store, offer.price_paise)
+    rows = [row for row in rows if row.id == watch.id]
+    return _queue_alerts(db, rows, watch.page_id, offer.store, offer.price_paise, None, offer.url)
+
+def serialize_watch(watch):
+    return {
+        "id": watch.id,
+        "page_id": watch.page_id,
+        "store": watch.store,
+        "threshold_paise": watch.threshold_paise,
+        "webhook_url": watch.webhook_url,
+        "label": watch.label,
+        "last_alert_paise": watch.last_alert_paise,
+        "created_at": watch.created_at.isoformat(),
+    }
+
+def send_pending(batch_size=None):
+    """Deliver one batch of due alerts, one POST per webhook URL. Returns the number of rows handled."""
+    import requests
+
+    batch_size = batch_size or config.ALERT_BATCH_SIZE
+    db = SessionLocal()
+    try:
+        now = _now()
+        pending = db.query(AlertOutbox).filter(
+            AlertOutbox.sent_at.is_(None),
+            AlertOutbox.failed.is_(False),
+            AlertOutbox.next_attempt_at <= now
+        ).order_by(AlertOutbox.id).limit(batch_size).all()
+        by_url = {}
+        for alert in pending:
+            by_url.setdefault(alert.webhook_url, []).append(alert)
+        for webhook_url, alerts in by_url.items():
+            if not webhook_url:
+                # Queued before alerts without a target were skipped
+                for alert in alerts:
+                    alert.failed = True
+                ALERTS.inc(len(alerts), outcome="failed")
+                continue
+            try:
+                response = requests.post(webhook_url, json={"alerts": [alert.payload for alert in alerts]}, timeout=10)
+                response.raise_for_status()
+                for alert in alerts:
+                    alert.sent_at = now
+                ALERTS.inc(len(alerts), outcome="sent")
+            except requests.RequestException as e:
+                print(f"❌ Failed to deliver {len(alerts)} price alerts to {webhook_url}: {e}")
+                for alert in alerts:
+                    alert.attempts += 1
+                    if alert.attempts >= config.ALERT_MAX_ATTEMPTS:
+                        alert.failed = True
+                    else:
+                        alert.next_attempt_at = now + timedelta(seconds=config.ALERT_INTERVAL_SECONDS * 2 ** alert.attempts)
+                failed = sum(alert.failed for alert in alerts)
+                ALERTS.inc(failed, outcome="failed")
+                ALERTS.inc(len(alerts) - failed, outcome="retried")
+        db.commit()
+        return len(pending)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def pending_count(db):
+    return db.query(func.count(AlertOutbox.id)).filter(
+        AlertOutbox.sent_at.is_(None), AlertOutbox.failed.is_(False)
+    ).scalar()
+
+class AlertSender:
+    """Background thread that drains the alert outbox in batches"""
+    def __init__(self, interval_seconds=None):
+        self.interval_seconds = interval_seconds or config.ALERT_INTERVAL_SECONDS
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        print("Alert sender started")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval_seconds):
+            try:
+                # Keep draining while full batches come back
+                while send_pending() >= config.ALERT_BATCH_SIZE and not self.stop_event.is_set():
+                    pass
+            except Exception as e:
+                print(f"❌ Alert delivery run failed: {e}")
+
+alert_sender = AlertSender()